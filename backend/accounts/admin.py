@@ -3,10 +3,11 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
 from accounts import models
+from core.cascades import CascadeDeletionAdmin
 
 
 @admin.register(models.User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(CascadeDeletionAdmin, BaseUserAdmin):
     ordering = ['id']
     list_display = ['email']
 
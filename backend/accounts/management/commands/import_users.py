@@ -0,0 +1,102 @@
+import csv
+import sys
+from itertools import islice
+from typing import Iterator, List, Tuple
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Upper
+
+from accounts.models import GENERATED_USERNAME, User, Profile, generate_username
+
+
+class Command(BaseCommand):
+    help = ('Imports users from a CSV file with email and password columns, and an optional username column. '
+            'Emails that already exist are skipped, empty passwords give unusable passwords and usernames that '
+            'are taken are replaced by generated ones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import, - for the standard input')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users inserted per transaction')
+        parser.add_argument('--hashed', action='store_true',
+                            help='The passwords are already hashed, as stored by django. Hashing 100k passwords '
+                                 'takes hours with the default hasher')
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            self._import(sys.stdin, options)
+        else:
+            with open(options['path'], newline='') as file:
+                self._import(file, options)
+
+    def _import(self, file, options: dict) -> None:
+        reader = csv.DictReader(file)
+        if not reader.fieldnames or not {'email', 'password'} <= set(reader.fieldnames):
+            raise CommandError('The file must have email and password columns')
+
+        rows = self._rows(reader)
+        imported = skipped = renamed = 0
+        while True:
+            batch = list(islice(rows, options['batch_size']))
+            if not batch:
+                break
+            created, generated = self._import_batch(batch, options['hashed'])
+            imported += created
+            skipped += len(batch) - created
+            renamed += generated
+
+        self.stdout.write(f'users: {imported} imported, {skipped} skipped, {renamed} usernames taken')
+
+    @staticmethod
+    def _rows(reader: csv.DictReader) -> Iterator[dict]:
+        for line, row in enumerate(reader, start=2):
+            if not row['email']:
+                raise CommandError(f'Line {line}: missing email')
+            row['email'] = User.objects.normalize_email(row['email'])
+            yield row
+
+    @staticmethod
+    def _import_batch(batch: List[dict], hashed: bool) -> Tuple[int, int]:
+        """
+        Inserts the users of the batch that do not exist yet and their profiles
+
+        :return: the number of users inserted, and how many of them did not get the username they asked for
+        """
+        with transaction.atomic():
+            emails = {row['email'] for row in batch}
+            existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+            # Usernames are unique whatever their case, see accounts.models
+            asked = {row['username'].upper() for row in batch if row.get('username')}
+            taken = set(Profile.objects.annotate(key=Upper('username')).filter(key__in=asked)
+                        .values_list('key', flat=True))
+
+            users, usernames = [], {}
+            generated = 0
+            for row in batch:
+                if row['email'] in existing:
+                    continue
+                existing.add(row['email'])
+                password = row['password'] if hashed else make_password(row['password'] or None)
+                users.append(User(email=row['email'], password=password))
+
+                username = row.get('username') or None
+                if username is not None and (username.upper() in taken or GENERATED_USERNAME.match(username)):
+                    username = None
+                    generated += 1
+                if username is not None:
+                    taken.add(username.upper())
+                usernames[row['email']] = username
+            User.objects.bulk_create(users)
+
+            if users and users[0].pk is None:
+                # Only PostgreSQL returns the primary keys of a bulk insert
+                pks = dict(User.objects.filter(email__in=usernames).values_list('email', 'pk'))
+                for user in users:
+                    user.pk = pks[user.email]
+            Profile.objects.bulk_create(
+                Profile(user_id=user.pk, username=usernames[user.email] or generate_username(user.pk),
+                        is_username_chosen=usernames[user.email] is not None)
+                for user in users
+            )
+        return len(users), generated
@@ -0,0 +1,25 @@
+# Generated by Django 3.0.7 on 2026-10-18 21:10
+
+from django.db import migrations
+
+import core.utils.migrations
+
+
+class Migration(migrations.Migration):
+    # The index is built concurrently, outside of a transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        # Serves the username__iexact lookups, which PostgreSQL compiles to UPPER("username"::text)
+        core.utils.migrations.PostgresOnly(
+            migrations.RunSQL(
+                'CREATE INDEX CONCURRENTLY "accounts_profile_username_upper_idx" '
+                'ON "accounts_profile" (UPPER("username"::text))',
+                'DROP INDEX CONCURRENTLY "accounts_profile_username_upper_idx"',
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.0.7 on 2026-10-18 22:40
+
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Upper
+
+import core.utils.migrations
+
+
+def generate_username(user_id):
+    """accounts.models.generate_username() as of this migration"""
+    return f'guest-{user_id * 0x9E3779B97F4B % 2 ** 48:012x}'
+
+
+def release_duplicate_usernames(apps, schema_editor):
+    """The profiles sharing a username in another case, except the first, get their generated username back"""
+    Profile = apps.get_model('accounts', 'Profile')
+    profiles = Profile.objects.using(schema_editor.connection.alias)
+    duplicates = (profiles.annotate(key=Upper('username')).values('key')
+                  .annotate(count=Count('pk'), first=Min('pk')).filter(count__gt=1))
+    for duplicate in duplicates:
+        for profile in profiles.filter(username__iexact=duplicate['key']).exclude(pk=duplicate['first']):
+            profile.username = generate_username(profile.user_id)
+            profile.is_username_chosen = False
+            profile.save(update_fields=['username', 'is_username_chosen'])
+
+
+class Migration(migrations.Migration):
+    # The index is built concurrently, outside of a transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0003_user_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_duplicate_usernames, migrations.RunPython.noop),
+        # Usernames are unique whatever their case, the index settles concurrent renames. It also serves
+        # the username__iexact lookups, which PostgreSQL compiles to UPPER("username"::text).
+        core.utils.migrations.PostgresOnly(
+            migrations.RunSQL(
+                'CREATE UNIQUE INDEX CONCURRENTLY "accounts_profile_username_upper_uniq" '
+                'ON "accounts_profile" (UPPER("username"::text))',
+                'DROP INDEX CONCURRENTLY "accounts_profile_username_upper_uniq"',
+            ),
+        ),
+        core.utils.migrations.PostgresOnly(
+            migrations.RunSQL(
+                'DROP INDEX CONCURRENTLY "accounts_profile_username_upper_idx"',
+                'CREATE INDEX CONCURRENTLY "accounts_profile_username_upper_idx" '
+                'ON "accounts_profile" (UPPER("username"::text))',
+            ),
+        ),
+    ]
@@ -1,27 +1,51 @@
-from django.db import models
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Exists
+from django.dispatch import Signal
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
+from core.utils.cache import LRUCache
+
+
+# Multiplying by an odd number is a bijection modulo 2 ** 48, so every user id gives a different username
+_USERNAME_MULTIPLIER = 0x9E3779B97F4B
+_USERNAME_MODULUS = 2 ** 48
+GENERATED_USERNAME = re.compile(r'^guest-[0-9a-f]{12}$')
+
+
+def generate_username(user_id: int) -> str:
+    """Default username of a user, unique to its id without being sequential"""
+    return f'guest-{user_id * _USERNAME_MULTIPLIER % _USERNAME_MODULUS:012x}'
+
+
+# Uppercased usernames recently found available. Names taken in this process are dropped by
+# accounts.signals, the other processes see them taken once the entries expire.
+available_usernames = LRUCache(maxsize=settings.USERNAME_AVAILABILITY_CACHE['MAXSIZE'],
+                               ttl=settings.USERNAME_AVAILABILITY_CACHE['TIMEOUT'])
+
+# Sent with the instance and the database alias when Profile.set_username() renamed a profile, within the
+# same transaction. The rename is a single UPDATE, so post_save is not sent.
+renamed = Signal()
+
 
 class UserManager(BaseUserManager):
 
     def create_user(self, email: str, password: str, **extra_fields) -> 'User':
-        """Creates and saves a new user"""
+        """Creates and saves a new user, and its profile within the same transaction"""
         if not email:
             raise ValueError("Users must have an email address")
         user = self.model(email=self.normalize_email(email), **extra_fields)
         user.set_password(password)
-        user.save(using=self._db)
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
 
         return user
 
-    def create_superuser(self, email: str, password: str) -> 'User':
+    def create_superuser(self, email: str, password: str, **extra_fields) -> 'User':
         """Creates and saves a new super user"""
-        user = self.create_user(email, password)
-        user.is_staff = True
-        user.is_superuser = True
-        user.save(using=self._db)
-
-        return user
+        return self.create_user(email, password, is_staff=True, is_superuser=True, **extra_fields)
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -29,6 +53,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(max_length=255, unique=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Tombstone of a deleted user, deactivated while its posts and topics are detached, see core.cascades
+    deleted_at = models.DateTimeField(null=True)
 
     objects = UserManager()
 
@@ -44,12 +70,51 @@ class Profile(models.Model):
     def __str__(self):
         return f'{self.username} ({self.user.email})'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        profile = super().from_db(db, field_names, values)
+        # Lets the receivers of post_save tell whether the username changed
+        profile._loaded_username = profile.__dict__.get('username')
+        return profile
+
+    @property
+    def username_changed(self) -> bool:
+        """Whether the username differs from the one read from the database, true if it was not read"""
+        return getattr(self, '_loaded_username', None) != self.username
+
+    @classmethod
+    def is_username_available(cls, username: str) -> bool:
+        """Whether no profile has the username, whatever its case, and it is not reserved"""
+        if GENERATED_USERNAME.match(username):
+            return False
+        key = username.upper()
+        if available_usernames.get(key):
+            return True
+        available = not cls.objects.filter(username__iexact=username).exists()
+        if available:
+            available_usernames.set(key, True)
+        return available
+
     def set_username(self, username: str) -> bool:
-        """Sets the username. Returns false is the username already exists"""
-        exists = Profile.objects.filter(username=username).exists()
-        if exists:
+        """
+        Sets the username in a single UPDATE. Returns false if another profile has it, whatever its case,
+        or if it is reserved to the generated ones
+        """
+        if GENERATED_USERNAME.match(username):
+            return False
+        taken = Profile.objects.filter(username__iexact=username).exclude(pk=self.pk)
+        using = self._state.db or 'default'
+        try:
+            # Concurrent renames to the same name, whatever its case, are settled by the unique
+            # UPPER("username") index on PostgreSQL. SQLite runs one write at a time.
+            with transaction.atomic(using=using):
+                updated = Profile.objects.using(using).filter(~Exists(taken), pk=self.pk).update(
+                    username=username, is_username_chosen=True)
+                if updated:
+                    self.username = username
+                    self.is_username_chosen = True
+                    self._loaded_username = username
+                    renamed.send(sender=Profile, instance=self, using=using)
+        except IntegrityError:
             return False
-        self.username = username
-        self.is_username_chosen = True
-        self.save(update_fields=['username', 'is_username_chosen'])
-        return True
+        return bool(updated)
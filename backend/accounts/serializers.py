@@ -2,21 +2,17 @@ from django.contrib.auth import authenticate
 from django.utils.translation import gettext_lazy as _
 from django.http import HttpRequest
 
-from rest_framework.reverse import reverse
 from rest_framework import serializers
 from rest_framework.authtoken.serializers import AuthTokenSerializer as DefaultAuthTokenSerializer
 
-from accounts.models import User, Profile
+from accounts.models import GENERATED_USERNAME, User, Profile
+from core.extensions.hyperlinks import HrefField
+from core.extensions.serializers import DynamicFieldsModelSerializer
 
 
 class ProfileWithHyperlinkSerializer(serializers.ModelSerializer):
     """Serializer with link and name for the Profile object (READ ONLY)"""
-    href = serializers.SerializerMethodField()
-
-    def get_href(self, obj: Profile):
-        """Return url for current object"""
-        request = self.context['request']
-        return reverse('accounts:profile', request=request, kwargs={'pk': obj.id})
+    href = HrefField('accounts:profile', {'pk': 'id'})
 
     class Meta:
         model = Profile
@@ -70,27 +66,52 @@ class UserSerializer(serializers.ModelSerializer):
         if 'email' in validated_data.keys():
             validated_data.pop('email')
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
+            # Saved by the update, in the same UPDATE as the other fields
+            instance.set_password(password)
 
-        return user
+        return super().update(instance, validated_data)
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(DynamicFieldsModelSerializer):
     """Serializer for the Profile object"""
     is_self = serializers.SerializerMethodField()
 
+    field_requirements = {'is_self': ('user',)}
+
     def get_is_self(self, obj: Profile) -> bool:
         """Returns if the user being serialized is the authenticated user"""
         request: HttpRequest = self.context.get('request')
         if request:
             if request.user.is_authenticated:
-                return obj == request.user.profile
+                return obj.user_id == request.user.id
         return False
 
+    def validate_username(self, username: str) -> str:
+        """The generated usernames are reserved, so that they never collide with a chosen one"""
+        if GENERATED_USERNAME.match(username) and (self.instance is None or self.instance.username != username):
+            raise serializers.ValidationError(_('This username is reserved.'), code='reserved')
+        return username
+
+    def update(self, instance: Profile, validated_data: dict) -> Profile:
+        username = validated_data.pop('username', instance.username)
+        if username != instance.username and not instance.set_username(username):
+            raise serializers.ValidationError({'username': [_('A profile with this username already exists.')]},
+                                              code='unique')
+        if not validated_data:
+            # Nothing left to save, set_username already wrote the profile
+            return instance
+        return super().update(instance, validated_data)
+
     class Meta:
         model = Profile
         fields = ('username', 'is_self')
+        extra_kwargs = {
+            # Checked by set_username within its UPDATE
+            'username': {'validators': []},
+        }
+
+
+class UsernameAvailabilitySerializer(serializers.Serializer):
+    """Username whose availability is checked"""
+    username = serializers.CharField(max_length=Profile._meta.get_field('username').max_length)
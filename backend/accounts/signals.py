@@ -1,23 +1,24 @@
-import secrets
-
 from django.db.models.signals import post_save
-from django.db.utils import IntegrityError
 from django.dispatch import receiver
 
-from accounts.models import User, Profile
+from accounts.models import User, Profile, available_usernames, generate_username, renamed
+from core.cascades import tombstoned
 
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, using: str, **kwargs):
     if created:
-        while 1:
-            try:
-                Profile.objects.create(user=instance, username='guest' + secrets.token_hex(4))
-                break
-            except IntegrityError:  # pragma: no cover
-                pass
+        # The generated username is unique to the user, no retry is needed
+        Profile.objects.using(using).create(user=instance, username=generate_username(instance.pk))
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+@receiver(post_save, sender=Profile)
+@receiver(renamed, sender=Profile)
+def forget_available_username(sender, instance, **kwargs):
+    available_usernames.delete(instance.username.upper())
+
+
+@receiver(tombstoned, sender=User)
+def deactivate_tombstoned_user(sender, instance: User, using: str, **kwargs):
+    instance.is_active = False
+    User.objects.using(using).filter(pk=instance.pk).update(is_active=False)
@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -101,6 +103,15 @@ class PrivateUserApiTests(TestCase):
         self.assertTrue(res.status_code, status.HTTP_200_OK)
         self.assertTrue(self.user.check_password(payload['password']))
 
+    def test_update_user_password_writes_once(self):
+        """Test that changing the password updates the user once, without touching its profile"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(MANAGE_URL, {'password': 'newpassword123'})
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('accounts_user', updates[0])
+
     def test_update_user_password_put(self):
         """Test updating the user's password"""
         payload = {'email': 'testing@marsimon.com', 'password': 'newpassword123'}
@@ -0,0 +1,83 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+
+from accounts.models import User, Profile, generate_username
+from core.extensions.test import sample_user
+
+
+class ImportUsersCommandTests(TestCase):
+    """Tests for the import_users command"""
+
+    def import_users(self, content: str, **options) -> str:
+        """Imports the CSV content and returns the output of the command"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        out = StringIO()
+        call_command('import_users', file.name, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_users(self):
+        """Test that the users are imported with their profiles and passwords, by batches"""
+        out = self.import_users(
+            'email,password,username\n'
+            'one@marsimon.com,password1,one\n'
+            'two@MARSIMON.COM,password2,\n'
+            'three@marsimon.com,,three\n',
+            batch_size=2,
+        )
+
+        self.assertIn('3 imported, 0 skipped', out)
+        one, two, three = (User.objects.get(email=email) for email in
+                           ('one@marsimon.com', 'two@marsimon.com', 'three@marsimon.com'))
+        self.assertTrue(one.check_password('password1'))
+        self.assertEqual((one.profile.username, one.profile.is_username_chosen), ('one', True))
+        self.assertEqual((two.profile.username, two.profile.is_username_chosen), (generate_username(two.pk), False))
+        self.assertFalse(three.has_usable_password())
+
+    def test_import_hashed_passwords(self):
+        """Test importing passwords that are already hashed"""
+        self.import_users(f'email,password\none@marsimon.com,{make_password("password1")}\n', hashed=True)
+
+        self.assertTrue(User.objects.get(email='one@marsimon.com').check_password('password1'))
+
+    def test_existing_users_are_skipped(self):
+        """Test that existing emails are skipped and taken usernames replaced"""
+        existing = sample_user(email='one@marsimon.com')
+        existing.profile.set_username('taken')
+
+        out = self.import_users(
+            'email,password,username\n'
+            'one@marsimon.com,password1,one\n'
+            'two@marsimon.com,password2,taken\n'
+            'two@marsimon.com,password3,two\n'
+        )
+
+        self.assertIn('1 imported, 2 skipped, 1 usernames taken', out)
+        self.assertTrue(existing.check_password('testing123'))
+        two = User.objects.get(email='two@marsimon.com')
+        self.assertEqual(two.profile.username, generate_username(two.pk))
+        self.assertEqual(Profile.objects.count(), 2)
+
+    def test_usernames_taken_in_another_case(self):
+        """Test that a username taken in another case, in the database or earlier in the file, is replaced"""
+        sample_user(email='existing@marsimon.com').profile.set_username('alice')
+
+        out = self.import_users(
+            'email,password,username\n'
+            'one@marsimon.com,password1,Alice\n'
+            'two@marsimon.com,password2,Bob\n'
+            'three@marsimon.com,password3,bob\n'
+        )
+
+        self.assertIn('3 imported, 0 skipped, 2 usernames taken', out)
+        one, two, three = (User.objects.get(email=email) for email in
+                           ('one@marsimon.com', 'two@marsimon.com', 'three@marsimon.com'))
+        self.assertEqual(one.profile.username, generate_username(one.pk))
+        self.assertEqual(two.profile.username, 'Bob')
+        self.assertEqual(three.profile.username, generate_username(three.pk))
@@ -1,8 +1,10 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from core.extensions.test import sample_user
 
-from accounts.models import User
+from accounts.models import GENERATED_USERNAME, User, generate_username
 
 
 class UserModelTests(TestCase):
@@ -40,6 +42,26 @@ class UserModelTests(TestCase):
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
 
+    def test_create_user_writes_once(self):
+        """Test that creating a user and a superuser inserts them with their profile, without updating them"""
+        for create, email in ((User.objects.create_user, 'user@marsimon.com'),
+                              (User.objects.create_superuser, 'admin@marsimon.com')):
+            with CaptureQueriesContext(connection) as queries:
+                user = create(email, 'test123')
+
+            writes = [query['sql'].split()[0] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE'))]
+            self.assertEqual(writes, ['INSERT', 'INSERT'])
+            self.assertEqual(user.profile.username, generate_username(user.pk))
+
+    def test_user_save_does_not_touch_profile(self):
+        """Test that saving a user does not write its profile"""
+        user = sample_user()
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+
+        self.assertFalse([query for query in queries if 'accounts_profile' in query['sql']])
+
 
 class ProfileModelTests(TestCase):
 
@@ -79,3 +101,30 @@ class ProfileModelTests(TestCase):
         self.assertNotEqual(self.user.profile.username, other_user.profile.username)
         self.assertEqual(self.user.profile.username, current_username)
         self.assertFalse(self.user.profile.is_username_chosen)
+
+    def test_generated_usernames_are_unique(self):
+        """Test that the generated usernames differ for every user id and are reserved"""
+        usernames = {generate_username(user_id) for user_id in range(1, 10001)}
+
+        self.assertEqual(len(usernames), 10000)
+        self.assertTrue(all(GENERATED_USERNAME.match(username) for username in usernames))
+        self.assertFalse(self.user.profile.set_username(generate_username(self.user.pk + 1)))
+
+    def test_set_username_single_update(self):
+        """Test that setting a username writes the profile with a single UPDATE"""
+        with CaptureQueriesContext(connection) as queries:
+            self.user.profile.set_username('newusername')
+
+        profile_writes = [query for query in queries
+                          if query['sql'].startswith(('INSERT', 'UPDATE')) and 'accounts_profile' in query['sql']]
+        self.assertEqual(len(profile_writes), 1)
+        self.user.profile.refresh_from_db()
+        self.assertEqual((self.user.profile.username, self.user.profile.is_username_chosen), ('newusername', True))
+
+    def test_set_username_taken_in_another_case(self):
+        """Test that a username differing from a taken one only by its case is taken"""
+        sample_user(email='another@marsimon.com').profile.set_username('TakenName')
+
+        self.assertFalse(self.user.profile.set_username('takenname'))
+        self.assertTrue(self.user.profile.set_username('OwnName'))
+        self.assertTrue(self.user.profile.set_username('ownname'))
@@ -3,11 +3,12 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from accounts.models import Profile
+from accounts.models import Profile, available_usernames, generate_username
 from core.extensions.test import sample_user
 
 
 PROFILE_BASE_URL = '/api/users/profiles'
+USERNAME_AVAILABLE_URL = reverse('accounts:username-available')
 
 
 def get_profile_url(profile: Profile):
@@ -84,3 +85,77 @@ class PrivateProfileApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.user.refresh_from_db()
         self.assertEqual(self.user.profile.username, payload['username'])
+
+    def test_patch_another_profile_fails(self):
+        """Test that updating the profile of another user is forbidden"""
+        other_user = sample_user(email='other@marsimon.com')
+        res = self.client.patch(get_profile_url(other_user.profile), {'username': 'StolenUsername'})
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        other_user.profile.refresh_from_db()
+        self.assertNotEqual(other_user.profile.username, 'StolenUsername')
+
+    def test_patch_missing_profile(self):
+        """Test that updating a profile that does not exist returns a 404"""
+        res = self.client.patch(reverse('accounts:profile', args=[self.user.profile.id + 100]), {'username': 'Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_patch_taken_username_fails(self):
+        """Test that taking the username of another profile, in any case, is a bad request"""
+        sample_user(email='other@marsimon.com').profile.set_username('OtherUsername')
+
+        res = self.client.patch(get_profile_url(self.user.profile), {'username': 'otherusername'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', res.data)
+
+    def test_generated_username_is_reserved(self):
+        """Test that a profile cannot take the generated username of another user"""
+        res = self.client.patch(get_profile_url(self.user.profile), {'username': generate_username(self.user.pk + 1)})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_put_own_generated_username(self):
+        """Test that a profile can keep its own generated username"""
+        self.user.profile.refresh_from_db()
+        res = self.client.put(get_profile_url(self.user.profile), {'username': self.user.profile.username})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class UsernameAvailabilityApiTests(TestCase):
+    """Tests for the username availability api"""
+
+    def setUp(self):
+        available_usernames.clear()
+        self.client = APIClient()
+        self.user = sample_user()
+        self.user.profile.set_username('TakenName')
+
+    def is_available(self, username: str) -> bool:
+        res = self.client.get(USERNAME_AVAILABLE_URL, {'username': username})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['available']
+
+    def test_username_availability(self):
+        """Test that taken usernames, in any case, and generated ones are not available"""
+        self.assertTrue(self.is_available('FreeName'))
+        self.assertFalse(self.is_available('takenname'))
+        self.assertFalse(self.is_available(generate_username(self.user.pk + 1)))
+
+    def test_available_usernames_are_cached(self):
+        """Test that a username found available is not looked up again until it is taken"""
+        self.is_available('FreeName')
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.is_available('freename'))
+
+        sample_user(email='other@marsimon.com').profile.set_username('FREENAME')
+        self.assertFalse(self.is_available('FreeName'))
+
+    def test_username_is_required(self):
+        """Test that checking the availability without a username is a bad request"""
+        res = self.client.get(USERNAME_AVAILABLE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
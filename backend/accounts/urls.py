@@ -10,4 +10,5 @@ urlpatterns = [
     path('auth/token', views.CreateTokenView.as_view(), name='token'),
     path('auth/me', views.ManageUserView.as_view(), name='manage'),
     path('users/profiles/<slug:pk>', views.ProfileView.as_view(), name='profile'),
+    path('users/usernames/available', views.UsernameAvailabilityView.as_view(), name='username-available'),
 ]
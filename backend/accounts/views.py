@@ -1,11 +1,17 @@
 from rest_framework import generics
 from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from core.extensions.serializers import SparseFieldsetMixin
+from core.instrumentation import TimedSerializationMixin
+from core.mixins import CachedObjectMixin
 from core.permissions import ProfilePermission
+from core.routers import ReplicaReadsMixin
 from accounts.models import Profile, User
-from accounts.serializers import AuthTokenSerializer, UserSerializer, ProfileSerializer
+from accounts.serializers import AuthTokenSerializer, UserSerializer, ProfileSerializer, UsernameAvailabilitySerializer
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -28,10 +34,25 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(ReplicaReadsMixin, CachedObjectMixin, SparseFieldsetMixin, TimedSerializationMixin,
+                  generics.RetrieveUpdateAPIView):
     """View to see a user's profile"""
     permission_classes = (ProfilePermission,)
     serializer_class = ProfileSerializer
 
     def get_queryset(self):
-        return Profile.objects.all()
+        # The profile of a deleted user is hidden while its posts are detached, see core.cascades
+        return Profile.objects.filter(user__deleted_at__isnull=True)
+
+
+class UsernameAvailabilityView(APIView):
+    """View telling whether a username can be taken, meant to be polled while it is typed"""
+    # The answer is the same for everyone, the token lookup is skipped
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def get(self, request, *args, **kwargs):
+        serializer = UsernameAvailabilitySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        username = serializer.validated_data['username']
+        return Response({'username': username, 'available': Profile.is_username_available(username)})
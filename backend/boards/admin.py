@@ -1,7 +1,12 @@
 from django.contrib import admin
 
 from boards.models import Board, Topic, Post
+from core.cascades import CascadeDeletionAdmin
+
+
+@admin.register(Board, Topic)
+class CascadeDeletionModelAdmin(CascadeDeletionAdmin, admin.ModelAdmin):
+    pass
+
 
-admin.site.register(Board)
-admin.site.register(Topic)
 admin.site.register(Post)
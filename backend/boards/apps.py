@@ -1,5 +1,10 @@
 from django.apps import AppConfig
 
 
+# noinspection PyUnresolvedReferences
 class BoardsConfig(AppConfig):
     name = 'boards'
+
+    def ready(self):
+        import boards.cascades
+        import boards.signals
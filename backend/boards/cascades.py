@@ -0,0 +1,41 @@
+from typing import List
+
+from accounts.models import User
+from boards.models import Board, Topic, Post, PostSearchDocument, TopicRanking
+from boards.search import get_search_backend
+from boards.signals import touch_topics
+from core.cascades import CascadeStep, register_cascade
+
+
+def _unindex_posts(post_ids: List[int], using: str) -> None:
+    get_search_backend(using).remove_posts(post_ids)
+
+
+def _touch_posts_topics(post_ids: List[int], using: str) -> None:
+    """The posts are about to lose their author, the responses showing them change"""
+    touch_topics(Topic.objects.filter(posts__in=post_ids), using)
+
+
+def _touch_topics(topic_ids: List[int], using: str) -> None:
+    """The topics are about to lose their starter"""
+    touch_topics(Topic.objects.filter(pk__in=topic_ids), using)
+
+
+# The search documents reference the posts, which reference the topics, as do the rankings
+register_cascade(
+    Board,
+    CascadeStep(lambda pk: TopicRanking.objects.filter(board=pk)),
+    CascadeStep(lambda pk: PostSearchDocument.objects.filter(post__topic__board=pk)),
+    CascadeStep(lambda pk: Post.objects.filter(topic__board=pk), before=_unindex_posts),
+    CascadeStep(lambda pk: Topic.objects.filter(board=pk)),
+)
+register_cascade(
+    Topic,
+    CascadeStep(lambda pk: PostSearchDocument.objects.filter(post__topic=pk)),
+    CascadeStep(lambda pk: Post.objects.filter(topic=pk), before=_unindex_posts),
+)
+register_cascade(
+    User,
+    CascadeStep(lambda pk: Post.objects.filter(author__user=pk), values={'author': None}, before=_touch_posts_topics),
+    CascadeStep(lambda pk: Topic.objects.filter(starter__user=pk), values={'starter': None}, before=_touch_topics),
+)
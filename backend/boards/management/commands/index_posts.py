@@ -0,0 +1,34 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from boards.models import Post
+from boards.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = ('Backfills the full text index of the posts, e.g. for the posts written before the search existed. '
+            'Indexed posts are indexed again, the new ones are indexed as they are saved, see boards.signals.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts indexed per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            search = get_search_backend()
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+
+        indexed = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                batch = list(Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                             .values_list('pk', flat=True)[:options['batch_size']])
+                if not batch:
+                    break
+                search.index_posts(batch)
+            indexed += len(batch)
+            last_pk = batch[-1]
+
+        self.stdout.write(f'posts: {indexed} indexed')
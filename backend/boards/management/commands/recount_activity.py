@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from boards.models import Board, Topic, Post
+from core.response_cache import version_stamps
+
+
+COUNTER_FIELDS = ('post_count', 'last_post_at', 'last_post_id')
+
+
+def _count(queryset: QuerySet, group_by: str) -> Coalesce:
+    """Correlated COUNT(*) of the queryset, which must be filtered on OuterRef('pk')"""
+    counts = queryset.order_by().values(group_by).annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(counts, output_field=models.IntegerField()), Value(0))
+
+
+def _latest(posts: QuerySet, field: str) -> Subquery:
+    return Subquery(posts.order_by('-created_at', '-id').values(field)[:1])
+
+
+class Command(BaseCommand):
+    help = 'Backfills and audits the denormalized activity counters of boards and topics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows checked per transaction')
+        parser.add_argument('--check', action='store_true', help='Only report the rows that are out of date')
+
+    def handle(self, *args, **options):
+        # The tombstoned topics are not counted, see boards.signals
+        topic_posts = Post.objects.filter(topic=OuterRef('pk'))
+        topics = Topic.objects.filter(deleted_at__isnull=True).annotate(
+            actual_post_count=_count(topic_posts, 'topic'),
+            actual_last_post_at=_latest(topic_posts, 'created_at'),
+            actual_last_post_id=_latest(topic_posts, 'id'),
+        )
+        self._recount('topics', topics, COUNTER_FIELDS, options,
+                      lambda topic: (f'board:{topic.board_id}', f'topic:{topic.pk}'))
+
+        board_posts = Post.objects.filter(topic__board=OuterRef('pk'), topic__deleted_at__isnull=True)
+        boards = Board.objects.filter(deleted_at__isnull=True).annotate(
+            actual_topic_count=_count(Topic.objects.filter(board=OuterRef('pk'), deleted_at__isnull=True), 'board'),
+            actual_post_count=_count(board_posts, 'topic__board'),
+            actual_last_post_at=_latest(board_posts, 'created_at'),
+            actual_last_post_id=_latest(board_posts, 'id'),
+        )
+        self._recount('boards', boards, ('topic_count',) + COUNTER_FIELDS, options,
+                      lambda board: ('boards', f'board:{board.pk}'))
+
+    def _recount(self, name: str, queryset: QuerySet, fields: tuple, options: dict, versions) -> None:
+        """
+        Walks the queryset in primary key batches and fixes every row whose counters differ
+
+        :param versions: gives the version stamps of the cached responses showing a row
+        """
+        checked = outdated = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+                if not batch:
+                    break
+                stale = [row for row in batch if self._refresh(row, fields)]
+                if stale and not options['check']:
+                    # The counters are shown in the responses, so their conditional GET validators must change
+                    now = timezone.now()
+                    for row in stale:
+                        row.modified_at = now
+                    queryset.model.objects.bulk_update(stale, fields + ('modified_at',))
+                    version_stamps.bump(*{version for row in stale for version in versions(row)})
+
+            checked += len(batch)
+            outdated += len(stale)
+            last_pk = batch[-1].pk
+
+        verb = 'out of date' if options['check'] else 'fixed'
+        self.stdout.write(f'{name}: {checked} checked, {outdated} {verb}')
+
+    @staticmethod
+    def _refresh(row: models.Model, fields: tuple) -> bool:
+        """Sets the actual values on the row, returning whether any of them changed"""
+        changed = False
+        for field in fields:
+            actual = getattr(row, 'actual_' + field)
+            if getattr(row, field) != actual:
+                setattr(row, field, actual)
+                changed = True
+        return changed
@@ -0,0 +1,171 @@
+import csv
+import io
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, List, Sequence, Type
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from accounts.models import User, Profile, generate_username
+from boards.models import Board, Topic, Post
+from boards.ranking import rebuild_rankings
+from boards.search import BACKENDS
+
+
+WORDS = ('the', 'a', 'of', 'to', 'and', 'in', 'is', 'it', 'that', 'for', 'you', 'was', 'on', 'are', 'with',
+         'as', 'be', 'this', 'have', 'not', 'but', 'what', 'all', 'when', 'we', 'there', 'can', 'an', 'your',
+         'which', 'their', 'if', 'do', 'will', 'each', 'about', 'how', 'up', 'out', 'them', 'then', 'she',
+         'many', 'some', 'so', 'these', 'would', 'other', 'into', 'has', 'more', 'two', 'like', 'him', 'see',
+         'time', 'could', 'no', 'make', 'than', 'first', 'been', 'its', 'who', 'now', 'people', 'my', 'over',
+         'down', 'only', 'way', 'find', 'use', 'may', 'water', 'long', 'little', 'very', 'after', 'words',
+         'called', 'just', 'where', 'most', 'know', 'get', 'through', 'back', 'much', 'before', 'go', 'good',
+         'new', 'write', 'our', 'used', 'me', 'man', 'too', 'any', 'day', 'same', 'right', 'look', 'think',
+         'also', 'around', 'another', 'came', 'come', 'work', 'three', 'must', 'because', 'does', 'part',
+         'database', 'server', 'python', 'django', 'query', 'index', 'cache', 'latency', 'deploy', 'board')
+
+
+def zipf_weights(count: int, exponent: float) -> List[float]:
+    """Cumulative weights of count ranks, the rank k weighing 1 / k ** exponent"""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def zipf_counts(total: int, count: int, exponent: float, rng: random.Random) -> List[int]:
+    """Splits total items between count owners by Zipf's law, the ranks being shuffled among the owners"""
+    ranks = rng.sample(range(count), count)
+    drawn = Counter(rng.choices(ranks, cum_weights=zipf_weights(count, exponent), k=total))
+    return [drawn[owner] for owner in range(count)]
+
+
+class Command(BaseCommand):
+    help = ('Seeds a synthetic forum for load tests: users, boards, topics and posts. The topics per board, posts '
+            'per topic and posts per author follow Zipf distributions. The topics and posts are copied in with COPY '
+            'on PostgreSQL, the activity counters and the search index are rebuilt at the end. Every user has the '
+            'password "password".')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to create')
+        parser.add_argument('--boards', type=int, default=10, help='Boards to create')
+        parser.add_argument('--topics', type=int, default=100, help='Mean number of topics per board')
+        parser.add_argument('--posts', type=int, default=20, help='Mean number of posts per topic')
+        parser.add_argument('--exponent', type=float, default=1.1, help='Exponent of the Zipf distributions')
+        parser.add_argument('--days', type=int, default=365, help='The posts are spread over these last days')
+        parser.add_argument('--seed', type=int, help='Seed of the random generator, for reproducible forums')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows inserted per statement')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['boards'], options['topics'], options['posts']) < 1:
+            raise CommandError('The users, boards, topics and posts must be at least 1')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+        # Titles and emails are unique, so that a database can be seeded several times
+        self.tag = f'{self.rng.getrandbits(32):08x}'
+
+        with transaction.atomic():
+            profile_ids = self._create_users(options['users'])
+            board_ids = self._create_boards(options['boards'])
+            topics = self._create_topics(board_ids, profile_ids, options['topics'] * options['boards'],
+                                         options['exponent'])
+            posts = self._create_posts(topics, profile_ids, options['posts'] * len(topics), options['exponent'])
+
+        call_command('recount_activity', stdout=self.stdout)
+        rebuild_rankings()
+        if connection.vendor in BACKENDS:
+            call_command('index_posts', batch_size=self.batch_size, stdout=self.stdout)
+        self.stdout.write(f'forum: {len(profile_ids)} users, {len(board_ids)} boards, {len(topics)} topics, '
+                          f'{posts} posts')
+
+    def _create_users(self, count: int) -> List[int]:
+        # Hashing once, hashing every password would take longer than the rest of the seeding
+        password = make_password('password')
+        users = [User(email=f'user{index}-{self.tag}@example.com', password=password) for index in range(count)]
+        User.objects.bulk_create(users, batch_size=self._bulk_batch_size(User, users))
+        if users[0].pk is None:
+            # Only PostgreSQL returns the primary keys of a bulk insert
+            pks = dict(User.objects.filter(email__endswith=f'-{self.tag}@example.com').values_list('email', 'pk'))
+            for user in users:
+                user.pk = pks[user.email]
+        profiles = [Profile(user_id=user.pk, username=generate_username(user.pk)) for user in users]
+        Profile.objects.bulk_create(profiles, batch_size=self._bulk_batch_size(Profile, profiles))
+        return list(Profile.objects.filter(user__email__endswith=f'-{self.tag}@example.com')
+                    .values_list('pk', flat=True))
+
+    def _create_boards(self, count: int) -> List[int]:
+        Board.objects.bulk_create(
+            Board(title=f'Board {index} {self.tag}', description=self._words(3, 12)[:100]) for index in range(count)
+        )
+        return list(Board.objects.filter(title__endswith=f' {self.tag}').values_list('pk', flat=True))
+
+    def _create_topics(self, board_ids: List[int], profile_ids: List[int], total: int, exponent: float) -> list:
+        """Inserts the topics, returning their ids, board ids and creation dates"""
+        starters = zipf_weights(len(profile_ids), exponent)
+        rows = []
+        for board_id, count in zip(board_ids, zipf_counts(total, len(board_ids), exponent, self.rng)):
+            for created_at in self._dates(self.start, count):
+                title = f'{self._words(2, 10)} {len(rows)} {self.tag}'[-255:]
+                starter_id = self.rng.choices(profile_ids, cum_weights=starters)[0]
+                rows.append((board_id, starter_id, title, created_at, created_at, 0))
+        self._copy(Topic, ('board', 'starter', 'title', 'created_at', 'modified_at', 'post_count'), rows)
+
+        ids = dict(Topic.objects.filter(title__endswith=f' {self.tag}').values_list('title', 'pk'))
+        return [(ids[title], board_id, created_at) for board_id, _, title, created_at, _, _ in rows]
+
+    def _create_posts(self, topics: list, profile_ids: List[int], total: int, exponent: float) -> int:
+        authors = zipf_weights(len(profile_ids), exponent)
+        # Every topic has its first post, the others are shared out
+        counts = zipf_counts(total - len(topics), len(topics), exponent, self.rng)
+
+        def rows() -> Iterator[tuple]:
+            for (topic_id, _, topic_created_at), count in zip(topics, counts):
+                dates = self._dates(topic_created_at, count + 1)
+                for author_id, created_at in zip(self.rng.choices(profile_ids, cum_weights=authors, k=count + 1),
+                                                 dates):
+                    yield author_id, topic_id, self._words(5, 80)[:4000], created_at
+
+        return self._copy(Post, ('author', 'topic', 'message', 'created_at'), rows())
+
+    def _copy(self, model: Type[models.Model], field_names: Sequence[str], rows: Iterable[tuple]) -> int:
+        """
+        Inserts the rows in batches, with COPY on PostgreSQL
+
+        The rows are inserted without going through the models, so the auto_now_add dates are the ones given.
+        """
+        fields = [model._meta.get_field(name) for name in field_names]
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        inserted = 0
+        rows = iter(rows)
+        with connection.cursor() as cursor:
+            while True:
+                batch = [tuple(connection.ops.adapt_datetimefield_value(value) if isinstance(value, datetime)
+                               else value for value in row) for row in islice(rows, self.batch_size)]
+                if not batch:
+                    return inserted
+                if connection.vendor == 'postgresql':
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(batch)
+                    buffer.seek(0)
+                    cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+                else:
+                    cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({", ".join(["%s"] * len(fields))})',
+                                       batch)
+                inserted += len(batch)
+
+    def _bulk_batch_size(self, model: Type[models.Model], objs: list) -> int:
+        # Django 3.0 does not bound the given batch size by the number of parameters SQLite takes
+        return min(self.batch_size, connection.ops.bulk_batch_size(model._meta.concrete_fields, objs))
+
+    def _dates(self, after: datetime, count: int) -> List[datetime]:
+        """Sorted random dates between after and now"""
+        span = (self.now - after).total_seconds()
+        return sorted(after + timedelta(seconds=self.rng.random() * span) for _ in range(count))
+
+    def _words(self, least: int, most: int) -> str:
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(least, most))).capitalize()
@@ -0,0 +1,104 @@
+# Generated by Django 3.0.7 on 2026-10-18 17:29
+
+from django.db import migrations, models, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+BATCH_SIZE = 1000
+
+
+def _count(queryset, group_by):
+    counts = queryset.order_by().values(group_by).annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(counts, output_field=models.IntegerField()), Value(0))
+
+
+def _latest(posts, field):
+    return Subquery(posts.order_by('-created_at', '-id').values(field)[:1])
+
+
+def _backfill(queryset, fields, using):
+    """Copies the annotated actual_<field> values of the queryset onto its fields, in primary key batches"""
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+            if not batch:
+                break
+            for row in batch:
+                for field in fields:
+                    setattr(row, field, getattr(row, 'actual_' + field))
+            queryset.model.objects.using(using).bulk_update(batch, fields)
+        last_pk = batch[-1].pk
+
+
+def count_activity(apps, schema_editor):
+    """
+    Counts the existing rows, which are only counted from now on by boards.signals. The decrements there would
+    otherwise take the counters below zero, which their CHECK constraints reject
+    """
+    Board = apps.get_model('boards', 'Board')
+    Topic = apps.get_model('boards', 'Topic')
+    Post = apps.get_model('boards', 'Post')
+    using = schema_editor.connection.alias
+
+    topic_posts = Post.objects.using(using).filter(topic=OuterRef('pk'))
+    _backfill(Topic.objects.using(using).annotate(
+        actual_post_count=_count(topic_posts, 'topic'),
+        actual_last_post_at=_latest(topic_posts, 'created_at'),
+        actual_last_post_id=_latest(topic_posts, 'id'),
+    ), ['post_count', 'last_post_at', 'last_post_id'], using)
+
+    board_posts = Post.objects.using(using).filter(topic__board=OuterRef('pk'))
+    _backfill(Board.objects.using(using).annotate(
+        actual_topic_count=_count(Topic.objects.using(using).filter(board=OuterRef('pk')), 'board'),
+        actual_post_count=_count(board_posts, 'topic__board'),
+        actual_last_post_at=_latest(board_posts, 'created_at'),
+        actual_last_post_id=_latest(board_posts, 'id'),
+    ), ['topic_count', 'post_count', 'last_post_at', 'last_post_id'], using)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0003_topic_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='last_post_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='last_post_id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='topic_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='last_post_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='last_post_id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.7 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0004_activity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.0.7 on 2026-10-18 17:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+import core.utils.migrations
+
+
+def create_sqlite_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE boards_post_fts USING fts5(title, message, tokenize='porter unicode61')"
+        )
+
+
+def drop_sqlite_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE boards_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_modified_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='boards.Post')),
+                ('vector', django.contrib.postgres.search.SearchVectorField()),
+            ],
+        ),
+        core.utils.migrations.PostgresOnly(
+            migrations.AddIndex(
+                model_name='postsearchdocument',
+                index=django.contrib.postgres.indexes.GinIndex(fields=['vector'], name='boards_post_search_gin'),
+            ),
+        ),
+        migrations.RunPython(create_sqlite_index, drop_sqlite_index),
+        # The existing posts are indexed by the index_posts command, outside of the migration
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.0.7 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+import core.utils.migrations
+
+
+class Migration(migrations.Migration):
+    # The indexes are built concurrently, outside of a transaction
+    atomic = False
+
+    dependencies = [
+        ('boards', '0006_post_search'),
+    ]
+
+    operations = [
+        core.utils.migrations.AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='boards_post_author_created_idx'),
+        ),
+        core.utils.migrations.AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(edited_at__isnull=False), fields=['topic', 'edited_at', 'id'], name='boards_post_topic_edited_idx'),
+        ),
+    ]
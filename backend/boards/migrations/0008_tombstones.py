@@ -0,0 +1,23 @@
+# Generated by Django 3.0.7 on 2026-10-18 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0007_post_author_edited_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='deleted_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='deleted_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.0.7 on 2026-10-18 18:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Weight of the posts relative to the epoch, the exponent clamped within the range of floats
+WEIGHT_SQL = {
+    'postgresql': 'POWER(2, GREATEST(EXTRACT(EPOCH FROM post.created_at - %s) / %s, -512))',
+    'sqlite': 'POWER(2, MAX((julianday(post.created_at) - julianday(%s)) * 86400 / %s, -512))',
+}
+
+
+def rank_topics(apps, schema_editor):
+    """Scores the existing topics from their posts, in a single INSERT ... SELECT"""
+    Board = apps.get_model('boards', 'Board')
+    Topic = apps.get_model('boards', 'Topic')
+    Post = apps.get_model('boards', 'Post')
+    TopicRanking = apps.get_model('boards', 'TopicRanking')
+    connection = schema_editor.connection
+    now = django.utils.timezone.now()
+    Board.objects.using(connection.alias).update(hot_epoch=now)
+    schema_editor.execute(
+        f'INSERT INTO {TopicRanking._meta.db_table} (topic_id, board_id, score) '
+        f'SELECT topic.id, topic.board_id, COALESCE(scores.score, 0) FROM {Topic._meta.db_table} topic '
+        f'LEFT OUTER JOIN (SELECT post.topic_id, SUM({WEIGHT_SQL[connection.vendor]}) AS score '
+        f'FROM {Post._meta.db_table} post GROUP BY post.topic_id) scores ON scores.topic_id = topic.id '
+        f'WHERE topic.deleted_at IS NULL',
+        [connection.ops.adapt_datetimefield_value(now), settings.HOT_TOPICS['HALF_LIFE']]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='hot_epoch',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='TopicRanking',
+            fields=[
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='boards.Topic')),
+                ('score', models.FloatField(default=0)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_rankings', to='boards.Board')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='topicranking',
+            index=models.Index(fields=['board', '-score', '-topic'], name='boards_topicranking_hot_idx'),
+        ),
+        migrations.RunPython(rank_topics, migrations.RunPython.noop),
+    ]
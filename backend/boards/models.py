@@ -1,4 +1,6 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -8,6 +10,20 @@ class Board(models.Model):
     description = models.CharField(max_length=100)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Last change of the board or of anything shown in its topic list, see boards.signals
+    modified_at = models.DateTimeField(auto_now=True)
+
+    # Denormalized activity, maintained by boards.signals
+    topic_count = models.PositiveIntegerField(default=0)
+    post_count = models.PositiveIntegerField(default=0)
+    last_post_at = models.DateTimeField(null=True)
+    last_post_id = models.IntegerField(null=True)
+
+    # Time the hot scores of its topics are relative to, moved forward by boards.ranking
+    hot_epoch = models.DateTimeField(default=timezone.now)
+
+    # Tombstone of a deleted board, hidden while its rows are removed in the background, see core.cascades
+    deleted_at = models.DateTimeField(null=True)
 
     def __str__(self):
         return self.title
@@ -20,10 +36,32 @@ class Topic(models.Model):
 
     title = models.CharField(unique=True, max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Last change of the topic or of its list of posts, see boards.signals
+    modified_at = models.DateTimeField(auto_now=True)
+
+    # Denormalized activity, maintained by boards.signals
+    post_count = models.PositiveIntegerField(default=0)
+    last_post_at = models.DateTimeField(null=True)
+    last_post_id = models.IntegerField(null=True)
+
+    # Tombstone of a deleted topic, or of a topic of a deleted board, see core.cascades
+    deleted_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['board', 'created_at', 'id'], name='boards_topic_board_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # The board counters are updated by a post_save receiver, within the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class Post(models.Model):
     """Model representing a post made by a user"""
@@ -34,11 +72,62 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     edited_at = models.DateTimeField(null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'created_at', 'id'], name='boards_post_topic_created_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='boards_post_author_created_idx'),
+            # Edits since a point in time, looked up by the event streams. Most posts are never edited.
+            models.Index(fields=['topic', 'edited_at', 'id'], name='boards_post_topic_edited_idx',
+                         condition=models.Q(edited_at__isnull=False)),
+        ]
+
     def __str__(self):
         return self.message[:20]
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # The topic and board counters are updated by a post_save receiver, within the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def edit_message(self, new_message: str) -> None:
         """Sets a new message and updates the edited_at field accordingly"""
         self.message = new_message
         self.edited_at = timezone.now()
         self.save(update_fields=['message', 'edited_at'])
+
+
+class TopicRanking(models.Model):
+    """
+    Hot score of a topic, the sum of the decayed weights of its posts, maintained by boards.ranking
+
+    The scores are relative to the hot_epoch of the board, so a new post only adds its weight to the
+    score of its topic and the hottest topics of a board are read in order from the index.
+    """
+    topic = models.OneToOneField('Topic', on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    board = models.ForeignKey('Board', on_delete=models.CASCADE, related_name='topic_rankings')
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['board', '-score', '-topic'], name='boards_topicranking_hot_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic_id}: {self.score}'
+
+
+class PostSearchDocument(models.Model):
+    """
+    Full text search document of a post, weighting the title of its topic over its message
+
+    Maintained by boards.search on PostgreSQL, other databases keep their own index.
+    """
+    post = models.OneToOneField('Post', on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    vector = SearchVectorField()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['vector'], name='boards_post_search_gin'),
+        ]
@@ -0,0 +1,113 @@
+"""
+Hot topics of the boards, ranked by the activity of their posts decayed over time
+
+A post weighs 2 ** (age / HALF_LIFE) less than a new one. The score of a topic is the sum of the
+weights of its posts relative to the hot_epoch of its board: a new post adds 2 ** ((created_at -
+hot_epoch) / HALF_LIFE) to the score of its topic, which keeps every score of the board in the same
+scale without touching the other topics. Once the epoch is REBASE_AFTER seconds old, a job moves it
+to the present and scales the scores of the board down by the decay in between, so that the weights
+never grow out of the range of floats. Should no worker run, the post that finds the epoch MAX_EXPONENT
+half-lives old rebases the board itself.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Case, F, FloatField, Subquery, Value, When
+from django.utils import timezone
+
+from boards.models import Board, Topic, Post, TopicRanking
+from core.jobs import enqueue, task
+
+
+REBASE_TASK = 'boards.rebase_hot_topics'
+
+# Weights stay within 2 ** -MAX_EXPONENT and 2 ** MAX_EXPONENT, far from the limits of floats:
+# PostgreSQL raises on the overflow and on the underflow of float8 alike
+MAX_EXPONENT = 512
+
+# Weight of the posts of the topics relative to the epoch, per vendor. The exponent is clamped, the
+# older posts weigh as little as a post MAX_EXPONENT half-lives old.
+WEIGHT_SQL = {
+    'postgresql': 'POWER(2, GREATEST(EXTRACT(EPOCH FROM post.created_at - %s) / %s, %s))',
+    'sqlite': 'POWER(2, MAX((julianday(post.created_at) - julianday(%s)) * 86400 / %s, %s))',
+}
+
+
+def post_weight(created_at: datetime, epoch: datetime) -> float:
+    """Weight of a post created at the time, relative to the epoch"""
+    return 2.0 ** ((created_at - epoch).total_seconds() / settings.HOT_TOPICS['HALF_LIFE'])
+
+
+def _lock_epoch(topic_id: int, using: str) -> Optional[tuple]:
+    """Locks the board of the topic, returning its id and hot epoch. The rebasing job takes the same lock."""
+    topic_board = Topic.objects.using(using).filter(pk=topic_id).values('board_id')
+    return (Board.objects.using(using).select_for_update().filter(pk=Subquery(topic_board))
+            .values_list('pk', 'hot_epoch').first())
+
+
+def rank_topic(topic: Topic, using: str = DEFAULT_DB_ALIAS) -> None:
+    """Adds a new topic to the ranking of its board, its posts add up its score"""
+    TopicRanking.objects.using(using).create(topic=topic, board_id=topic.board_id)
+
+
+def rank_post(post: Post, using: str = DEFAULT_DB_ALIAS, sign: int = 1) -> None:
+    """Adds the weight of a new post to the score of its topic, or takes back the weight of a deleted one (sign=-1)"""
+    board = _lock_epoch(post.topic_id, using)
+    if board is None:
+        return
+    board_id, epoch = board
+    now = timezone.now()
+    if (now - epoch).total_seconds() >= MAX_EXPONENT * settings.HOT_TOPICS['HALF_LIFE']:
+        # The weight of the post would near the range of floats, the board cannot wait for the job
+        _rebase(board_id, epoch, now, using)
+        epoch = now
+    TopicRanking.objects.using(using).filter(topic=post.topic_id).update(
+        score=F('score') + sign * post_weight(post.created_at, epoch)
+    )
+    if now - epoch >= timedelta(seconds=settings.HOT_TOPICS['REBASE_AFTER']):
+        enqueue(REBASE_TASK, unique=True, using=using, board=board_id)
+
+
+def _rebase(board_id: int, epoch: datetime, now: datetime, using: str) -> None:
+    """Moves the hot epoch of the locked board to now, scaling its scores down by the decay in between"""
+    decay = (now - epoch).total_seconds() / settings.HOT_TOPICS['HALF_LIFE']
+    # The scores that would fall under 2 ** -MAX_EXPONENT are zeroed rather than multiplied, which
+    # would underflow. They weigh nothing next to any new post anyway, the cap keeps the floor a float.
+    floor = 2.0 ** min(decay - MAX_EXPONENT, MAX_EXPONENT * 3 // 2)
+    TopicRanking.objects.using(using).filter(board=board_id).update(score=Case(
+        When(score__lt=floor, then=Value(0.0)),
+        default=F('score') * 2.0 ** -decay,
+        output_field=FloatField(),
+    ))
+    Board.objects.using(using).filter(pk=board_id).update(hot_epoch=now)
+
+
+@task(REBASE_TASK)
+def rebase_hot_topics(board: int) -> None:
+    """Moves the hot epoch of the board to the present, scaling its scores down accordingly"""
+    epoch = Board.objects.select_for_update().filter(pk=board).values_list('hot_epoch', flat=True).first()
+    now = timezone.now()
+    if epoch is None or now - epoch < timedelta(seconds=settings.HOT_TOPICS['REBASE_AFTER']):
+        return
+    # The order of the topics does not change, nor does any response
+    _rebase(board, epoch, now, DEFAULT_DB_ALIAS)
+
+
+def rebuild_rankings(using: str = DEFAULT_DB_ALIAS) -> None:
+    """Scores every topic from its posts again in a single INSERT ... SELECT, for the rows inserted without the models"""
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        now = timezone.now()
+        Board.objects.using(using).update(hot_epoch=now)
+        TopicRanking.objects.using(using).all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {TopicRanking._meta.db_table} (topic_id, board_id, score) '
+                f'SELECT topic.id, topic.board_id, COALESCE(scores.score, 0) FROM {Topic._meta.db_table} topic '
+                f'LEFT OUTER JOIN (SELECT post.topic_id, SUM({WEIGHT_SQL[connection.vendor]}) AS score '
+                f'FROM {Post._meta.db_table} post GROUP BY post.topic_id) scores ON scores.topic_id = topic.id '
+                f'WHERE topic.deleted_at IS NULL',
+                [connection.ops.adapt_datetimefield_value(now), settings.HOT_TOPICS['HALF_LIFE'], -MAX_EXPONENT]
+            )
@@ -0,0 +1,110 @@
+import re
+from typing import Sequence
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import F, FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from boards.models import Post, PostSearchDocument, Topic
+
+
+class SearchBackend:
+    """
+    Keeps the full text index of the posts up to date and queries it
+
+    A post is indexed from the title of its topic and its message, the title weighing more.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index_posts(self, post_ids: Sequence[int]) -> None:
+        if post_ids:
+            self._index('post.id IN (%s)' % ', '.join(['%s'] * len(post_ids)), list(post_ids))
+
+    def index_topic(self, topic_id: int) -> None:
+        self._index('post.topic_id = %s', [topic_id])
+
+    def remove_posts(self, post_ids: Sequence[int]) -> None:
+        """Drops the documents of deleted posts, when the database does not cascade to them"""
+
+    def search(self, posts: QuerySet, terms: str) -> QuerySet:
+        """Filters the posts matching every term, annotated with their `rank`, the best being the highest"""
+        raise NotImplementedError
+
+    def _index(self, where: str, params: list) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def _documents(where: str) -> str:
+        """SELECT of the post id, topic title and message of the posts to index"""
+        return (f'SELECT post.id, topic.title, post.message FROM {Post._meta.db_table} post '
+                f'INNER JOIN {Topic._meta.db_table} topic ON topic.id = post.topic_id WHERE {where}')
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector documents in PostSearchDocument, behind a GIN index"""
+
+    def _index(self, where: str, params: list) -> None:
+        config = settings.SEARCH_CONFIG
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {PostSearchDocument._meta.db_table} (post_id, vector) '
+                f'SELECT document.id, setweight(to_tsvector(%s::regconfig, document.title), \'A\') || '
+                f'setweight(to_tsvector(%s::regconfig, document.message), \'B\') '
+                f'FROM ({self._documents(where)}) document '
+                f'ON CONFLICT (post_id) DO UPDATE SET vector = EXCLUDED.vector',
+                [config, config] + params
+            )
+
+    def search(self, posts: QuerySet, terms: str) -> QuerySet:
+        query = SearchQuery(terms, config=settings.SEARCH_CONFIG)
+        # ts_rank() is a real, the cursors of the pagination need the exact value
+        return posts.filter(search_document__vector=query).annotate(
+            rank=Cast(SearchRank(F('search_document__vector'), query), FloatField())
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 table, used to run the search locally and in the tests"""
+    table = 'boards_post_fts'
+
+    def _index(self, where: str, params: list) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'INSERT OR REPLACE INTO {self.table} (rowid, title, message) {self._documents(where)}',
+                           params)
+
+    def remove_posts(self, post_ids: Sequence[int]) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN (%s)' % ', '.join(['%s'] * len(post_ids)),
+                           list(post_ids))
+
+    def search(self, posts: QuerySet, terms: str) -> QuerySet:
+        # Every term is quoted, so that the FTS5 query syntax is never interpreted
+        match = ' '.join('"%s"' % word for word in re.findall(r'\w+', terms))
+        if not match:
+            return posts.none()
+        table, post_table = self.table, Post._meta.db_table
+        # bm25() is lower for better matches, the title column weighing as much as ten messages
+        rank = RawSQL(f'SELECT -bm25({table}, 10.0, 1.0) FROM {table} '
+                      f'WHERE {table} MATCH %s AND {table}.rowid = {post_table}.id', [match], output_field=FloatField())
+        matches = RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match])
+        return posts.filter(pk__in=matches).annotate(rank=rank)
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend(using: str = 'default') -> SearchBackend:
+    connection = connections[using]
+    try:
+        return BACKENDS[connection.vendor](connection)
+    except KeyError:
+        raise ImproperlyConfigured(f'Full text search is not supported on {connection.vendor}')
@@ -1,15 +1,29 @@
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import OuterRef, Prefetch, QuerySet, Subquery
 from django.http import HttpRequest
 
-from rest_framework.reverse import reverse
 from rest_framework import serializers
 
 from accounts.serializers import ProfileWithHyperlinkSerializer
 from boards.models import Board, Topic, Post
+from core.extensions.compiled import CompiledSerializer
+from core.extensions.hyperlinks import HrefField
+from core.extensions.serializers import DynamicFieldsModelSerializer, ExpandedMethodField
+from core.utils.queries import prefetch_window
 
 
-class PostSerializer(serializers.ModelSerializer):
-    """Serializer for the post object"""
-    author = ProfileWithHyperlinkSerializer(read_only=True)
+class PostSerializer(DynamicFieldsModelSerializer):
+    """Serializer for the post object, its author given by id unless expanded"""
+    expandable_fields = {
+        'author': lambda expand: ProfileWithHyperlinkSerializer(read_only=True),
+    }
+
+    @staticmethod
+    def setup_eager_loading(queryset: QuerySet, expand: dict) -> QuerySet:
+        if 'author' in expand:
+            queryset = queryset.select_related('author')
+        return queryset
 
     class Meta:
         model = Post
@@ -17,8 +31,12 @@ class PostSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'topic', 'created_at', 'edited_at', 'author')
 
     def update(self, instance: Post, validated_data):
-        message = validated_data.pop('message')
-        instance.edit_message(message)
+        message = validated_data.pop('message', None)
+        if message is not None:
+            instance.edit_message(message)
+        if not validated_data:
+            # Nothing left to save, edit_message already wrote the post
+            return instance
         return super().update(instance, validated_data)
 
     def create(self, validated_data: dict) -> Post:
@@ -29,17 +47,18 @@ class PostSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class PostSearchSerializer(PostSerializer):
+    """Serializer for a post found by a search, with its rank (READ ONLY)"""
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ('rank',)
+        read_only_fields = fields
+
+
 class TopicWithHyperLinkSerializer(serializers.ModelSerializer):
     """Serializer with link and name for the Topic object (READ ONLY)"""
-    href = serializers.SerializerMethodField()
-
-    def get_href(self, obj: Topic):
-        """Return url for current object"""
-        request = self.context['request']
-        return reverse('boards:boards-topic-detail', request=request, kwargs={
-            'parent_lookup_board': obj.board_id,
-            'pk': obj.id
-        })
+    href = HrefField('boards:boards-topic-detail', {'parent_lookup_board': 'board_id', 'pk': 'id'})
 
     class Meta:
         model = Topic
@@ -47,10 +66,30 @@ class TopicWithHyperLinkSerializer(serializers.ModelSerializer):
         read_only_fields = ('href', 'title')
 
 
-class TopicSerializer(serializers.ModelSerializer):
-    """Detailed serializer for the topic object"""
-    starter = ProfileWithHyperlinkSerializer(read_only=True)
-    posts = PostSerializer(many=True, read_only=True)
+class TopicSerializer(DynamicFieldsModelSerializer):
+    """Detailed serializer for the topic object, its posts given by the href of their list unless expanded"""
+    posts = HrefField('boards:boards-topics-post-list', {'parent_lookup_topic__board': 'board_id',
+                                                         'parent_lookup_topic': 'id'})
+
+    expandable_fields = {
+        'starter': lambda expand: ProfileWithHyperlinkSerializer(read_only=True),
+        'posts': lambda expand: PostSerializer(many=True, read_only=True, expand=expand),
+    }
+
+    @staticmethod
+    def get_posts_queryset() -> QuerySet:
+        """Posts of a topic, in the order they are serialized"""
+        return Post.objects.order_by('created_at', 'id')
+
+    @staticmethod
+    def setup_eager_loading(queryset: QuerySet, expand: dict) -> QuerySet:
+        """Loads every expanded relation with one join or one query, whatever the amount of posts"""
+        if 'starter' in expand:
+            queryset = queryset.select_related('starter')
+        if 'posts' in expand:
+            posts = PostSerializer.setup_eager_loading(TopicSerializer.get_posts_queryset(), expand['posts'])
+            queryset = queryset.prefetch_related(Prefetch('posts', queryset=posts))
+        return queryset
 
     class Meta:
         model = Topic
@@ -59,17 +98,43 @@ class TopicSerializer(serializers.ModelSerializer):
 
 
 # noinspection PyMethodMayBeStatic
-class TopicListSerializer(serializers.ModelSerializer):
-    """Detailed serializer for the topic object"""
-    starter = ProfileWithHyperlinkSerializer(read_only=True)
-    first_post = serializers.SerializerMethodField()
-    post_count = serializers.SerializerMethodField()
+class TopicListSerializer(DynamicFieldsModelSerializer):
+    """Serializer for the topics of a list, their first post given by id unless expanded"""
+    first_post = serializers.IntegerField(source='first_post_id', read_only=True)
+
+    expandable_fields = {
+        'starter': lambda expand: ProfileWithHyperlinkSerializer(read_only=True),
+        'first_post': lambda expand: ExpandedMethodField(PostSerializer),
+    }
+    field_requirements = {'first_post': ('first_post_id', 'first_posts')}
+
+    @staticmethod
+    def get_first_post_id(topic: str = 'pk') -> Subquery:
+        """Id of the first post of the topic given by the outer reference"""
+        return Subquery(Post.objects.filter(topic=OuterRef(topic)).order_by('created_at', 'id').values('pk')[:1])
+
+    @staticmethod
+    def get_first_posts_queryset() -> QuerySet:
+        """The first post of every topic"""
+        return Post.objects.filter(pk=TopicListSerializer.get_first_post_id('topic'))
+
+    @staticmethod
+    def setup_eager_loading(queryset: QuerySet, expand: dict) -> QuerySet:
+        """Loads everything the serializer needs in a fixed number of queries, whatever the amount of topics"""
+        if 'starter' in expand:
+            queryset = queryset.select_related('starter')
+        if 'first_post' not in expand:
+            return queryset.annotate(first_post_id=TopicListSerializer.get_first_post_id())
+        first_posts = PostSerializer.setup_eager_loading(TopicListSerializer.get_first_posts_queryset(),
+                                                         expand['first_post'])
+        return queryset.prefetch_related(Prefetch('posts', queryset=first_posts, to_attr='first_posts'))
 
     def get_first_post(self, obj: Topic):
-        return PostSerializer(obj.posts.order_by('created_at').first(), read_only=True, context=self.context).data
-
-    def get_post_count(self, obj: Topic):
-        return obj.posts.count()
+        if hasattr(obj, 'first_posts'):
+            first_post = obj.first_posts[0] if obj.first_posts else None
+        else:
+            first_post = obj.posts.order_by('created_at', 'id').first()
+        return PostSerializer(first_post, read_only=True, context=self.context, expand=self.expand['first_post']).data
 
     class Meta:
         model = Topic
@@ -93,17 +158,63 @@ class CreateTopicSerializer(serializers.ModelSerializer):
         request: HttpRequest = self.context['request']
         message = validated_data.pop('message')
         validated_data['starter'] = request.user.profile
-        topic = super().create(validated_data)
-        Post.objects.create(author=request.user.profile, message=message, topic=topic)
+        with transaction.atomic():
+            topic = super().create(validated_data)
+            Post.objects.create(author=request.user.profile, message=message, topic=topic)
 
         return topic
 
 
-class BoardSerializer(serializers.ModelSerializer):
-    """Serializer for the board model"""
-    topics = TopicWithHyperLinkSerializer(read_only=True, many=True)
+class BoardListSerializer(serializers.ListSerializer):
+    """List serializer prefetching the recent topics of all the boards at once"""
+
+    def to_representation(self, data):
+        boards = list(data.all() if isinstance(data, models.Manager) else data)
+        if 'topics' in self.child.expanded:
+            BoardSerializer.prefetch_recent_topics(boards)
+        return super().to_representation(boards)
+
+
+# noinspection PyMethodMayBeStatic
+class BoardSerializer(DynamicFieldsModelSerializer):
+    """Serializer for the board model, embedding its most recent topics when they are expanded"""
+    topics = HrefField('boards:boards-topic-list', {'parent_lookup_board': 'id'})
+
+    expandable_fields = {
+        'topics': lambda expand: serializers.SerializerMethodField(),
+    }
+    # The recent topics are loaded by prefetch_recent_topics
+    field_requirements = {'topics': ()}
+
+    recent_topics_ordering = ('-created_at', '-id')
+
+    @staticmethod
+    def prefetch_recent_topics(boards: list) -> None:
+        """Loads the BOARD_RECENT_TOPICS most recent topics of every board in a single query"""
+        prefetch_window(boards, Topic.objects.filter(deleted_at__isnull=True), 'board',
+                        BoardSerializer.recent_topics_ordering,
+                        limit=settings.BOARD_RECENT_TOPICS, to_attr='recent_topics')
+
+    def get_topics(self, obj: Board):
+        if not hasattr(obj, 'recent_topics'):
+            self.prefetch_recent_topics([obj])
+        return TopicWithHyperLinkSerializer(obj.recent_topics, many=True, context=self.context).data
 
     class Meta:
         model = Board
-        fields = ('id', 'title', 'description', 'created_at', 'topics')
-        read_only_fields = ('id', 'topics', 'created_at')
+        fields = ('id', 'title', 'description', 'created_at', 'topic_count', 'topics')
+        read_only_fields = ('id', 'topic_count', 'topics', 'created_at')
+        list_serializer_class = BoardListSerializer
+
+
+# noinspection PyMethodMayBeStatic
+class CompiledTopicListSerializer(CompiledSerializer):
+    """Compiled TopicListSerializer, the first posts are looked up in one query"""
+    serializer_class = TopicListSerializer
+
+    def resolve_first_post(self, rows: list, context: dict) -> dict:
+        posts = TopicListSerializer.get_first_posts_queryset().filter(topic__in=[row['id'] for row in rows])
+        return dict(posts.values_list('topic', 'pk'))
+
+    def default_first_post(self, context: dict):
+        return None
@@ -0,0 +1,223 @@
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models import Case, F, OuterRef, Q, QuerySet, Subquery, Value, When
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import Profile, User, renamed
+from boards.models import Board, Topic, Post, TopicRanking
+from boards.ranking import rank_post, rank_topic
+from boards.search import get_search_backend
+from boards.streams import POST_CREATED, POST_EDITED, post_event
+from core.cascades import tombstoned
+from core.events import publish
+from core.response_cache import version_stamps
+
+
+def _record_new_post(queryset: QuerySet, post: Post) -> None:
+    """Counts a new post on the rows of the queryset, moving their last post forward if it is more recent"""
+    is_newer = Q(last_post_at__isnull=True) | Q(last_post_at__lt=post.created_at)
+    is_newer |= Q(last_post_at=post.created_at, last_post_id__lt=post.id)
+    queryset.update(
+        modified_at=timezone.now(),
+        post_count=F('post_count') + 1,
+        last_post_at=Case(When(is_newer, then=Value(post.created_at)), default=F('last_post_at'),
+                          output_field=models.DateTimeField()),
+        last_post_id=Case(When(is_newer, then=Value(post.id)), default=F('last_post_id'),
+                          output_field=models.IntegerField()),
+    )
+
+
+def _reset_last_post(queryset: QuerySet, posts: QuerySet) -> None:
+    """Looks up the last post of each row again. posts must be filtered on OuterRef('pk')"""
+    latest = posts.order_by('-created_at', '-id')
+    queryset.update(
+        last_post_at=Subquery(latest.values('created_at')[:1]),
+        last_post_id=Subquery(latest.values('id')[:1]),
+    )
+
+
+def _topic_board(topic_id: int) -> QuerySet:
+    return Board.objects.filter(pk=Subquery(Topic.objects.filter(pk=topic_id).values('board_id')))
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance: Post, created: bool, **kwargs):
+    if created:
+        _record_new_post(Topic.objects.filter(pk=instance.topic_id), instance)
+        _record_new_post(_topic_board(instance.topic_id), instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance: Post, **kwargs):
+    topics = Topic.objects.filter(pk=instance.topic_id)
+    boards = _topic_board(instance.topic_id)
+    now = timezone.now()
+    topics.update(post_count=F('post_count') - 1, modified_at=now)
+    boards.update(post_count=F('post_count') - 1, modified_at=now)
+
+    _reset_last_post(topics.filter(last_post_id=instance.id), Post.objects.filter(topic=OuterRef('pk')))
+    _reset_last_post(boards.filter(last_post_id=instance.id),
+                     Post.objects.filter(topic__board=OuterRef('pk'), topic__deleted_at__isnull=True))
+
+
+@receiver(post_save, sender=Post)
+def touch_edited_post(sender, instance: Post, created: bool, **kwargs):
+    if not created:
+        # The post list of the topic, and the topic list of its board, show the message of the posts
+        now = timezone.now()
+        Topic.objects.filter(pk=instance.topic_id).update(modified_at=now)
+        _topic_board(instance.topic_id).update(modified_at=now)
+
+
+@receiver(post_save, sender=Post)
+def rank_created_post(sender, instance: Post, created: bool, using: str, **kwargs):
+    if created:
+        rank_post(instance, using)
+
+
+@receiver(post_delete, sender=Post)
+def unrank_deleted_post(sender, instance: Post, using: str, **kwargs):
+    rank_post(instance, using, sign=-1)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance: Post, created: bool, update_fields, using: str, **kwargs):
+    if created or update_fields is None or 'message' in update_fields:
+        get_search_backend(using).index_posts([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance: Post, using: str, **kwargs):
+    get_search_backend(using).remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=Topic)
+def count_created_topic(sender, instance: Topic, created: bool, **kwargs):
+    boards = Board.objects.filter(pk=instance.board_id)
+    if created:
+        boards.update(topic_count=F('topic_count') + 1, modified_at=timezone.now())
+    else:
+        # The topic list of the board shows the topic
+        boards.update(modified_at=timezone.now())
+
+
+@receiver(post_save, sender=Topic)
+def rank_created_topic(sender, instance: Topic, created: bool, using: str, **kwargs):
+    if created:
+        rank_topic(instance, using)
+
+
+@receiver(post_save, sender=Topic)
+def index_saved_topic(sender, instance: Topic, created: bool, update_fields, using: str, **kwargs):
+    # The title of the topic is part of the search documents of its posts
+    if not created and (update_fields is None or 'title' in update_fields):
+        get_search_backend(using).index_topic(instance.pk)
+
+
+@receiver(post_delete, sender=Topic)
+def count_deleted_topic(sender, instance: Topic, **kwargs):
+    if instance.deleted_at is not None:
+        # Uncounted when it was tombstoned
+        return
+    Board.objects.filter(pk=instance.board_id).update(topic_count=F('topic_count') - 1, modified_at=timezone.now())
+
+
+@receiver(tombstoned, sender=Topic)
+def uncount_tombstoned_topic(sender, instance: Topic, **kwargs):
+    topics = Topic.objects.filter(pk=instance.pk)
+    boards = Board.objects.filter(pk=instance.board_id)
+    now = timezone.now()
+    topics.update(modified_at=now)
+    boards.update(topic_count=F('topic_count') - 1, post_count=F('post_count') - Subquery(topics.values('post_count')),
+                  modified_at=now)
+    _reset_last_post(boards.filter(last_post_id__in=Post.objects.filter(topic=instance.pk).values('pk')),
+                     Post.objects.filter(topic__board=OuterRef('pk'), topic__deleted_at__isnull=True))
+
+
+@receiver(tombstoned, sender=Topic)
+def unrank_tombstoned_topic(sender, instance: Topic, using: str, **kwargs):
+    TopicRanking.objects.using(using).filter(topic=instance.pk).delete()
+
+
+def touch_topics(topics: QuerySet, using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    The topics show a username that changed, they and their boards are touched
+
+    Only the cached responses of these topics, and of the topic lists of their boards, are dropped.
+    """
+    rows = set(topics.using(using).values_list('pk', 'board_id'))
+    topic_ids = {pk for pk, _ in rows}
+    board_ids = {board_id for _, board_id in rows}
+    now = timezone.now()
+    Board.objects.using(using).filter(pk__in=board_ids).update(modified_at=now)
+    Topic.objects.using(using).filter(pk__in=topic_ids).update(modified_at=now)
+    version_stamps.bump(*(f'board:{pk}' for pk in board_ids), *(f'topic:{pk}' for pk in topic_ids))
+
+
+def _touch_profile_topics(profile: Profile, using: str) -> None:
+    """The username is shown in the topics the profile started or posted in, and in the topic lists of their boards"""
+    touch_topics(Topic.objects.filter(Q(starter=profile) | Q(posts__author=profile)), using)
+
+
+@receiver(post_save, sender=Profile)
+def touch_saved_profile(sender, instance: Profile, created: bool, using: str, **kwargs):
+    if not created and instance.username_changed:
+        touch_renamed_profile(sender, instance, using)
+    instance._loaded_username = instance.username
+
+
+@receiver(renamed, sender=Profile)
+def touch_renamed_profile(sender, instance: Profile, using: str, **kwargs):
+    _touch_profile_topics(instance, using)
+
+
+@receiver(pre_delete, sender=Profile)
+def touch_deleted_profile(sender, instance: Profile, using: str, **kwargs):
+    # Runs before the posts and topics of the profile lose their author
+    _touch_profile_topics(instance, using)
+
+
+@receiver(tombstoned, sender=User)
+def touch_tombstoned_user(sender, instance: User, using: str, **kwargs):
+    # The profile is hidden at once, its posts and topics lose their author in the background
+    _touch_profile_topics(instance.profile, using)
+
+
+def _post_board_id(post: Post) -> int:
+    if Post.topic.is_cached(post):
+        return post.topic.board_id
+    return Topic.objects.filter(pk=post.topic_id).values_list('board_id', flat=True).first()
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+@receiver(tombstoned, sender=Board)
+def bump_board_versions(sender, instance: Board, **kwargs):
+    version_stamps.bump('boards', f'board:{instance.pk}')
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(tombstoned, sender=Topic)
+def bump_topic_versions(sender, instance: Topic, **kwargs):
+    # The boards embed their recent topics
+    version_stamps.bump('boards', f'board:{instance.board_id}', f'topic:{instance.pk}')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_versions(sender, instance: Post, **kwargs):
+    # The topic list of the board shows the first post and the post count of the topic
+    version_stamps.bump(f'board:{_post_board_id(instance)}', f'topic:{instance.topic_id}')
+
+
+@receiver(post_save, sender=Post)
+def publish_saved_post(sender, instance: Post, created: bool, update_fields, using: str, **kwargs):
+    if created:
+        name = POST_CREATED
+    elif instance.edited_at is not None and (update_fields is None or 'message' in update_fields):
+        name = POST_EDITED
+    else:
+        return
+    publish(post_event(name, instance, _post_board_id(instance)), using)
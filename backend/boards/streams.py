@@ -0,0 +1,72 @@
+from typing import List, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils.translation import gettext as _
+
+from rest_framework.renderers import JSONRenderer
+
+from boards.models import Post
+from boards.serializers import PostSerializer
+from boards.views import BoardViewSet, TopicViewSet, PostViewSet
+from core.events import Event, make_event_id, parse_event_id, send_json, stream_events, database_sync_to_async
+
+POST_CREATED = 'post-created'
+POST_EDITED = 'post-edited'
+
+
+def post_event(name: str, post: Post, board_id: int) -> Event:
+    """Event of a created or edited post, its data is the post as the api shows it"""
+    at = post.created_at if name == POST_CREATED else post.edited_at
+    # There is no request, the hrefs are absolute against the configured base
+    serializer = PostSerializer(post, context={'base_url': settings.EVENTS['BASE_URL']})
+    return Event(
+        id=make_event_id(at, post.pk),
+        name=name,
+        channels=(f'topic:{post.topic_id}', f'board:{board_id}'),
+        data=JSONRenderer().render(serializer.data).decode(),
+    )
+
+
+def replay_posts(posts: QuerySet, board_id: int, last_event_id: str, limit: int) -> Optional[List[Event]]:
+    """Events of the posts created or edited after an event, None if there are more than limit"""
+    at, pk = parse_event_id(last_event_id)
+    # A range on the time, rather than an OR, so that the (topic, time, id) indexes are scanned
+    created = posts.filter(created_at__gte=at).exclude(created_at=at, pk__lte=pk).order_by('created_at', 'pk')
+    edited = posts.filter(edited_at__gte=at).exclude(edited_at=at, pk__lte=pk).order_by('edited_at', 'pk')
+
+    events = [post_event(POST_CREATED, post, board_id) for post in created[:limit + 1]]
+    events += [post_event(POST_EDITED, post, board_id) for post in edited[:limit + 1]]
+    if len(events) > limit:
+        return None
+    return sorted(events, key=lambda event: parse_event_id(event.id))
+
+
+async def topic_stream(scope: dict, receive, send, board: int, topic: int):
+    """Events of the posts of a topic"""
+    # The tombstoned topics and boards are hidden like in the api
+    exists = TopicViewSet.queryset.filter(pk=topic, board_id=board).exists
+    if not await database_sync_to_async(exists)():
+        return await send_json(send, 404, {'detail': _('Not found.')})
+
+    def replay(last_event_id: str, limit: int) -> Optional[List[Event]]:
+        return replay_posts(PostViewSet.queryset.filter(topic_id=topic), board, last_event_id, limit)
+    await stream_events(scope, receive, send, (f'topic:{topic}',), replay)
+
+
+async def board_stream(scope: dict, receive, send, board: int):
+    """Events of the posts of every topic of a board"""
+    exists = BoardViewSet.queryset.filter(pk=board).exists
+    if not await database_sync_to_async(exists)():
+        return await send_json(send, 404, {'detail': _('Not found.')})
+
+    def replay(last_event_id: str, limit: int) -> Optional[List[Event]]:
+        return replay_posts(PostViewSet.queryset.filter(topic__board_id=board), board, last_event_id, limit)
+    await stream_events(scope, receive, send, (f'board:{board}',), replay)
+
+
+# Served by central.asgi, in front of the django application
+routes = [
+    (r'^/api/boards/(?P<board>\d+)/events/?$', board_stream),
+    (r'^/api/boards/(?P<board>\d+)/topics/(?P<topic>\d+)/events/?$', topic_stream),
+]
@@ -1,5 +1,8 @@
+from django.db import connection
 from django.urls import reverse
+from django.test import override_settings
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 
@@ -28,10 +31,11 @@ class PublicBoardApiTests(APITestCase):
         sample_topic(self.user.profile, board)
         sample_board(title='Another test board', description='Another test board description')
 
-        res = self.client.get(BOARDS_URL)
+        res = self.client.get(BOARDS_URL, {'expand': 'topics'})
 
         boards = Board.objects.all().order_by('id')
-        serializer = BoardSerializer(boards, many=True, context={'request': RequestFactory().get(BOARDS_URL)})
+        serializer = BoardSerializer(boards, many=True, context={'request': RequestFactory().get(BOARDS_URL)},
+                                     expand={'topics': {}})
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
@@ -47,12 +51,44 @@ class PublicBoardApiTests(APITestCase):
 
         res = self.client.get(url)
 
+        board.refresh_from_db()
         serializer = BoardSerializer(board, context={'request': RequestFactory().get(url)})
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['topics'], 'http://testserver' + reverse('boards:boards-topic-list', args=(board.id,)))
+
+        res = self.client.get(url, {'expand': 'topics'})
         self.assertEqual(res.data['topics'][0]['title'], topic.title)
         self.assertAllIn(('id', 'title', 'description', 'topics', 'created_at'), res.data.keys())
 
+    @override_settings(BOARD_RECENT_TOPICS=2)
+    def test_board_embeds_recent_topics_only(self):
+        """Test that only the most recent topics are embedded, with the total count"""
+        board = sample_board()
+        for i in range(4):
+            sample_topic(self.user.profile, board, title=f'Topic {i}')
+
+        res = self.client.get(detail_board_url(board), {'expand': 'topics'})
+
+        self.assertEqual([topic['title'] for topic in res.data['topics']], ['Topic 3', 'Topic 2'])
+        self.assertEqual(res.data['topic_count'], 4)
+
+    def test_board_list_query_count_is_constant(self):
+        """Test that the amount of queries for the board list does not depend on the amount of topics"""
+        board = sample_board(title='Test board')
+        sample_topic(self.user.profile, board)
+        with CaptureQueriesContext(connection) as single_board_queries:
+            self.client.get(BOARDS_URL, {'expand': 'topics'})
+
+        for i in range(3):
+            other_board = sample_board(title=f'Board {i}')
+            for j in range(3):
+                sample_topic(self.user.profile, other_board, title=f'Topic {i}-{j}')
+
+        with self.assertNumQueries(len(single_board_queries)):
+            res = self.client.get(BOARDS_URL, {'expand': 'topics'})
+        self.assertEqual(len(res.data), 4)
+
     def test_create_board(self):
         """Test creating a board"""
         superuser = sample_user(superuser=True, email='super@marsimon.com')
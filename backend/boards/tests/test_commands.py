@@ -0,0 +1,96 @@
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from core.extensions.test import sample_board, sample_user, sample_topic
+from accounts.models import Profile
+from boards.management.commands.seed_forum import zipf_counts
+from boards.models import Board, Topic, Post
+from boards.search import get_search_backend
+
+
+class RecountActivityCommandTests(TestCase):
+    """Tests for the recount_activity management command"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(self.user.profile, self.board)
+        self.post = Post.objects.create(author=self.user.profile, topic=self.topic, message='Test post')
+        Board.objects.update(topic_count=0, post_count=7, last_post_at=None, last_post_id=None)
+        Topic.objects.update(post_count=3)
+
+    def test_check_only_reports(self):
+        """Test that the check option reports stale rows without fixing them"""
+        out = StringIO()
+        call_command('recount_activity', check=True, stdout=out)
+
+        self.assertIn('topics: 1 checked, 1 out of date', out.getvalue())
+        self.assertIn('boards: 1 checked, 1 out of date', out.getvalue())
+        self.assertEqual(Board.objects.get().post_count, 7)
+
+    def test_recount_fixes_counters(self):
+        """Test that the counters are backfilled from the posts and topics"""
+        out = StringIO()
+        call_command('recount_activity', batch_size=1, stdout=out)
+
+        board = Board.objects.get()
+        self.assertEqual(Topic.objects.get().post_count, 1)
+        self.assertEqual(board.topic_count, 1)
+        self.assertEqual(board.post_count, 1)
+        self.assertEqual(board.last_post_id, self.post.id)
+        self.assertEqual(board.last_post_at, self.post.created_at)
+
+        call_command('recount_activity', check=True, stdout=out)
+        self.assertIn('boards: 1 checked, 0 out of date', out.getvalue())
+
+
+class IndexPostsCommandTests(TestCase):
+    """Tests for the index_posts management command"""
+
+    def test_index_posts(self):
+        """Test that the posts missing from the full text index are indexed in batches"""
+        user = sample_user()
+        topic = sample_topic(user.profile, sample_board(), title='Gardening')
+        posts = [Post.objects.create(author=user.profile, topic=topic, message=f'Tomatoes {index}')
+                 for index in range(3)]
+        search = get_search_backend()
+        search.remove_posts([post.pk for post in posts])
+        self.assertFalse(search.search(Post.objects.all(), 'tomatoes').exists())
+
+        out = StringIO()
+        call_command('index_posts', batch_size=2, stdout=out)
+
+        self.assertIn('posts: 3 indexed', out.getvalue())
+        self.assertCountEqual(search.search(Post.objects.all(), 'gardening tomatoes'), posts)
+
+
+class SeedForumCommandTests(TestCase):
+    """Tests for the seed_forum management command"""
+
+    def test_seed_forum(self):
+        """Test that the forum is seeded with the requested sizes, and its counters are up to date"""
+        out = StringIO()
+        call_command('seed_forum', users=20, boards=3, topics=4, posts=5, seed=1, batch_size=7, stdout=out)
+
+        self.assertIn('forum: 20 users, 3 boards, 12 topics, 60 posts', out.getvalue())
+        self.assertEqual(Profile.objects.count(), 20)
+        self.assertFalse(Post.objects.filter(created_at__lt=F('topic__created_at')).exists())
+        self.assertFalse(Topic.objects.filter(post_count=0).exists())
+        self.assertEqual(sum(Board.objects.values_list('post_count', flat=True)), 60)
+        call_command('recount_activity', check=True, stdout=out)
+        self.assertIn('boards: 3 checked, 0 out of date', out.getvalue())
+
+        call_command('seed_forum', users=1, boards=1, topics=1, posts=1, seed=2, stdout=out)
+        self.assertEqual(Board.objects.count(), 4)
+
+    def test_zipf_counts(self):
+        """Test that the items are all shared out, the largest share going to a single owner"""
+        counts = zipf_counts(10000, 100, 1.1, random.Random(0))
+
+        self.assertEqual(sum(counts), 10000)
+        self.assertGreater(max(counts), sorted(counts)[-2] * 1.5)
+        self.assertGreater(max(counts), 100 * min(counts))
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.utils import timezone
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+
+from core.extensions.compiled import CompiledSerializer, CompiledSerializerMismatch
+from core.extensions.test import APITestCase, sample_topic, sample_user, sample_board
+from boards.models import Post
+from boards.serializers import PostSerializer
+
+
+@override_settings(COMPILED_SERIALIZERS={'ENABLED': True, 'VERIFY': True})
+class CompiledSerializerTests(APITestCase):
+    """Tests checking the compiled serializers against the regular ones"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.other_user = sample_user(email='other@marsimon.com')
+        self.board = sample_board(title='Board', description='Board with "quotes" and   héhé')
+        self.empty_board = sample_board(title='Empty board', description='')
+        self.topic = sample_topic(starter=self.user.profile, board=self.board, title='Topic / with ? chars')
+        self.empty_topic = sample_topic(starter=self.other_user.profile, board=self.board, title='No posts')
+        Post.objects.create(author=self.user.profile, message='First post', topic=self.topic)
+        edited = Post.objects.create(author=self.other_user.profile, message='Reply', topic=self.topic)
+        edited.edit_message('Edited reply')
+        Post.objects.create(author=None, message='Post without author', topic=self.topic)
+
+    def test_post_list(self):
+        """Test that the compiled post list matches the post serializer"""
+        res = self.client.get(reverse('boards:boards-topics-post-list', args=(self.board.id, self.topic.id)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertIsNone(res.data['results'][2]['author'])
+
+    def test_topic_list(self):
+        """Test that the compiled topic list matches the topic list serializer"""
+        with patch.object(CompiledSerializer, 'verify', autospec=True, side_effect=CompiledSerializer.verify) as verify:
+            res = self.client.get(reverse('boards:boards-topic-list', args=(self.board.id,)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        verify.assert_called_once()
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_board_list(self):
+        """Test that the compiled board list matches the board serializer"""
+        for i in range(6):
+            sample_topic(starter=self.user.profile, board=self.empty_board, title=f'Topic {i}')
+        with patch.object(CompiledSerializer, 'verify', autospec=True, side_effect=CompiledSerializer.verify) as verify:
+            res = self.client.get(reverse('boards:board-list'), {'format': 'json'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        verify.assert_called_once()
+        self.assertEqual([board['topics'] for board in res.data],
+                         [f'http://testserver{reverse("boards:boards-topic-list", args=(board["id"],))}?format=json'
+                          for board in res.data])
+
+        res = self.client.get(reverse('boards:board-list'), {'format': 'json', 'expand': 'topics'})
+        self.assertEqual([len(board['topics']) for board in res.data], [2, 5])
+
+    def test_paginated_lists(self):
+        """Test that every page of the compiled lists matches the regular serializers"""
+        for i in range(4):
+            topic = sample_topic(starter=self.user.profile, board=self.board, title=f'Topic {i}')
+            Post.objects.create(author=self.user.profile, message=f'Post {i}', topic=topic)
+            Post.objects.create(author=self.other_user.profile, message=f'Reply {i}', topic=self.topic)
+
+        for url in (reverse('boards:boards-topic-list', args=(self.board.id,)),
+                    reverse('boards:boards-topics-post-list', args=(self.board.id, self.topic.id))):
+            res = self.client.get(url, {'page_size': 2})
+            while res.data['next']:
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                res = self.client.get(res.data['next'])
+
+    def test_mismatch_is_detected(self):
+        """Test that the verification mode raises when the compiled output differs"""
+        queryset = Post.objects.filter(topic=self.topic).select_related('author')
+        compiled = CompiledSerializer(PostSerializer)
+        rows = list(compiled.get_rows(queryset))
+        data = compiled.serialize(rows, {})
+        data[0]['created_at'] = timezone.now().isoformat()
+
+        with self.assertRaises(CompiledSerializerMismatch):
+            compiled.verify(queryset, rows, data, {})
+
+    def test_disabled(self):
+        """Test that the regular serializers are used when the compiled serializers are disabled"""
+        url = reverse('boards:boards-topic-list', args=(self.board.id,))
+        with patch.object(CompiledSerializer, 'serialize') as serialize:
+            with self.settings(COMPILED_SERIALIZERS={'ENABLED': False}):
+                res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        serialize.assert_not_called()
@@ -0,0 +1,121 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.reverse import reverse
+from rest_framework import status
+
+from core.extensions.test import APITestCase, sample_topic, sample_user, sample_board
+from boards.models import Post
+
+
+class ConditionalGetTests(APITestCase):
+    """Tests for the ETag and Last-Modified validators of the boards api"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(starter=self.user.profile, board=self.board)
+        self.post = Post.objects.create(author=self.user.profile, message='Test post message', topic=self.topic)
+        self.topic_url = reverse('boards:boards-topic-detail', args=(self.board.id, self.topic.id))
+
+    def assertNotModified(self, url: str, **headers):
+        res = self.client.get(url, **headers)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def assertModified(self, url: str, **headers):
+        res = self.client.get(url, **headers)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_not_modified_without_serializing(self):
+        """Test that a matching If-None-Match gets a 304 from a single query"""
+        etag = self.client.get(self.topic_url)['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertNotModified(self.topic_url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since is answered from the Last-Modified date"""
+        last_modified = self.client.get(self.topic_url)['Last-Modified']
+
+        self.assertNotModified(self.topic_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertModified(self.topic_url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+
+    def test_etag_follows_posts(self):
+        """Test that creating, editing and deleting posts changes the ETag of the topic and its posts"""
+        posts_url = reverse('boards:boards-topics-post-list', args=(self.board.id, self.topic.id))
+        post_url = reverse('boards:boards-topics-post-detail', args=(self.board.id, self.topic.id, self.post.id))
+        urls = (self.topic_url, posts_url, post_url)
+        changes = (
+            lambda: Post.objects.create(author=self.user.profile, message='Reply', topic=self.topic),
+            lambda: self.post.edit_message('Edited message'),
+            lambda: Post.objects.filter(topic=self.topic).exclude(pk=self.post.pk).get().delete(),
+        )
+
+        for change in changes:
+            etags = [self.client.get(url)['ETag'] for url in urls]
+            change()
+            for url, etag in zip(urls, etags):
+                self.assertModified(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_validators_skip_posts(self):
+        """Test that the topic and post lists are validated from the rows their posts touch, not from the posts"""
+        topics_url = reverse('boards:boards-topic-list', args=(self.board.id,))
+        posts_url = reverse('boards:boards-topics-post-list', args=(self.board.id, self.topic.id))
+
+        for url in (self.topic_url, topics_url, posts_url):
+            etag = self.client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as queries:
+                self.assertNotModified(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertFalse(any('"boards_post"' in query['sql'] for query in queries.captured_queries))
+
+            self.post.edit_message(f'Edited for {url}')
+            self.assertModified(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_etag_follows_topics(self):
+        """Test that the board and its topic list change when a topic is created or renamed"""
+        topics_url = reverse('boards:boards-topic-list', args=(self.board.id,))
+        board_url = reverse('boards:board-detail', args=(self.board.id,))
+        urls = (topics_url, board_url, reverse('boards:board-list'))
+        self.client.force_authenticate(self.user)
+        changes = (
+            lambda: sample_topic(starter=self.user.profile, board=self.board, title='Another topic'),
+            lambda: self.client.patch(self.topic_url, {'title': 'Renamed topic'}),
+        )
+
+        for change in changes:
+            etags = [self.client.get(url)['ETag'] for url in urls]
+            change()
+            for url, etag in zip(urls, etags):
+                self.assertModified(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_etag_follows_usernames(self):
+        """Test that renaming the author of a post changes the ETag of the pages showing it"""
+        other_user = sample_user(email='other@marsimon.com')
+        Post.objects.create(author=other_user.profile, message='Reply', topic=self.topic)
+        topics_url = reverse('boards:boards-topic-list', args=(self.board.id,))
+        other_topic = sample_topic(starter=self.user.profile, board=sample_board(title='Other board'), title='Other')
+        other_topic_url = reverse('boards:boards-topic-detail', args=(other_topic.board_id, other_topic.id))
+        urls = (self.topic_url, topics_url, other_topic_url)
+        etags = [self.client.get(url)['ETag'] for url in urls]
+
+        self.assertTrue(other_user.profile.set_username('renamed'))
+
+        self.assertModified(urls[0], HTTP_IF_NONE_MATCH=etags[0])
+        self.assertModified(urls[1], HTTP_IF_NONE_MATCH=etags[1])
+        self.assertNotModified(urls[2], HTTP_IF_NONE_MATCH=etags[2])
+
+    def test_etag_depends_on_query(self):
+        """Test that the ETag differs between the pages and renderings of a resource"""
+        posts_url = reverse('boards:boards-topics-post-list', args=(self.board.id, self.topic.id))
+        etag = self.client.get(posts_url)['ETag']
+
+        self.assertModified(posts_url + '?stream=true', HTTP_IF_NONE_MATCH=etag)
+        self.assertModified(posts_url + '?format=api', HTTP_IF_NONE_MATCH=etag)
+        self.assertNotModified(posts_url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_missing_topic(self):
+        """Test that a missing topic is still a 404 without validators"""
+        res = self.client.get(reverse('boards:boards-topic-detail', args=(self.board.id, self.topic.id + 100)))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(res.has_header('ETag'))
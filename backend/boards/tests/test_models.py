@@ -1,7 +1,7 @@
 from django.test import TestCase
 
 from core.extensions.test import sample_board, sample_user, sample_topic
-from boards.models import Post
+from boards.models import Board, Topic, Post
 
 
 class BoardTests(TestCase):
@@ -48,3 +48,51 @@ class PostTests(TestCase):
         self.post.edit_message(new_message)
         self.assertEqual(self.post.message, new_message)
         self.assertIsNotNone(self.post.edited_at)
+
+
+class ActivityCounterTests(TestCase):
+    """Tests for the denormalized activity counters of boards and topics"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(self.user.profile, self.board)
+
+    def test_counters_follow_created_posts(self):
+        """Test that creating posts updates the topic and board counters"""
+        Post.objects.create(author=self.user.profile, topic=self.topic, message='First post')
+        last_post = Post.objects.create(author=self.user.profile, topic=self.topic, message='Second post')
+
+        topic = Topic.objects.get(pk=self.topic.pk)
+        board = Board.objects.get(pk=self.board.pk)
+        self.assertEqual(topic.post_count, 2)
+        self.assertEqual(topic.last_post_id, last_post.id)
+        self.assertEqual(topic.last_post_at, last_post.created_at)
+        self.assertEqual(board.topic_count, 1)
+        self.assertEqual(board.post_count, 2)
+        self.assertEqual(board.last_post_id, last_post.id)
+
+    def test_counters_follow_deleted_posts(self):
+        """Test that deleting the last post moves the last post back to the previous one"""
+        first_post = Post.objects.create(author=self.user.profile, topic=self.topic, message='First post')
+        Post.objects.create(author=self.user.profile, topic=self.topic, message='Second post').delete()
+
+        topic = Topic.objects.get(pk=self.topic.pk)
+        board = Board.objects.get(pk=self.board.pk)
+        self.assertEqual(topic.post_count, 1)
+        self.assertEqual(topic.last_post_id, first_post.id)
+        self.assertEqual(board.post_count, 1)
+        self.assertEqual(board.last_post_id, first_post.id)
+
+    def test_counters_follow_deleted_topics(self):
+        """Test that deleting a topic removes it and its posts from the board counters"""
+        other_topic = sample_topic(self.user.profile, self.board, title='Other topic')
+        kept_post = Post.objects.create(author=self.user.profile, topic=other_topic, message='Kept post')
+        Post.objects.create(author=self.user.profile, topic=self.topic, message='Deleted post')
+
+        self.topic.delete()
+
+        board = Board.objects.get(pk=self.board.pk)
+        self.assertEqual(board.topic_count, 1)
+        self.assertEqual(board.post_count, 1)
+        self.assertEqual(board.last_post_id, kept_post.id)
@@ -1,4 +1,8 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.reverse import reverse
 from rest_framework.test import APIRequestFactory
 
@@ -32,12 +36,56 @@ class PublicPostApiTests(APITestCase):
         fields_desired = ('id', 'topic', 'author', 'created_at', 'edited_at', 'message')
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
-        self.assertAllIn(fields_desired, res.data[0])
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertAllIn(fields_desired, res.data['results'][0])
 
         serializer = PostSerializer(Post.objects.filter(topic_id=self.topic.id), many=True,
                                     context={'request': APIRequestFactory().get(url)})
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_post_list_cursor_pagination(self):
+        """Test paginating posts forward and backward with cursors while new posts are added"""
+        for i in range(4):
+            Post.objects.create(author=self.user.profile, message=f'Post {i}', topic=self.topic)
+        url = get_post_url(self.board, self.topic)
+
+        first_page = self.client.get(url, {'page_size': 2})
+        self.assertEqual([post['message'] for post in first_page.data['results']], ['Test post message', 'Post 0'])
+        self.assertIsNone(first_page.data['previous'])
+
+        Post.objects.create(author=self.user.profile, message='Post added while paginating', topic=self.topic)
+
+        with CaptureQueriesContext(connection) as queries:
+            second_page = self.client.get(first_page.data['next'])
+        self.assertEqual([post['message'] for post in second_page.data['results']], ['Post 1', 'Post 2'])
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+
+        previous_page = self.client.get(second_page.data['previous'])
+        self.assertEqual(previous_page.data['results'], first_page.data['results'])
+
+        last_page = self.client.get(second_page.data['next'])
+        self.assertEqual([post['message'] for post in last_page.data['results']],
+                         ['Post 3', 'Post added while paginating'])
+        self.assertIsNone(last_page.data['next'])
+
+    def test_post_list_invalid_cursor(self):
+        """Test that a tampered cursor returns a 404 instead of an error"""
+        res = self.client.get(get_post_url(self.board, self.topic), {'cursor': 'cD1ub3QtYS1kYXRlfDE='})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stream_post_list(self):
+        """Test streaming the whole post list of a topic"""
+        for i in range(3):
+            Post.objects.create(author=self.user.profile, message=f'Post {i}', topic=self.topic)
+        url = get_post_url(self.board, self.topic)
+
+        res = self.client.get(url, {'stream': '1'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        serializer = PostSerializer(Post.objects.filter(topic_id=self.topic.id), many=True,
+                                    context={'request': APIRequestFactory().get(url)})
+        self.assertEqual(b''.join(res.streaming_content), JSONRenderer().render(serializer.data))
 
     def test_retrieve_post_detail(self):
         """Test retrieving the details of a given post"""
@@ -151,3 +199,22 @@ class PrivatePostApiTests(APITestCase):
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
         new_post.refresh_from_db()
         self.assertNotEqual(new_post.message, payload['message'])
+
+    def test_update_missing_post(self):
+        """Test that updating a post that does not exist returns a 404"""
+        url = reverse('boards:boards-topics-post-detail', args=(self.board.id, self.topic.id, self.post.id + 100))
+        res = self.client.patch(url, {'message': 'Modified post message'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_post_reads_once_before_writing(self):
+        """Test that the ownership check reuses the post fetched by the view"""
+        url = get_post_url(self.board, self.topic, self.post)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(url, {'message': 'Newly edited message'})
+
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        self.assertEqual(statements[:2], ['SELECT', 'UPDATE'])
+        # The topic and the board of the post are touched too
+        post_updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE "boards_post"')]
+        self.assertEqual(len(post_updates), 1)
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from boards.models import Board, Post, TopicRanking
+from boards.ranking import REBASE_TASK, rebuild_rankings
+from core.cascades import delete_later
+from core.extensions.test import APITestCase, sample_board, sample_topic, sample_user
+from core.jobs import run_next_job
+from core.models import Job
+
+
+class HotTopicsTests(APITestCase):
+    """Tests for the hot topics rankings of the boards"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.board = sample_board(title='Board')
+        self.quiet = sample_topic(starter=self.user.profile, board=self.board, title='Quiet')
+        self.busy = sample_topic(starter=self.user.profile, board=self.board, title='Busy')
+        self.calm = sample_topic(starter=self.user.profile, board=self.board, title='Calm')
+        self.post(self.quiet)
+        for _ in range(3):
+            self.post(self.busy)
+        self.post(self.calm)
+        self.post(self.calm)
+        self.url = reverse('boards:boards-topic-list', args=(self.board.id,))
+
+    def post(self, topic) -> Post:
+        return Post.objects.create(author=self.user.profile, message='Message', topic=topic)
+
+    def hot_titles(self, **params) -> list:
+        res = self.client.get(self.url, {'ordering': 'hot', **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [topic['title'] for topic in res.data['results']]
+
+    def test_hot_topics(self):
+        """Test that the topics are ranked by their amount of recent posts, from the index of the rankings"""
+        other = sample_topic(starter=self.user.profile, board=sample_board(title='Other'), title='Other board')
+        self.post(other)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.hot_titles(), ['Busy', 'Calm', 'Quiet'])
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertTrue(any('"boards_topicranking"."board_id" = ' in statement for statement in sql))
+
+        res = self.client.get(self.url, {'ordering': 'hot', 'page_size': 2})
+        self.assertEqual([topic['title'] for topic in res.data['results']], ['Busy', 'Calm'])
+        res = self.client.get(res.data['next'])
+        self.assertEqual([topic['title'] for topic in res.data['results']], ['Quiet'])
+        self.assertEqual(self.hot_titles(fields='id,title'), ['Busy', 'Calm', 'Quiet'])
+
+    def test_invalid_ordering(self):
+        """Test that only the known orderings are accepted"""
+        res = self.client.get(self.url, {'ordering': 'title'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', res.data)
+
+    def test_posts_decay(self):
+        """Test that older posts weigh less, and that deleted posts and topics are taken out of the ranking"""
+        Post.objects.filter(topic=self.busy).update(created_at=timezone.now() - timedelta(days=2))
+        rebuild_rankings()
+        self.assertEqual(self.hot_titles(), ['Calm', 'Quiet', 'Busy'])
+
+        self.post(self.quiet)
+        self.post(self.quiet).delete()
+        Post.objects.filter(topic=self.calm).first().delete()
+        self.assertEqual(self.hot_titles(), ['Quiet', 'Calm', 'Busy'])
+
+        delete_later(self.quiet)
+        self.assertEqual(self.hot_titles(), ['Calm', 'Busy'])
+        self.assertFalse(TopicRanking.objects.filter(topic=self.quiet).exists())
+
+    def test_rebase(self):
+        """Test that an old epoch is moved forward by a single job, scaling the scores down in the same order"""
+        epoch = timezone.now() - timedelta(days=2)
+        Board.objects.filter(pk=self.board.pk).update(hot_epoch=epoch)
+        scores = dict(TopicRanking.objects.values_list('topic', 'score'))
+
+        self.post(self.quiet)
+        self.post(self.quiet)
+        self.assertEqual(Job.objects.filter(name=REBASE_TASK).count(), 1)
+        run_next_job()
+
+        self.assertGreater(Board.objects.get().hot_epoch, epoch + timedelta(days=2))
+        rebased = dict(TopicRanking.objects.values_list('topic', 'score'))
+        self.assertAlmostEqual(rebased[self.busy.pk], scores[self.busy.pk] / 16, places=3)
+        self.assertEqual(self.hot_titles(), ['Quiet', 'Busy', 'Calm'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_stale_epoch(self):
+        """Test that a post rebases a board whose epoch went stale without a worker, instead of overflowing"""
+        epoch = timezone.now() - timedelta(days=400)
+        Board.objects.filter(pk=self.board.pk).update(hot_epoch=epoch)
+
+        self.post(self.quiet)
+        self.post(self.quiet)
+
+        self.assertGreater(Board.objects.get().hot_epoch, epoch + timedelta(days=400))
+        scores = dict(TopicRanking.objects.values_list('topic', 'score'))
+        self.assertEqual(scores[self.busy.pk], 0)
+        self.assertAlmostEqual(scores[self.quiet.pk], 2, places=3)
+        self.assertEqual(self.hot_titles(), ['Quiet', 'Calm', 'Busy'])
@@ -0,0 +1,122 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+
+from core.extensions.test import APITestCase, sample_topic, sample_user, sample_board
+from core.response_cache import CachedResponseMixin
+from boards.models import Post
+from boards.views import TopicViewSet
+
+
+class ResponseCacheTests(APITestCase):
+    """Tests for the cached responses of the board and topic reads"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(starter=self.user.profile, board=self.board)
+        self.post = Post.objects.create(author=self.user.profile, message='Test post message', topic=self.topic)
+        self.topic_url = reverse('boards:boards-topic-detail', args=(self.board.id, self.topic.id))
+        self.topics_url = reverse('boards:boards-topic-list', args=(self.board.id,))
+        self.board_url = reverse('boards:board-detail', args=(self.board.id,))
+        self.boards_url = reverse('boards:board-list')
+
+    def test_responses_are_cached(self):
+        """Test that a read is answered from the cache, only the validators being queried"""
+        for url in (self.topic_url, self.topics_url, self.board_url, self.boards_url):
+            expected = self.client.get(url).content
+
+            with self.assertNumQueries(1):
+                res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, expected)
+
+    def test_new_post_invalidates_topic(self):
+        """Test that a new post is shown by the topic and the topic list"""
+        self.client.get(self.topic_url, {'expand': 'posts'})
+        self.client.get(self.topics_url)
+
+        Post.objects.create(author=self.user.profile, message='New reply', topic=self.topic)
+
+        self.assertEqual(self.client.get(self.topic_url, {'expand': 'posts'}).data['posts'][-1]['message'], 'New reply')
+        self.assertEqual(self.client.get(self.topics_url).data['results'][0]['post_count'], 2)
+
+    def test_new_topic_invalidates_boards(self):
+        """Test that a new topic is shown by the board and the board list"""
+        self.client.get(self.board_url, {'expand': 'topics'})
+        self.client.get(self.boards_url)
+
+        sample_topic(starter=self.user.profile, board=self.board, title='New topic')
+
+        self.assertEqual(self.client.get(self.board_url, {'expand': 'topics'}).data['topics'][0]['title'], 'New topic')
+        self.assertEqual(self.client.get(self.boards_url).data[0]['topic_count'], 2)
+
+    def test_renamed_profile_invalidates_topic(self):
+        """Test that a renamed author is shown by the topic, the topics of the other profiles staying cached"""
+        other_topic = sample_topic(starter=sample_user(email='other@marsimon.com').profile,
+                                   board=sample_board(title='Other board'), title='Other')
+        other_url = reverse('boards:boards-topic-detail', args=(other_topic.board_id, other_topic.id))
+        self.client.get(self.topic_url, {'expand': 'posts.author'})
+        self.client.get(other_url)
+
+        self.user.profile.set_username('renamed')
+
+        res = self.client.get(self.topic_url, {'expand': 'posts.author'})
+        self.assertEqual(res.data['posts'][0]['author']['username'], 'renamed')
+        with self.assertNumQueries(1):
+            self.client.get(other_url)
+
+    def test_browsable_api_is_not_cached(self):
+        """Test that only the JSON documents are cached"""
+        self.client.get(self.topic_url, {'format': 'api'})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.topic_url, {'format': 'api'})
+
+        self.assertGreater(len(queries), 1)
+
+    def get_cached_response_key(self, url: str) -> str:
+        """GETs the url and returns the cache key of its response"""
+        keys = []
+
+        def get_response_key(view):
+            keys.append(CachedResponseMixin.get_response_key(view))
+            return keys[-1]
+
+        with patch.object(TopicViewSet, 'get_response_key', get_response_key):
+            self.client.get(url)
+        return keys[0]
+
+    def test_concurrent_misses_wait_for_the_first(self):
+        """Test that a miss waits for the request already building the same response"""
+        key = self.get_cached_response_key(self.topic_url)
+        cached = cache.get(key)
+        cache.delete(key)
+        cache.add(CachedResponseMixin().get_lock_key(key), True)
+
+        with patch('core.response_cache.time.sleep', side_effect=lambda _: cache.set(key, cached)) as sleep:
+            with self.assertNumQueries(1):
+                res = self.client.get(self.topic_url)
+
+        sleep.assert_called_once()
+        self.assertEqual(res.content, cached[0])
+
+    def test_abandoned_build_is_taken_over(self):
+        """Test that a miss builds the response itself when the request holding the lock never stores it"""
+        key = self.get_cached_response_key(self.topic_url)
+        expected = cache.get(key)[0]
+        cache.delete(key)
+        cache.add(CachedResponseMixin().get_lock_key(key), True)
+
+        with self.settings(RESPONSE_CACHE={'CACHE': 'default', 'TIMEOUT': 300, 'LOCK_TIMEOUT': 10, 'LOCK_WAIT': 0}):
+            res = self.client.get(self.topic_url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, expected)
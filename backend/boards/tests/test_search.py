@@ -0,0 +1,92 @@
+from rest_framework.reverse import reverse
+from rest_framework import status
+
+from core.extensions.test import APITestCase, sample_topic, sample_user, sample_board
+from boards.models import Post
+
+
+class SearchApiTests(APITestCase):
+    """Tests for the full text search of posts"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(starter=self.user.profile, board=self.board, title='Gardening tips')
+        self.other_topic = sample_topic(starter=self.user.profile, board=self.board, title='Cooking')
+        self.post = Post.objects.create(author=self.user.profile, message='Water the tomatoes daily', topic=self.topic)
+        self.board_url = reverse('boards:board-search', args=(self.board.id,))
+        self.topic_url = reverse('boards:boards-topic-search', args=(self.board.id, self.topic.id))
+
+    def search(self, url: str, terms: str, **params) -> list:
+        res = self.client.get(url, {'q': terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [post['message'] for post in res.data['results']]
+
+    def test_search_board(self):
+        """Test searching the posts of a board, by message and by topic title"""
+        Post.objects.create(author=self.user.profile, message='Tomatoes in a sauce', topic=self.other_topic)
+        other_board_topic = sample_topic(starter=self.user.profile, board=sample_board(title='Other'), title='Other')
+        Post.objects.create(author=self.user.profile, message='Tomatoes elsewhere', topic=other_board_topic)
+
+        self.assertCountEqual(self.search(self.board_url, 'tomato'),
+                              ['Water the tomatoes daily', 'Tomatoes in a sauce'])
+        self.assertEqual(self.search(self.board_url, 'gardening'), ['Water the tomatoes daily'])
+        self.assertEqual(self.search(self.board_url, 'tomatoes water'), ['Water the tomatoes daily'])
+        self.assertEqual(self.search(self.board_url, 'potatoes'), [])
+
+    def test_search_topic(self):
+        """Test that searching a topic only returns its posts"""
+        Post.objects.create(author=self.user.profile, message='Tomatoes in a sauce', topic=self.other_topic)
+
+        self.assertEqual(self.search(self.topic_url, 'tomatoes'), ['Water the tomatoes daily'])
+
+    def test_results_are_ranked(self):
+        """Test that the title weighs more than the message and that the pages follow the rank"""
+        sauce_topic = sample_topic(starter=self.user.profile, board=self.board, title='Sauce recipes')
+        Post.objects.create(author=self.user.profile, message='With basil', topic=sauce_topic)
+        for i in range(3):
+            Post.objects.create(author=self.user.profile, message=f'Some sauce {i}', topic=self.other_topic)
+
+        res = self.client.get(self.board_url, {'q': 'sauce', 'page_size': 2})
+        messages = [post['message'] for post in res.data['results']]
+        ranks = [post['rank'] for post in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            messages += [post['message'] for post in res.data['results']]
+            ranks += [post['rank'] for post in res.data['results']]
+
+        self.assertEqual(messages[0], 'With basil')
+        self.assertCountEqual(messages[1:], ['Some sauce 0', 'Some sauce 1', 'Some sauce 2'])
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_index_follows_edits(self):
+        """Test that edited messages, renamed topics and deleted posts are searched as they are now"""
+        self.post.edit_message('Prune the roses')
+        self.assertEqual(self.search(self.board_url, 'roses'), ['Prune the roses'])
+        self.assertEqual(self.search(self.board_url, 'tomatoes'), [])
+
+        self.topic.refresh_from_db()
+        self.topic.title = 'Flowers'
+        self.topic.save()
+        self.assertEqual(self.search(self.board_url, 'flowers'), ['Prune the roses'])
+        self.assertEqual(self.search(self.board_url, 'gardening'), [])
+
+        self.post.delete()
+        self.assertEqual(self.search(self.board_url, 'roses'), [])
+
+    def test_search_syntax_is_not_interpreted(self):
+        """Test that operators and quotes in the search are taken as words"""
+        self.assertEqual(self.search(self.board_url, 'tomatoes" (daily*'), ['Water the tomatoes daily'])
+        self.assertEqual(self.search(self.board_url, '"tomatoes" -daily'), ['Water the tomatoes daily'])
+
+    def test_search_requires_terms(self):
+        """Test that a search without terms is a bad request"""
+        res = self.client.get(self.board_url, {'q': ' '})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_missing_board(self):
+        """Test that searching a board that does not exist returns a 404"""
+        res = self.client.get(reverse('boards:board-search', args=(self.board.id + 100,)), {'q': 'tomatoes'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,247 @@
+import asyncio
+import functools
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.test import TransactionTestCase, override_settings
+
+from rest_framework.reverse import reverse
+
+from boards.models import Post
+from boards.serializers import PostSerializer
+from central.asgi import application
+from core.cascades import delete_later
+from core.events import Event, PostgresEventBackend, event_hub, make_event_id
+from core.extensions.test import sample_topic, sample_user, sample_board
+
+
+def run_async(test):
+    """Runs an async test method in an event loop"""
+    @functools.wraps(test)
+    def wrapper(self):
+        async_to_sync(test)(self)
+    return wrapper
+
+
+def events_settings(**params) -> override_settings:
+    return override_settings(EVENTS={**settings.EVENTS, **params})
+
+
+class EventStreamTests(TransactionTestCase):
+    """Tests for the event streams of the boards and topics"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(starter=self.user.profile, board=self.board)
+        self.other_topic = sample_topic(starter=self.user.profile, board=self.board, title='Other topic')
+        self.topic_url = f'/api/boards/{self.board.id}/topics/{self.topic.id}/events/'
+        self.board_url = f'/api/boards/{self.board.id}/events/'
+
+    async def open(self, path: str, headers: dict = None) -> ApplicationCommunicator:
+        """Opens a stream and checks that it started"""
+        stream = ApplicationCommunicator(application, {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'root_path': '',
+            'query_string': b'',
+            'headers': [(name.encode(), value.encode()) for name, value in (headers or {}).items()],
+        })
+        await stream.send_input({'type': 'http.request'})
+        start = await stream.receive_output(1)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        return stream
+
+    @staticmethod
+    async def close(stream: ApplicationCommunicator) -> None:
+        await stream.send_input({'type': 'http.disconnect'})
+        await stream.wait(1)
+
+    @staticmethod
+    async def receive_event(stream: ApplicationCommunicator) -> dict:
+        """Next event of the stream, with its data parsed"""
+        message = await stream.receive_output(1)
+        fields = dict(line.split(': ', 1) for line in message['body'].decode().splitlines() if line)
+        fields['data'] = json.loads(fields['data'])
+        return fields
+
+    @staticmethod
+    def create_post(topic, message: str) -> Post:
+        return sync_to_async(Post.objects.create)(author_id=topic.starter_id, message=message, topic=topic)
+
+    @run_async
+    async def test_topic_stream(self):
+        """Test that a topic stream sends the posts created and edited in the topic"""
+        stream = await self.open(self.topic_url)
+
+        post = await self.create_post(self.topic, 'Hello')
+        await self.create_post(self.other_topic, 'Elsewhere')
+        await sync_to_async(post.edit_message)('Hello again')
+
+        created = await self.receive_event(stream)
+        self.assertEqual(created['event'], 'post-created')
+        self.assertEqual(set(created['data']), set(PostSerializer.Meta.fields))
+        self.assertEqual((created['data']['id'], created['data']['message']), (post.pk, 'Hello'))
+        edited = await self.receive_event(stream)
+        self.assertEqual(edited['event'], 'post-edited')
+        self.assertEqual(edited['data']['message'], 'Hello again')
+        self.assertGreater(edited['id'], created['id'])
+        await self.close(stream)
+
+    @run_async
+    async def test_board_stream(self):
+        """Test that a board stream sends the posts of all its topics"""
+        other_board_topic = await sync_to_async(sample_topic)(
+            starter=self.user.profile, board=await sync_to_async(sample_board)(title='Other board'), title='Far')
+        stream = await self.open(self.board_url)
+
+        await self.create_post(self.topic, 'First')
+        await self.create_post(other_board_topic, 'Elsewhere')
+        await self.create_post(self.other_topic, 'Second')
+
+        self.assertEqual((await self.receive_event(stream))['data']['message'], 'First')
+        self.assertEqual((await self.receive_event(stream))['data']['message'], 'Second')
+        await self.close(stream)
+
+    @run_async
+    async def test_resume_from_last_event_id(self):
+        """Test that a stream resumed with Last-Event-ID first sends the events that were missed"""
+        first = await self.create_post(self.topic, 'First')
+        second = await self.create_post(self.topic, 'Second')
+        await sync_to_async(first.edit_message)('First, edited')
+
+        stream = await self.open(self.topic_url, {'last-event-id': make_event_id(first.created_at, first.pk)})
+        missed = [await self.receive_event(stream), await self.receive_event(stream)]
+        await self.create_post(self.topic, 'Third')
+        live = await self.receive_event(stream)
+
+        self.assertEqual([(event['event'], event['data']['id']) for event in missed],
+                         [('post-created', second.pk), ('post-edited', first.pk)])
+        self.assertEqual(live['data']['message'], 'Third')
+        await self.close(stream)
+
+    @run_async
+    async def test_stream_too_far_behind_is_reset(self):
+        """Test that a stream missing more events than the replay limit is told to reload"""
+        first = await self.create_post(self.topic, 'First')
+        for i in range(2):
+            await self.create_post(self.topic, f'Reply {i}')
+
+        with events_settings(REPLAY_LIMIT=1):
+            stream = await self.open(self.topic_url, {'last-event-id': make_event_id(first.created_at, first.pk)})
+            reset = await self.receive_event(stream)
+
+        self.assertEqual(reset['event'], 'reset')
+        self.assertTrue(reset['id'])
+        await self.close(stream)
+
+    @run_async
+    async def test_gap_is_replayed(self):
+        """Test that the events of a gap in the subscription are looked up in the database"""
+        stream = await self.open(self.topic_url)
+        with patch('boards.signals.publish'):
+            await self.create_post(self.topic, 'Not published')
+
+        event_hub.dispatch(Event(make_event_id(datetime.now(timezone.utc), 0), 'gap', (), None))
+
+        self.assertEqual((await self.receive_event(stream))['data']['message'], 'Not published')
+        await self.close(stream)
+
+    @run_async
+    async def test_late_commit_is_sent(self):
+        """Test that a live event stamped before the last one sent is still sent, and a replayed one is not resent"""
+        stream = await self.open(self.topic_url)
+        post = await self.create_post(self.topic, 'Committed first')
+        await self.receive_event(stream)
+
+        channels = (f'topic:{self.topic.id}',)
+        late_id = make_event_id(post.created_at, 0)
+        event_hub.dispatch(Event(late_id, 'post-created', channels, '{"message": "Committed later"}'))
+        late = await self.receive_event(stream)
+        event_hub.dispatch(Event(make_event_id(post.created_at, post.pk), 'post-created', channels, '{}'))
+        await self.create_post(self.topic, 'Next')
+
+        self.assertEqual((late['id'], late['data']['message']), (late_id, 'Committed later'))
+        self.assertEqual((await self.receive_event(stream))['data']['message'], 'Next')
+        await self.close(stream)
+
+    @run_async
+    async def test_slow_subscriber_gets_a_gap(self):
+        """Test that a full subscription queue is replaced by a gap"""
+        with events_settings(QUEUE_SIZE=2):
+            subscription = event_hub.subscribe(['topic:1'])
+        try:
+            for i in range(3):
+                event_hub.dispatch(Event(f'{i}-1', 'post-created', ('topic:1',), '{}'))
+            await asyncio.sleep(0)
+
+            self.assertEqual(subscription.queue.qsize(), 1)
+            self.assertIsNone((await subscription.get()).data)
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    @run_async
+    async def test_malformed_notifications_are_skipped(self):
+        """Test that the listener skips the notifications that are not events, and dispatches the next ones"""
+        backend = PostgresEventBackend(event_hub, 'default')
+        subscription = event_hub.subscribe(['topic:1'])
+        try:
+            with self.assertLogs('core.events', 'ERROR'):
+                for payload in ('not json', '{"id": "1-1"}', '[]'):
+                    backend.receive(payload)
+            backend.receive(Event('2-1', 'post-created', ('topic:1',), '{}').to_json())
+            await asyncio.sleep(0)
+
+            self.assertEqual((await subscription.get()).id, '2-1')
+            self.assertTrue(subscription.queue.empty())
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    @run_async
+    async def test_keepalive(self):
+        """Test that an idle stream sends keepalive comments"""
+        with events_settings(KEEPALIVE=0.01):
+            stream = await self.open(self.topic_url)
+            message = await stream.receive_output(1)
+
+        self.assertEqual(message['body'], b': keepalive\n\n')
+        await self.close(stream)
+
+    @run_async
+    async def test_missing_topic(self):
+        """Test that the stream of a topic that does not exist returns a 404"""
+        stream = ApplicationCommunicator(application, {
+            'type': 'http', 'method': 'GET', 'path': f'/api/boards/{self.board.id}/topics/{self.topic.id + 100}/events/',
+            'root_path': '', 'query_string': b'', 'headers': [],
+        })
+        await stream.send_input({'type': 'http.request'})
+
+        self.assertEqual((await stream.receive_output(1))['status'], 404)
+
+    @run_async
+    async def test_tombstoned_topic(self):
+        """Test that the stream of a topic waiting for its deletion returns a 404"""
+        await sync_to_async(delete_later)(self.topic)
+        stream = ApplicationCommunicator(application, {
+            'type': 'http', 'method': 'GET', 'path': self.topic_url, 'root_path': '', 'query_string': b'', 'headers': [],
+        })
+        await stream.send_input({'type': 'http.request'})
+
+        self.assertEqual((await stream.receive_output(1))['status'], 404)
+
+    @run_async
+    async def test_other_requests_go_to_django(self):
+        """Test that the asgi application serves the api next to the streams"""
+        stream = ApplicationCommunicator(application, {
+            'type': 'http', 'method': 'GET', 'path': reverse('boards:board-list'),
+            'root_path': '', 'query_string': b'', 'headers': [(b'host', b'testserver')],
+        })
+        await stream.send_input({'type': 'http.request'})
+
+        self.assertEqual((await stream.receive_output(5))['status'], 200)
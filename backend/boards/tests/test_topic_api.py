@@ -1,4 +1,8 @@
+from unittest.mock import patch
+
+from django.db import connection
 from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework.reverse import reverse
 from rest_framework import status
@@ -6,6 +10,7 @@ from rest_framework import status
 from core.extensions.test import APITestCase, sample_topic, sample_user, sample_board
 from boards.models import Board, Topic, Post
 from boards.serializers import TopicSerializer, TopicListSerializer
+from boards.views import TopicViewSet
 
 
 def get_topic_url(board: Board, topic: Topic = None) -> str:
@@ -33,10 +38,42 @@ class PublicTopicApiTests(APITestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
         fields_desired = ('id', 'board', 'title', 'starter', 'post_count', 'first_post', 'created_at')
-        serializer = TopicListSerializer(self.board.topics, many=True, context={'request': RequestFactory().get(url)})
-        self.assertEqual(res.data, serializer.data)
-        self.assertAllIn(fields_desired, res.data[0].keys())
-        self.assertAllIn(('username', 'href'), res.data[0]['starter'])
+        topics = TopicListSerializer.setup_eager_loading(self.board.topics.all(), {})
+        serializer = TopicListSerializer(topics, many=True, context={'request': RequestFactory().get(url)})
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertAllIn(fields_desired, res.data['results'][0].keys())
+        self.assertEqual(res.data['results'][0]['starter'], self.user.profile.id)
+        self.assertEqual(res.data['results'][0]['first_post'], self.post.id)
+        self.assertIsNone(res.data['results'][1]['first_post'])
+
+    def test_expand_topic_list(self):
+        """Test that the starters and first posts of the topics are embedded when expanded"""
+        res = self.client.get(get_topic_url(self.board), {'expand': 'starter,first_post.author'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        topic = res.data['results'][0]
+        self.assertAllIn(('username', 'href'), topic['starter'])
+        self.assertEqual(topic['first_post']['message'], self.post.message)
+        self.assertEqual(topic['first_post']['author']['username'], self.user.profile.username)
+
+    def test_topic_list_query_count_is_constant(self):
+        """Test that the amount of queries for the topic list does not depend on the amount of topics"""
+        url = get_topic_url(self.board)
+        with CaptureQueriesContext(connection) as single_topic_queries:
+            self.client.get(url, {'expand': 'starter,first_post'})
+
+        for i in range(5):
+            other_user = sample_user(email=f'user{i}@marsimon.com')
+            topic = sample_topic(starter=other_user.profile, board=self.board, title=f'Topic {i}')
+            Post.objects.create(author=other_user.profile, message=f'First post {i}', topic=topic)
+            Post.objects.create(author=self.user.profile, message=f'Reply {i}', topic=topic)
+
+        with self.assertNumQueries(len(single_topic_queries)):
+            res = self.client.get(url, {'expand': 'starter,first_post'})
+
+        self.assertEqual(len(res.data['results']), 6)
+        self.assertEqual(res.data['results'][1]['post_count'], 2)
+        self.assertEqual(res.data['results'][1]['first_post']['message'], 'First post 0')
 
     def test_retrieve_topic_detail(self):
         """Test retriving a topic's details"""
@@ -48,7 +85,31 @@ class PublicTopicApiTests(APITestCase):
         serializer = TopicSerializer(self.topic, context={'request': RequestFactory().get(url)})
         self.assertEqual(res.data, serializer.data)
         self.assertAllIn(fields_desired, res.data.keys())
+        self.assertEqual(res.data['starter'], self.user.profile.id)
+        self.assertTrue(res.data['posts'].endswith(reverse('boards:boards-topics-post-list',
+                                                           args=(self.board.id, self.topic.id))))
+
+    def test_expand_topic_detail(self):
+        """Test that the posts of a topic and their authors are embedded when expanded"""
+        res = self.client.get(get_topic_url(self.board, self.topic), {'expand': 'starter,posts.author'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertAllIn(('username', 'href'), res.data['starter'])
+        self.assertEqual([post['message'] for post in res.data['posts']], [self.post.message])
+        self.assertEqual(res.data['posts'][0]['author']['username'], self.user.profile.username)
+
+    def test_stream_topic_detail(self):
+        """Test that streaming a topic's details renders the same document as the regular response"""
+        for i in range(4):
+            Post.objects.create(author=self.user.profile, message=f'Reply {i} \u2028 héhé', topic=self.topic)
+        url = get_topic_url(self.board, self.topic)
+
+        with patch.object(TopicViewSet, 'stream_chunk_size', 2):
+            res = self.client.get(url, {'stream': 'true', 'expand': 'posts.author'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(b''.join(res.streaming_content), self.client.get(url, {'expand': 'posts.author'}).content)
 
     def test_create_topic_requires_auth(self):
         """Test that authentication is required to create a topic"""
@@ -136,3 +197,10 @@ class PrivateTopicApiTests(APITestCase):
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
         new_topic.refresh_from_db()
         self.assertNotEqual(new_topic.title, payload['title'])
+
+    def test_delete_missing_topic(self):
+        """Test that deleting a topic that does not exist returns a 404"""
+        url = reverse('boards:boards-topic-detail', args=(self.board.id, self.topic.id + 100))
+        res = self.client.delete(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
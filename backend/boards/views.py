@@ -1,32 +1,185 @@
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Max, QuerySet
+from django.shortcuts import get_object_or_404
+from django.utils.translation import gettext_lazy as _
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.viewsets import ModelViewSet
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
 from boards.models import Board, Topic, Post
 from boards.serializers import (BoardSerializer, TopicSerializer, CreateTopicSerializer, TopicListSerializer,
-                                PostSerializer)
+                                PostSerializer, PostSearchSerializer, CompiledTopicListSerializer)
+from boards.search import get_search_backend
 
+from core.cascades import delete_later
+from core.extensions.compiled import CompiledListMixin, CompiledSerializer
+from core.extensions.serializers import ExpandableFieldsMixin, SparseFieldsetMixin, get_expand
+from core.instrumentation import TimedSerializationMixin, time_serialization
+from core.mixins import CachedObjectMixin, ConditionalGetMixin
+from core.pagination import KeysetPagination, RankPagination, ScorePagination
+from core.response_cache import CachedResponseMixin
+from core.routers import ReplicaReadsMixin
 from core.permissions import ReadOnlyUnlessSuperuser, TopicPermission, PostPermission
+from core.streaming import StreamingJSONMixin
+
+
+def _last_modified(values: tuple) -> Optional[datetime]:
+    return max((value for value in values if value is not None), default=None)
+
+
+def _lock_parent(queryset: QuerySet, **lookups):
+    """
+    Locks the parent of a created object, 404 when it does not exist or was tombstoned
+
+    Must be called in the transaction saving the object: delete_later() updates the row it tombstones,
+    so it waits for that transaction, and a parent tombstoned first is not found.
+    """
+    return get_object_or_404(queryset.select_for_update(), **lookups)
+
+
+def _search_response(view, posts: QuerySet):
+    """Paginated posts matching the ?q= search, the best ranked first. The posts take the ?expand= parameter."""
+    terms = view.request.query_params.get('q', '').strip()
+    if not terms:
+        raise ValidationError({'q': _('This parameter is required.')})
+    expand = get_expand(view.request, PostSearchSerializer, view.expand_query_param)
+    results = get_search_backend(posts.db).search(PostSerializer.setup_eager_loading(posts, expand), terms)
 
+    paginator = RankPagination()
+    page = paginator.paginate_queryset(results, view.request, view=view)
+    serializer = PostSearchSerializer(page, many=True, context=view.get_serializer_context(), expand=expand)
+    return paginator.get_paginated_response(time_serialization(getattr, serializer, 'data'))
 
-class BoardViewSet(NestedViewSetMixin, ModelViewSet):
-    """Viewset for the boards model. Contains nested topics"""
-    queryset = Board.objects.all()
+
+class BoardViewSet(ReplicaReadsMixin, ConditionalGetMixin, CachedResponseMixin, CachedObjectMixin, SparseFieldsetMixin,
+                   ExpandableFieldsMixin, CompiledListMixin, NestedViewSetMixin, TimedSerializationMixin, ModelViewSet):
+    """
+    Viewset for the boards model. The recent topics of the boards are embedded with ?expand=topics
+
+    A deleted board is hidden at once, its topics and posts are deleted in the background.
+    """
+    queryset = Board.objects.filter(deleted_at__isnull=True)
     serializer_class = BoardSerializer
+    compiled_serializer = CompiledSerializer(BoardSerializer)
     permission_classes = (ReadOnlyUnlessSuperuser,)
 
+    def get_validators(self) -> Tuple[tuple, Optional[datetime]]:
+        # The board rows are touched when their topics change, see boards.signals
+        boards = self.queryset
+        if self.action == 'list':
+            boards = boards.aggregate(count=Count('id'), modified_at=Max('modified_at'))
+            # A deleted board leaves nothing more recent behind, so there is no Last-Modified
+            return (boards['count'], boards['modified_at']), None
+        modified_at = boards.filter(pk=self.kwargs['pk']).values_list('modified_at', flat=True).first()
+        return (modified_at,), modified_at
+
+    def get_cache_versions(self) -> Sequence[str]:
+        if self.action == 'list':
+            return ('boards',)
+        return (f'board:{self.kwargs["pk"]}',)
+
+    @action(detail=True)
+    def search(self, request, *args, **kwargs):
+        """Searches the posts of the board"""
+        posts = Post.objects.filter(topic__board=self.get_object(), topic__deleted_at__isnull=True)
+        return _search_response(self, posts)
+
+    def perform_destroy(self, instance: Board):
+        delete_later(instance)
+
+
+class TopicViewSet(ReplicaReadsMixin, ConditionalGetMixin, CachedResponseMixin, CachedObjectMixin, StreamingJSONMixin,
+                   SparseFieldsetMixin, ExpandableFieldsMixin, CompiledListMixin, NestedViewSetMixin,
+                   TimedSerializationMixin, ModelViewSet):
+    """
+    Viewset for the topic model. The posts expanded in a topic can be streamed with ?expand=posts&stream=true
 
-class TopicViewSet(NestedViewSetMixin, ModelViewSet):
-    """Viewset for the topic model"""
-    queryset = Topic.objects.all()
+    The topic list is ordered by creation, or with ?ordering=hot by the hot scores of boards.ranking.
+    A deleted topic is hidden at once, its posts are deleted in the background.
+    """
+    queryset = Topic.objects.filter(deleted_at__isnull=True, board__deleted_at__isnull=True)
     serializer_class = TopicSerializer
+    compiled_serializer = CompiledTopicListSerializer()
     permission_classes = (TopicPermission,)
+    list_orderings = {'created_at': KeysetPagination, 'hot': ScorePagination}
+
+    @property
+    def pagination_class(self):
+        return self.list_orderings[self.get_list_ordering()]
+
+    def get_list_ordering(self) -> str:
+        ordering = self.request.query_params.get('ordering', 'created_at') if self.action == 'list' else 'created_at'
+        if ordering not in self.list_orderings:
+            raise ValidationError({'ordering': _('"{input}" is not a valid choice.').format(input=ordering)})
+        return ordering
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = TopicListSerializer.setup_eager_loading(queryset, self.get_expand())
+            if self.get_list_ordering() == 'hot':
+                # Read in order from the index of the rankings of the board
+                queryset = queryset.filter(ranking__board=self.kwargs['parent_lookup_board']).annotate(
+                    score=F('ranking__score'), score_key=F('ranking__topic'))
+            return queryset
+        if self.action == 'retrieve':
+            expand = self.get_expand()
+            if self.stream_posts_requested():
+                # The posts are read once the view returned
+                expand = {name: nested for name, nested in expand.items() if name != 'posts'}
+            return TopicSerializer.setup_eager_loading(queryset, expand)
+        # The permissions compare the user of the starter
+        return queryset.select_related('starter')
+
+    def get_validators(self) -> Tuple[tuple, Optional[datetime]]:
+        # Creating, editing or deleting a post touches its topic and board, see boards.signals
+        if self.action == 'list':
+            rows = BoardViewSet.queryset.filter(pk=self.kwargs['parent_lookup_board'])
+        else:
+            rows = self.queryset.filter(pk=self.kwargs['pk'], board=self.kwargs['parent_lookup_board'])
+        modified_at = rows.values_list('modified_at', flat=True).first()
+        return (modified_at,), modified_at
+
+    def get_cache_versions(self) -> Sequence[str]:
+        # A renamed profile bumps the stamps of the topics showing its username, and of their boards
+        if self.action == 'list':
+            return (f'board:{self.kwargs["parent_lookup_board"]}',)
+        return (f'topic:{self.kwargs["pk"]}',)
+
+    def stream_posts_requested(self) -> bool:
+        return self.stream_requested() and 'posts' in self.get_expand() and self.is_field_requested('posts')
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.stream_posts_requested():
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(self.stream_retrieve, request, *args, **kwargs)
+
+    @action(detail=True)
+    def search(self, request, *args, **kwargs):
+        """Searches the posts of the topic"""
+        return _search_response(self, Post.objects.filter(topic=self.get_object()))
+
+    def stream_retrieve(self, request, *args, **kwargs):
+        topic = self.get_object()
+        posts = PostSerializer.setup_eager_loading(TopicSerializer.get_posts_queryset().filter(topic=topic),
+                                                   self.get_expand()['posts'])
+        return self.stream_object(self.get_serializer(topic), 'posts', posts)
 
     def list(self, request, *args, **kwargs):
         self.serializer_class = TopicListSerializer
         return super(TopicViewSet, self).list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(board_id=self.kwargs['parent_lookup_board'])
+        with transaction.atomic():
+            board = _lock_parent(BoardViewSet.queryset, pk=self.kwargs['parent_lookup_board'])
+            serializer.save(board=board)
+
+    def perform_destroy(self, instance: Topic):
+        delete_later(instance)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -34,11 +187,47 @@ class TopicViewSet(NestedViewSetMixin, ModelViewSet):
         return self.serializer_class
 
 
-class PostViewSet(NestedViewSetMixin, ModelViewSet):
-    """Viewset for the post model"""
-    queryset = Post.objects.all()
+class PostViewSet(ReplicaReadsMixin, ConditionalGetMixin, CachedObjectMixin, StreamingJSONMixin, SparseFieldsetMixin,
+                  ExpandableFieldsMixin, CompiledListMixin, NestedViewSetMixin, TimedSerializationMixin, ModelViewSet):
+    """Viewset for the post model. The whole list can be streamed, unpaginated, with ?stream=true"""
+    queryset = Post.objects.filter(topic__deleted_at__isnull=True, topic__board__deleted_at__isnull=True)
     serializer_class = PostSerializer
+    compiled_serializer = CompiledSerializer(PostSerializer)
     permission_classes = (PostPermission,)
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return PostSerializer.setup_eager_loading(queryset, self.get_expand())
+        # The permissions compare the user of the author
+        return queryset.select_related('author')
+
+    def get_validators(self) -> Tuple[tuple, Optional[datetime]]:
+        topics = TopicViewSet.queryset.filter(pk=self.kwargs['parent_lookup_topic'],
+                                              board=self.kwargs['parent_lookup_topic__board'])
+        if self.action == 'list':
+            values = topics.values_list('modified_at')
+        else:
+            # The topic is touched when the author of the post is renamed
+            values = Post.objects.filter(pk=self.kwargs['pk'], topic__in=topics).values_list(
+                'created_at', 'edited_at', 'topic__modified_at'
+            )
+        values = values.first() or ()
+        return values, _last_modified(values)
+
+    def list(self, request, *args, **kwargs):
+        if not self.stream_requested():
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(self.stream_list_posts, request, *args, **kwargs)
+
+    def stream_list_posts(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('created_at', 'id')
+        return self.stream_list(queryset, self.get_serializer())
 
     def perform_create(self, serializer):
-        serializer.save(topic_id=self.kwargs['parent_lookup_topic'])
+        # The board is locked too, it is tombstoned without its topics
+        with transaction.atomic():
+            topic = _lock_parent(TopicViewSet.queryset, pk=self.kwargs['parent_lookup_topic'],
+                                 board=self.kwargs['parent_lookup_topic__board'])
+            serializer.save(topic=topic)
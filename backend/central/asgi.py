@@ -2,6 +2,7 @@
 ASGI config for central project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The event streams of the boards are served here, the other requests go to django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
@@ -13,4 +14,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'central.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once django is set up
+from boards.streams import routes  # noqa: E402
+from core.events import EventStreamRouter  # noqa: E402
+
+application = EventStreamRouter(routes, django_application)
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.routers.PrimaryPinMiddleware',
 ]
 
 ROOT_URLCONF = 'central.urls'
@@ -78,8 +80,31 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'central.wsgi.application'
 
+# The requests of a batch are authenticated as the batch, see core.batch
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.TokenAuthentication'],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['core.authentication.CachedTokenAuthentication',
+                                       'core.authentication.BatchAuthentication'],
+}
+
+# Tokens are resolved through an in-process LRU then the shared cache, see core.authentication
+TOKEN_AUTH_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_TIMEOUT': 5,
+    'LOCAL_MAXSIZE': 1024,
+}
+
+# Number of recent topics embedded in each board, the rest is available through the paginated topics route
+BOARD_RECENT_TOPICS = 5
+
+# Text search configuration of the PostgreSQL full text search, see boards.search
+SEARCH_CONFIG = 'english'
+
+# Lists of boards, topics and posts are serialized from values() rows by code generated from their serializers.
+# VERIFY also runs the regular serializers and raises when their output differs, it is meant for the tests.
+COMPILED_SERIALIZERS = {
+    'ENABLED': True,
+    'VERIFY': False,
 }
 
 
@@ -96,6 +121,98 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, as comma separated host=weight pairs, the weight defaulting to 1.
+# The safe requests of the board and profile views read from a replica picked by weight, unless the client
+# wrote within PIN_SECONDS, see core.routers. CACHE_TIMEOUT bounds the life of the responses cached from a
+# replica, which may lag behind the version stamps.
+REPLICA_READS = {
+    'DATABASES': {},
+    'PIN_SECONDS': 10,
+    'COOKIE': 'primary_pin',
+    'HEADER': 'X-Primary-Pin',
+    'CACHE_TIMEOUT': 5,
+}
+for index, replica in enumerate(filter(None, os.environ.get('POSTGRES_REPLICAS', '').split(','))):
+    host, _, weight = replica.partition('=')
+    DATABASES[f'replica{index + 1}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    REPLICA_READS['DATABASES'][f'replica{index + 1}'] = int(weight or 1)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Every request is timed in the latency histograms served on /api/metrics, in seconds by BUCKETS. SAMPLE_RATE
+# is the share of the requests whose database, serializer and render times are measured and sent back in a
+# Server-Timing header, see core.instrumentation.
+INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 0.01)),
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+# Rendered responses of the board and topic reads, invalidated through version stamps, see core.response_cache.
+# LOCK_WAIT is how long concurrent requests wait for the one building a response before building it themselves.
+RESPONSE_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 10,
+    'LOCK_WAIT': 2,
+}
+
+# In-process cache of the usernames found available, see accounts.models.Profile.is_username_available
+USERNAME_AVAILABILITY_CACHE = {
+    'MAXSIZE': 10000,
+    'TIMEOUT': 30,
+}
+
+# Maximum number of requests in a call to /api/batch
+BATCH_MAX_REQUESTS = 50
+
+# Live events of the posts, see core.events. On PostgreSQL they reach every process through LISTEN/NOTIFY.
+# Streams more than REPLAY_LIMIT events behind are reset, KEEPALIVE is the delay between keepalive comments.
+# The events are rendered without a request, their hrefs are absolute against BASE_URL, where the api is served.
+EVENTS = {
+    'BASE_URL': os.environ.get('EVENTS_BASE_URL', 'http://localhost'),
+    'DATABASE': 'default',
+    'CHANNEL': 'boards_events',
+    'QUEUE_SIZE': 100,
+    'REPLAY_LIMIT': 500,
+    'KEEPALIVE': 15,
+}
+
+# Background jobs, see core.jobs, run by the run_jobs workers with CONCURRENCY threads each. An idle worker
+# looks for due jobs every POLL_INTERVAL seconds. A failed job is retried after RETRY_DELAY seconds, doubled
+# at every attempt up to MAX_RETRY_DELAY, until MAX_ATTEMPTS attempts failed.
+JOBS = {
+    'CONCURRENCY': int(os.environ.get('JOBS_CONCURRENCY', 4)),
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 10,
+    'MAX_RETRY_DELAY': 3600,
+}
+
+# Deleted boards, topics and users are tombstoned, their rows are removed by background jobs of PRIORITY,
+# BATCH_SIZE rows per job, see core.cascades
+CASCADES = {
+    'BATCH_SIZE': int(os.environ.get('CASCADES_BATCH_SIZE', 1000)),
+    'PRIORITY': -10,
+}
+
+# Hot topics of the boards, see boards.ranking. The weight of a post halves every HALF_LIFE seconds, the scores
+# of a board are rebased by a background job once they are REBASE_AFTER seconds old.
+HOT_TOPICS = {
+    'HALF_LIFE': 12 * 3600,
+    'REBASE_AFTER': 24 * 3600,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
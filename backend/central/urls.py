@@ -16,8 +16,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from core.batch import BatchView
+from core.instrumentation import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('accounts.urls')),
     path('api/', include('boards.urls')),
+    path('api/batch', BatchView.as_view(), name='batch'),
+    path('api/metrics', MetricsView.as_view(), name='metrics'),
 ]
@@ -0,0 +1,34 @@
+from django.contrib import admin
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from core.models import Deletion, Job
+
+
+@admin.register(Deletion)
+class DeletionAdmin(admin.ModelAdmin):
+    """Progress of the cascades, which their jobs update"""
+    list_display = ('__str__', 'step', 'processed', 'created_at', 'finished_at')
+    list_filter = ('content_type',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """The jobs waiting to run, to be retried or that failed"""
+    list_display = ('__str__', 'priority', 'run_at', 'attempts', 'max_attempts', 'failed_at')
+    list_filter = ('name',)
+    actions = ('retry',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        """Runs the selected jobs again as soon as possible, with their attempts reset"""
+        queryset.update(failed_at=None, attempts=0, run_at=timezone.now())
+    retry.short_description = _('Retry the selected jobs')
@@ -1,5 +1,9 @@
 from django.apps import AppConfig
 
 
+# noinspection PyUnresolvedReferences
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        import core.signals
@@ -0,0 +1,128 @@
+import pickle
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication
+
+from core.utils.cache import LRUCache
+
+
+# The (user, token) pair the current batch was authenticated with, see core.batch
+batch_credentials: ContextVar[Optional[tuple]] = ContextVar('batch_credentials', default=None)
+
+
+class TokenCache:
+    """
+    Two tier cache of the (user, token) pair of every token key, the user's profile included
+
+    The first tier is an in-process LRU, the second one the shared cache backend set in
+    TOKEN_AUTH_CACHE. Invalidating a token clears both tiers of the current process, the
+    local tier of the other processes expires after LOCAL_TIMEOUT seconds.
+    """
+    key_prefix = 'auth:token:'
+    user_key_prefix = 'auth:user-token:'
+
+    def __init__(self):
+        self._local = None
+        self._stats_lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @property
+    def config(self) -> dict:
+        return settings.TOKEN_AUTH_CACHE
+
+    @property
+    def local(self) -> LRUCache:
+        if self._local is None:
+            self._local = LRUCache(maxsize=self.config['LOCAL_MAXSIZE'], ttl=self.config['LOCAL_TIMEOUT'])
+        return self._local
+
+    @property
+    def shared(self):
+        return caches[self.config['CACHE']]
+
+    def get(self, key: str):
+        """Returns a fresh copy of the cached (user, token) pair, or None"""
+        blob = self.local.get(key)
+        if blob is not None:
+            self._count('local_hits')
+        else:
+            blob = self.shared.get(self.key_prefix + key)
+            if blob is None:
+                self._count('misses')
+                return None
+            self._count('shared_hits')
+            self.local.set(key, blob)
+        # Every request gets its own instances, views are free to modify request.user
+        return pickle.loads(blob)
+
+    def set(self, key: str, user, token) -> None:
+        blob = pickle.dumps((user, token), pickle.HIGHEST_PROTOCOL)
+        self.local.set(key, blob)
+        self.shared.set_many({
+            self.key_prefix + key: blob,
+            self.user_key_prefix + str(user.pk): key,
+        }, self.config['TIMEOUT'])
+
+    def invalidate(self, key: str) -> None:
+        self.local.delete(key)
+        self.shared.delete(self.key_prefix + key)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Invalidates the token of a user, found without querying the database"""
+        key = self.shared.get(self.user_key_prefix + str(user_id))
+        if key is not None:
+            self.invalidate(key)
+            self.shared.delete(self.user_key_prefix + str(user_id))
+
+    def clear_stats(self) -> None:
+        with self._stats_lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication resolving the token, its user and the user's profile through the token cache"""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+        else:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user__profile').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            token_cache.set(key, user, token)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (user, token)
+
+
+class BatchAuthentication(BaseAuthentication):
+    """
+    Authenticates the requests of a batch as the batch, which was authenticated once
+
+    The requests of a batch do not get its Authorization header. Outside of a batch, or within an anonymous
+    one, nothing is authenticated, so it must come after the classes reading the credentials of the request.
+    """
+
+    def authenticate(self, request):
+        return batch_credentials.get()
@@ -0,0 +1,140 @@
+import io
+import json
+import logging
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpRequest, HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import serializers
+from rest_framework.views import APIView
+
+from core.authentication import batch_credentials
+from core.routers import is_pinned, primary_pinned
+
+
+logger = logging.getLogger('django.request')
+
+# Objects fetched by the detail views during the current batch, see CachedObjectMixin
+batch_identity_map: ContextVar[Optional[dict]] = ContextVar('batch_identity_map', default=None)
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """A request of a batch"""
+    method = serializers.ChoiceField(choices=('GET', 'POST', 'PUT', 'PATCH', 'DELETE'), default='GET')
+    url = serializers.CharField()
+    headers = serializers.DictField(child=serializers.CharField(), default=dict)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Requests of a batch, run in order"""
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, requests: list) -> list:
+        if len(requests) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                _('A batch holds at most %(count)d requests.') % {'count': settings.BATCH_MAX_REQUESTS}
+            )
+        return requests
+
+
+class BatchView(APIView):
+    """
+    Runs a list of api requests in process and returns all their responses at once
+
+    The requests share the authentication of the batch, and the objects fetched by the detail
+    views until a request writes something. Every response is given with its status, its headers
+    and its JSON body.
+    """
+    allowed_namespaces = ('accounts', 'boards')
+    # Headers of the batch request that are not passed on to its requests
+    local_headers = ('HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_ACCEPT', 'HTTP_IF_NONE_MATCH',
+                     'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE')
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        token = batch_identity_map.set({})
+        # The cookie of the batch is not passed on, its requests are pinned to the primary here
+        pinned_token = primary_pinned.set(is_pinned(request))
+        # The user is authenticated once for the whole batch, anonymous requests keep the authenticators
+        # of their view so that they are challenged as they would be alone
+        credentials = (request.user, request.auth) if request.user.is_authenticated else None
+        credentials_token = batch_credentials.set(credentials)
+        try:
+            responses = []
+            for sub_request in serializer.validated_data['requests']:
+                responses.append(self.render_response(self.dispatch_sub_request(request, sub_request)))
+                if sub_request['method'] != 'GET':
+                    # The objects fetched so far may have been changed or deleted
+                    batch_identity_map.get().clear()
+                    # The following requests read what was written
+                    primary_pinned.set(True)
+        finally:
+            batch_identity_map.reset(token)
+            primary_pinned.reset(pinned_token)
+            batch_credentials.reset(credentials_token)
+
+        # The bodies are already JSON, they are put in the document without being parsed again
+        return HttpResponse(b'[' + b','.join(responses) + b']', content_type='application/json')
+
+    def dispatch_sub_request(self, request, sub_request: dict) -> HttpResponse:
+        url = urlsplit(sub_request['url'])
+        script_name = request.META.get('SCRIPT_NAME', '')
+        path_info = url.path[len(script_name):] if url.path.startswith(script_name) else url.path
+        try:
+            match = resolve(path_info)
+        except Resolver404:
+            match = None
+        if match is None or match.namespace not in self.allowed_namespaces:
+            return HttpResponse(json.dumps({'detail': str(_('Not found.'))}),
+                                status=404, content_type='application/json')
+
+        view_request = self.build_sub_request(request, sub_request, path_info, url.query)
+        try:
+            response = match.func(view_request, *match.args, **match.kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+        except Exception:
+            logger.exception('Error in the batched request %s %s', sub_request['method'], sub_request['url'])
+            return HttpResponse(json.dumps({'detail': str(_('A server error occurred.'))}),
+                                status=500, content_type='application/json')
+        return response
+
+    def build_sub_request(self, request, sub_request: dict, path_info: str, query: str) -> HttpRequest:
+        body = json.dumps(sub_request['body']).encode() if 'body' in sub_request else b''
+        environ = {key: value for key, value in request.META.items() if key not in self.local_headers}
+        environ.update({
+            'REQUEST_METHOD': sub_request['method'],
+            'PATH_INFO': path_info,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.input': io.BytesIO(body),
+        })
+        for name, value in sub_request['headers'].items():
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key not in ('HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_ACCEPT'):
+                environ[key] = value
+
+        return WSGIRequest(environ)
+
+    @staticmethod
+    def render_response(response: HttpResponse) -> bytes:
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        if not content:
+            body = b'null'
+        elif response.get('Content-Type', '').startswith('application/json'):
+            body = content
+        else:
+            body = json.dumps(content.decode(response.charset)).encode()
+        head = json.dumps({'status': response.status_code, 'headers': dict(response.items())})
+        return head[:-1].encode() + b',"body":' + body + b'}'
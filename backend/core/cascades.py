@@ -0,0 +1,128 @@
+from typing import Callable, Dict, List, NamedTuple, Optional, Type
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+from django.db.models import QuerySet
+from django.dispatch import Signal
+from django.utils import timezone
+
+from core.jobs import enqueue, task
+from core.models import Deletion
+
+
+# Sent with the instance and the database alias when an object is tombstoned, within the same transaction.
+# The receivers take back what the object showed elsewhere, such as the counters of its parents.
+tombstoned = Signal()
+
+
+class CascadeStep(NamedTuple):
+    """
+    Rows going away with a deleted object: deleted, or updated with values, in batches of primary keys
+
+    rows gives the queryset of the rows from the primary key of the object. A batch must take its rows
+    out of that queryset, which is what lets a step resume after a crash. before is called with the
+    primary keys and the database alias of every batch, before the batch runs.
+    """
+    rows: Callable[[int], QuerySet]
+    values: Optional[dict] = None
+    before: Optional[Callable[[List[int], str], None]] = None
+
+
+_cascades: Dict[Type[models.Model], List[CascadeStep]] = {}
+
+
+def register_cascade(model: Type[models.Model], *steps: CascadeStep) -> None:
+    """Adds steps to the cascade of a model, which must have a deleted_at field. The steps run in this order."""
+    _cascades.setdefault(model, []).extend(steps)
+
+
+def delete_later(instance: models.Model) -> Optional[Deletion]:
+    """
+    Tombstones the instance and enqueues the deletion of its rows, see run_cascade_batch()
+
+    :return: None when the instance was already tombstoned
+    """
+    model = type(instance)
+    if model not in _cascades:
+        raise ImproperlyConfigured(f'No cascade is registered for {model.__name__}')
+    using = instance._state.db or router.db_for_write(model, instance=instance)
+    with transaction.atomic(using=using):
+        deleted_at = timezone.now()
+        if not model._base_manager.using(using).filter(pk=instance.pk, deleted_at__isnull=True).update(
+                deleted_at=deleted_at):
+            return None
+        instance.deleted_at = deleted_at
+        tombstoned.send(sender=model, instance=instance, using=using)
+        deletion = Deletion.objects.using(using).create(
+            content_type=ContentType.objects.db_manager(using).get_for_model(model), object_id=instance.pk
+        )
+        enqueue('core.cascade', priority=settings.CASCADES['PRIORITY'], using=using, deletion=deletion.pk,
+                database=using)
+        return deletion
+
+
+def run_cascade_batch(deletion: Deletion, batch_size: int) -> int:
+    """
+    Runs the next batch of a cascade and saves its progress, returning the amount of rows it removed
+
+    The rows are deleted with a single DELETE, without loading them nor sending signals. Once every step
+    is done, the object is deleted the usual way, the collector finding nothing left to load, and the
+    deletion is finished. Must run in a transaction, so that the progress is saved with the batch.
+    """
+    using = deletion._state.db
+    model = deletion.content_type.model_class()
+    steps = _cascades[model]
+    processed = 0
+    while deletion.step < len(steps) and not processed:
+        step = steps[deletion.step]
+        pks = list(step.rows(deletion.object_id).using(using).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if pks:
+            if step.before is not None:
+                step.before(pks, using)
+            rows = step.rows(deletion.object_id).model._base_manager.using(using).filter(pk__in=pks)
+            processed = rows._raw_delete(using) if step.values is None else rows.update(**step.values)
+        if len(pks) < batch_size:
+            deletion.step += 1
+
+    if deletion.step == len(steps):
+        instance = model._base_manager.using(using).filter(pk=deletion.object_id).first()
+        if instance is not None:
+            instance.delete()
+        deletion.finished_at = timezone.now()
+    deletion.processed += processed
+    deletion.save(update_fields=['step', 'processed', 'finished_at'])
+    return processed
+
+
+@task('core.cascade')
+def run_cascade_job(deletion: int, database: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Runs a batch of the cascade, enqueuing the next one in the same transaction until it is finished
+
+    :param database: alias of the database holding the deletion and its rows, the next job is enqueued there
+    """
+    deletion = Deletion.objects.using(database).select_related('content_type').get(pk=deletion)
+    run_cascade_batch(deletion, settings.CASCADES['BATCH_SIZE'])
+    if deletion.finished_at is None:
+        enqueue('core.cascade', priority=settings.CASCADES['PRIORITY'], using=deletion._state.db,
+                deletion=deletion.pk, database=deletion._state.db)
+
+
+class CascadeDeletionAdmin:
+    """ModelAdmin mixin deleting the objects with delete_later(), tombstoned objects are not listed"""
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
+    def get_deleted_objects(self, objs, request):
+        # The confirmation page would otherwise collect, and list, every related row
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        delete_later(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            delete_later(obj)
@@ -0,0 +1,373 @@
+import asyncio
+import json
+import logging
+import re
+import select
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Pattern, Sequence, Set, Tuple
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class Event(NamedTuple):
+    """
+    Change published to the subscribers of its channels
+
+    The id orders the events, see make_event_id(). The data is rendered once by the publisher
+    and sent as is to every subscriber. An event without data is a gap: its subscribers may
+    have missed events and must look them up again.
+    """
+    id: str
+    name: str
+    channels: Tuple[str, ...]
+    data: Optional[str]
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict())
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'Event':
+        event = json.loads(payload)
+        return cls(event['id'], event['name'], tuple(event['channels']), event['data'])
+
+
+def make_event_id(at: datetime, pk: int) -> str:
+    """Id of the event of an object at a given time, ordered by time first"""
+    return f'{(at - _EPOCH) // _MICROSECOND}-{pk}'
+
+
+def parse_event_id(event_id: str) -> Optional[Tuple[datetime, int]]:
+    """Time and object of an event id, None if it is not one"""
+    try:
+        micros, pk = map(int, event_id.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return _EPOCH + micros * _MICROSECOND, pk
+
+
+def _event_key(event_id: str) -> Tuple[int, ...]:
+    return tuple(map(int, event_id.split('-')))
+
+
+class Subscription:
+    """Events of some channels, queued for a consumer running in an event loop"""
+
+    def __init__(self, channels: Sequence[str], queue_size: int):
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, event: Event) -> None:
+        """Queues the event, from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop of the consumer is closed
+            pass
+
+    def _put(self, event: Event) -> None:
+        if self.queue.full():
+            # A slow consumer gets a gap instead of holding an unbounded backlog
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = Event(event.id, 'gap', (), None)
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Event:
+        return await self.queue.get()
+
+
+class EventHub:
+    """
+    In-process fan out of events to the subscribers of their channels
+
+    Subscribers wait on a queue in their event loop, so an idle subscriber costs no thread.
+    The events reach the hub through the event backend of the database, see get_event_backend().
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels: Sequence[str]) -> Subscription:
+        """Subscribes to the channels, must be called in the event loop of the consumer"""
+        get_event_backend(settings.EVENTS['DATABASE']).start()
+        subscription = Subscription(channels, settings.EVENTS['QUEUE_SIZE'])
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].discard(subscription)
+                if not self._subscriptions[channel]:
+                    del self._subscriptions[channel]
+
+    def dispatch(self, event: Event) -> None:
+        """Delivers the event to its subscribers, a gap without channels goes to every subscriber"""
+        with self._lock:
+            if event.channels:
+                subscriptions = set().union(*(self._subscriptions.get(channel, ()) for channel in event.channels))
+            else:
+                subscriptions = set().union(*self._subscriptions.values())
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+
+event_hub = EventHub()
+
+
+class LocalEventBackend:
+    """Delivers the events to the subscribers of this process only"""
+
+    def __init__(self, hub: EventHub, using: str):
+        self.hub = hub
+        self.using = using
+
+    def start(self) -> None:
+        pass
+
+    def publish(self, event: Event) -> None:
+        """Dispatches the event once the current transaction commits"""
+        transaction.on_commit(lambda: self.hub.dispatch(event), using=self.using)
+
+
+class PostgresEventBackend(LocalEventBackend):
+    """
+    Fans the events out to every process through LISTEN/NOTIFY
+
+    NOTIFY is sent within the transaction of the change, PostgreSQL delivers it at commit. Each
+    process listens on a single connection, in a thread started with its first subscriber.
+    """
+    # NOTIFY payloads are limited to 8000 bytes
+    max_payload = 7900
+    poll_timeout = 5
+    retry_delay = 1
+
+    def __init__(self, hub: EventHub, using: str):
+        super().__init__(hub, using)
+        self._listener: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def publish(self, event: Event) -> None:
+        payload = event.to_json()
+        if len(payload.encode()) > self.max_payload:
+            # The subscribers of the channels look the event up themselves
+            payload = Event(event.id, 'gap', event.channels, None).to_json()
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [settings.EVENTS['CHANNEL'], payload])
+
+    def start(self) -> None:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self.listen, name='event-listener', daemon=True)
+                self._listener.start()
+
+    def receive(self, payload: str) -> None:
+        """Dispatches the event of a notification, a malformed one is logged and skipped"""
+        try:
+            event = Event.from_json(payload)
+        except (ValueError, KeyError, TypeError):
+            # Anything can NOTIFY the channel, the listener must go on
+            logger.exception('Skipped a malformed event: %.200r', payload)
+            return
+        self.hub.dispatch(event)
+
+    def listen(self) -> None:
+        import psycopg2
+
+        connection = connections[self.using]
+        while True:
+            try:
+                listener = psycopg2.connect(**connection.get_connection_params())
+                listener.set_session(autocommit=True)
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {connection.ops.quote_name(settings.EVENTS["CHANNEL"])}')
+                # Nothing was received while the listener was not connected
+                self.hub.dispatch(Event(make_event_id(datetime.now(timezone.utc), 0), 'gap', (), None))
+                while True:
+                    if select.select([listener], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        self.receive(listener.notifies.pop(0).payload)
+            except psycopg2.Error:
+                logger.exception('Lost the connection listening to the events, reconnecting')
+                time.sleep(self.retry_delay)
+
+
+BACKENDS = {
+    'postgresql': PostgresEventBackend,
+}
+_backends: Dict[str, LocalEventBackend] = {}
+
+
+def get_event_backend(using: str = 'default') -> LocalEventBackend:
+    if using not in _backends:
+        backend_class = BACKENDS.get(connections[using].vendor, LocalEventBackend)
+        _backends.setdefault(using, backend_class(event_hub, using))
+    return _backends[using]
+
+
+def publish(event: Event, using: str = 'default') -> None:
+    get_event_backend(using).publish(event)
+
+
+def database_sync_to_async(func: Callable) -> Callable[..., Awaitable]:
+    """Runs a function using the database in the sync thread, closing the connection like a request would"""
+    def wrapper(*args):
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper)
+
+
+# Looks up the events after an event id, None when there are too many to replay
+Replay = Callable[[str, int], Optional[List[Event]]]
+
+
+class _SentIds:
+    """Ids of the last events sent on a stream, bounded to the events a replay and the subscription can both hold"""
+
+    def __init__(self, size: int):
+        self._order = deque()
+        self._ids: Set[str] = set()
+        self.size = size
+
+    def add(self, event_id: str) -> bool:
+        """Records the id, returning whether it was not sent already"""
+        if event_id in self._ids:
+            return False
+        self._ids.add(event_id)
+        self._order.append(event_id)
+        if len(self._order) > self.size:
+            self._ids.discard(self._order.popleft())
+        return True
+
+
+def _format(event: Event) -> bytes:
+    return f'id: {event.id}\nevent: {event.name}\ndata: {event.data}\n\n'.encode()
+
+
+async def stream_events(scope: dict, receive: Callable, send: Callable, channels: Sequence[str], replay: Replay):
+    """
+    Sends the events of the channels as Server-Sent Events, until the client disconnects
+
+    A client resuming with a Last-Event-ID header, or a last_event_id query parameter, first gets
+    the events it missed from replay(). Gaps in the subscription are filled the same way. A client
+    too far behind gets a `reset` event and should load the resource again.
+
+    The ids are stamped before commit while the live events arrive in commit order, so a live event
+    may be older than the last one sent. It is sent all the same, only the events a replay already
+    sent are skipped.
+    """
+    config = settings.EVENTS
+    headers = dict(scope['headers'])
+    query = parse_qs(scope.get('query_string', b'').decode())
+    last_id = headers.get(b'last-event-id', b'').decode() or query.get('last_event_id', [''])[0]
+    if parse_event_id(last_id) is None:
+        last_id = None
+
+    subscription = event_hub.subscribe(channels)
+    sent = _SentIds(config['REPLAY_LIMIT'] + config['QUEUE_SIZE'])
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    received = None
+    try:
+        if last_id is None:
+            # Events published from now on are live, earlier ones are replayed after a gap
+            last_id = make_event_id(datetime.now(timezone.utc), 0)
+            missed = []
+        else:
+            missed = await database_sync_to_async(replay)(last_id, config['REPLAY_LIMIT'])
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        while True:
+            if missed is None:
+                # The client resumes from the reset once it loaded the resource again
+                last_id = make_event_id(datetime.now(timezone.utc), 0)
+                missed = [Event(last_id, 'reset', (), '{}')]
+            for event in missed:
+                if not sent.add(event.id):
+                    continue
+                if _event_key(event.id) > _event_key(last_id):
+                    # The next replay starts from the newest event sent
+                    last_id = event.id
+                await send({'type': 'http.response.body', 'body': _format(event), 'more_body': True})
+            missed = []
+
+            if received is None:
+                received = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({received, disconnected}, timeout=config['KEEPALIVE'],
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                break
+            if received not in done:
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                continue
+            event, received = received.result(), None
+            if event.data is None:
+                missed = await database_sync_to_async(replay)(last_id, config['REPLAY_LIMIT'])
+            else:
+                missed = [event]
+    finally:
+        event_hub.unsubscribe(subscription)
+        for task in (received, disconnected):
+            if task is not None:
+                task.cancel()
+
+
+async def _wait_for_disconnect(receive: Callable) -> None:
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def send_json(send: Callable, status: int, document: dict) -> None:
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(document).encode()})
+
+
+class EventStreamRouter:
+    """ASGI application serving the event streams itself, and every other request through Django"""
+
+    def __init__(self, routes: Iterable[Tuple[str, Callable]], application: Callable):
+        """
+        :param routes: regex of the path, without the script prefix, and stream application called
+                       with the scope, receive, send and the integer groups of the regex
+        :param application: application of the other requests
+        """
+        self.routes: List[Tuple[Pattern, Callable]] = [(re.compile(path), stream) for path, stream in routes]
+        self.application = application
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            root_path = scope.get('root_path', '')
+            path = scope['path'][len(root_path):] if scope['path'].startswith(root_path) else scope['path']
+            for pattern, stream in self.routes:
+                match = pattern.match(path)
+                if match:
+                    kwargs = {name: int(value) for name, value in match.groupdict().items()}
+                    return await stream(scope, receive, send, **kwargs)
+        return await self.application(scope, receive, send)
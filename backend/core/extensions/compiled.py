@@ -0,0 +1,195 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import QuerySet
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.extensions.hyperlinks import HrefField, build_url
+from core.instrumentation import time_serialization
+from core.pagination import get_ordering_fields
+
+
+# Fields whose to_representation() gives back the value read from the database unchanged
+_PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+                       serializers.ReadOnlyField, serializers.PrimaryKeyRelatedField)
+
+
+_compiled: Dict[tuple, tuple] = {}
+
+
+class CompiledSerializerMismatch(AssertionError):
+    """Raised in verification mode when the compiled output differs from the serializer's"""
+
+
+class _Compiler:
+    """Turns the fields of a serializer into the source of a function building a dict from a values() row"""
+
+    def __init__(self, compiled: 'CompiledSerializer'):
+        self.compiled = compiled
+        self.columns: List[str] = []
+        self.constants: Dict[str, object] = {}
+        self.resolved: List[str] = []
+
+    def column(self, name: str) -> str:
+        if name not in self.columns:
+            self.columns.append(name)
+        return f'row[{name!r}]'
+
+    def constant(self, value) -> str:
+        name = f'_c{len(self.constants)}'
+        self.constants[name] = value
+        return name
+
+    def compile(self, serializer: serializers.Serializer, prefix: str = '') -> str:
+        """Returns a dict display building the representation of `serializer` from the row"""
+        model = serializer.Meta.model
+        self.column(prefix + model._meta.pk.name)
+        items = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            items.append(f'{name!r}: {self.compile_field(model, name, field, prefix)}')
+        return '{' + ', '.join(items) + '}'
+
+    def compile_field(self, model, name: str, field: serializers.Field, prefix: str) -> str:
+        if isinstance(field, HrefField):
+            kwargs = ', '.join(f'{kwarg!r}: {self.column(prefix + attribute)}'
+                               for kwarg, attribute in field.url_kwargs.items())
+            return f'build_url({field.view_name!r}, {{{kwargs}}}, request)'
+
+        if isinstance(field, serializers.Serializer) and '.' not in field.source:
+            relation = self.column(prefix + field.source)
+            return f'(None if {relation} is None else {self.compile(field, prefix + field.source + "__")})'
+
+        if isinstance(field, serializers.Field) and not isinstance(field, serializers.BaseSerializer) \
+                and '.' not in field.source and self.is_concrete(model, field.source):
+            value = self.column(prefix + field.source)
+            if isinstance(field, _PASSTHROUGH_FIELDS):
+                return value
+            convert = self.constant(field.to_representation)
+            return f'(None if {value} is None else {convert}({value}))'
+
+        if prefix or not hasattr(self.compiled, f'resolve_{name}'):
+            raise ImproperlyConfigured(
+                f'{type(self.compiled).__name__} can not compile the field {prefix}{name}, '
+                f'a resolve_{name}() method is needed for top level fields'
+            )
+        self.resolved.append(name)
+        pk = self.column(model._meta.pk.name)
+        return f'resolved[{name!r}].get({pk}, defaults[{name!r}])'
+
+    @staticmethod
+    def is_concrete(model, name: str) -> bool:
+        try:
+            return model._meta.get_field(name).concrete
+        except FieldDoesNotExist:
+            return False
+
+
+class CompiledSerializer:
+    """
+    Read only fast path producing the representation of a ModelSerializer from values() rows
+
+    The serializer's fields are compiled once per class into a function building plain dicts, so
+    that no field is bound and no model instance is created per row. Model fields, foreign keys,
+    nested to-one serializers and href fields are compiled, any other top level field is filled
+    by a `resolve_<field>(rows, context)` method returning the values by primary key, and a
+    `default_<field>(context)` method giving the value of the rows missing from it.
+    """
+    serializer_class = None
+
+    def __init__(self, serializer_class=None):
+        if serializer_class is not None:
+            self.serializer_class = serializer_class
+
+    def get_compiled(self) -> tuple:
+        """Compiles the serializer the first time it is used"""
+        key = (type(self), self.serializer_class)
+        compiled = _compiled.get(key)
+        if compiled is None:
+            compiler = _Compiler(self)
+            body = compiler.compile(self.serializer_class())
+            source = (f'def make_serializer(request, resolved, defaults):\n'
+                      f'    def serialize(row):\n'
+                      f'        return {body}\n'
+                      f'    return serialize\n')
+            namespace = dict(compiler.constants, build_url=build_url)
+            exec(compile(source, f'<compiled {self.serializer_class.__name__}>', 'exec'), namespace)
+            compiled = (namespace['make_serializer'], tuple(compiler.columns), tuple(compiler.resolved))
+            _compiled[key] = compiled
+        return compiled
+
+    @property
+    def columns(self) -> Sequence[str]:
+        return self.get_compiled()[1]
+
+    def get_rows(self, queryset: QuerySet, extra: Iterable[str] = ()) -> QuerySet:
+        """values() queryset holding every column the compiled serializer reads, and the extra ones"""
+        columns = self.columns
+        return queryset.prefetch_related(None).values(*columns, *(name for name in extra if name not in columns))
+
+    def serialize(self, rows: Sequence[dict], context: dict) -> List[dict]:
+        make_serializer, _, resolved_fields = self.get_compiled()
+        rows = list(rows)
+        resolved = {name: getattr(self, f'resolve_{name}')(rows, context) for name in resolved_fields}
+        defaults = {name: getattr(self, f'default_{name}', lambda _: None)(context) for name in resolved_fields}
+        serialize = make_serializer(context.get('request'), resolved, defaults)
+        return [serialize(row) for row in rows]
+
+    def verify(self, queryset: QuerySet, rows: Sequence[dict], data: List[dict], context: dict) -> None:
+        """Checks that the serializer renders exactly the same JSON as the compiled output for these rows"""
+        pk_name = queryset.model._meta.pk.name
+        instances = queryset.in_bulk([row[pk_name] for row in rows])
+        expected = self.serializer_class([instances[row[pk_name]] for row in rows], many=True, context=context).data
+        renderer = JSONRenderer()
+        if renderer.render(expected) != renderer.render(data):
+            raise CompiledSerializerMismatch(
+                f'Compiled {self.serializer_class.__name__} rendered {data!r} instead of {expected!r}'
+            )
+
+
+def compiled_serializers_setting(name: str) -> bool:
+    return getattr(settings, 'COMPILED_SERIALIZERS', {}).get(name, False)
+
+
+class CompiledListMixin:
+    """
+    Viewset mixin serving the list action through a compiled serializer
+
+    It is only used when the view serializes with the compiled serializer's class. With the VERIFY
+    setting, every page is also serialized by the regular serializer and compared to the compiled output.
+    """
+    compiled_serializer: Optional[CompiledSerializer] = None
+
+    def get_compiled_serializer(self) -> Optional[CompiledSerializer]:
+        compiled = self.compiled_serializer
+        if compiled is None or not compiled_serializers_setting('ENABLED'):
+            return None
+        if compiled.serializer_class is not self.get_serializer_class():
+            return None
+        return compiled
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # The pagination reads its ordering fields from the last row of the page
+        rows = self.paginate_queryset(compiled.get_rows(queryset, get_ordering_fields(self.paginator)))
+        paginated = rows is not None
+        if not paginated:
+            rows = list(compiled.get_rows(queryset))
+
+        context = self.get_serializer_context()
+        data = time_serialization(compiled.serialize, rows, context)
+        if compiled_serializers_setting('VERIFY'):
+            compiled.verify(queryset, rows, data, context)
+
+        if paginated:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,95 @@
+import re
+from typing import Dict, Tuple
+from urllib.parse import quote
+
+from django.urls import reverse as django_reverse, get_script_prefix
+from django.utils.http import RFC3986_SUBDELIMS
+
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+# Only digits, so that every path converter accepts the placeholders
+_PLACEHOLDER = '4815162342{}2432615184'
+_PLACEHOLDER_RE = re.compile('4815162342([0-9]+)2432615184')
+_SAFE_CHARACTERS = RFC3986_SUBDELIMS + '/~:@'
+
+_templates: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+
+
+def get_url_template(view_name: str, kwarg_names: Tuple[str, ...]) -> str:
+    """
+    Returns the path of a view as a str.format() template, without the script prefix
+
+    The url resolver is only walked the first time a view is asked for, with placeholder kwargs
+    which are then turned into replacement fields.
+    """
+    key = (view_name, kwarg_names)
+    template = _templates.get(key)
+    if template is None:
+        placeholders = {name: _PLACEHOLDER.format(index) for index, name in enumerate(kwarg_names)}
+        path = django_reverse(view_name, kwargs=placeholders)[len(get_script_prefix()):]
+        parts = _PLACEHOLDER_RE.split(path)
+        template = ''.join(
+            part.replace('{', '{{').replace('}', '}}') if index % 2 == 0 else '{%s}' % kwarg_names[int(part)]
+            for index, part in enumerate(parts)
+        )
+        _templates[key] = template
+    return template
+
+
+def _get_base_and_suffix(request) -> Tuple[str, str]:
+    """Returns what rest_framework.reverse adds around a path for this request, computed once per request"""
+    cached = getattr(request, '_hyperlink_base_and_suffix', None)
+    if cached is None:
+        suffix = ''
+        format_param = api_settings.URL_FORMAT_OVERRIDE
+        if format_param and format_param in request.GET:
+            suffix = replace_query_param('/', format_param, request.GET[format_param])[1:]
+        cached = (request.build_absolute_uri('/')[:-1], suffix)
+        request._hyperlink_base_and_suffix = cached
+    return cached
+
+
+def build_url(view_name: str, kwargs: dict, request=None, base: str = '') -> str:
+    """
+    Builds the same url as rest_framework.reverse.reverse, by string substitution
+
+    :param view_name: name of the view, with its namespace
+    :param kwargs: url kwargs of the view
+    :param request: request giving the scheme and host
+    :param base: scheme and host used without a request, the url is relative without either
+    """
+    template = get_url_template(view_name, tuple(sorted(kwargs)))
+    path = get_script_prefix() + template.format(**{
+        name: value if type(value) is int else quote(str(value), safe=_SAFE_CHARACTERS)
+        for name, value in kwargs.items()
+    })
+    if request is None:
+        return base + path
+    base, suffix = _get_base_and_suffix(request)
+    return base + path + suffix
+
+
+class HrefField(serializers.Field):
+    """
+    Read only field holding the url of the serialized object's view
+
+    The url is absolute against the request of the context, or without one against its base_url.
+    """
+
+    def __init__(self, view_name: str, url_kwargs: Dict[str, str], **kwargs):
+        """
+        :param view_name: name of the view, with its namespace
+        :param url_kwargs: object attribute giving each url kwarg
+        """
+        self.view_name = view_name
+        self.url_kwargs = url_kwargs
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj) -> str:
+        kwargs = {name: getattr(obj, attribute) for name, attribute in self.url_kwargs.items()}
+        return build_url(self.view_name, kwargs, self.context.get('request'), self.context.get('base_url', ''))
@@ -1,5 +1,7 @@
 from rest_framework.relations import HyperlinkedIdentityField
 
+from core.extensions.hyperlinks import build_url
+
 
 # noinspection PyShadowingBuiltins
 class ComplexHyperlinkedIdentityField(HyperlinkedIdentityField):
@@ -28,4 +30,6 @@ class ComplexHyperlinkedIdentityField(HyperlinkedIdentityField):
 
         lookup_value = getattr(obj, self.lookup_field)
         kwargs = {self.lookup_url_kwarg: lookup_value, **extra_kwargs}
-        return self.reverse(view_name, kwargs=kwargs, request=request, format=format)
+        if format:
+            return self.reverse(view_name, kwargs=kwargs, request=request, format=format)
+        return build_url(view_name, kwargs, request)
@@ -0,0 +1,240 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, QuerySet
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer, Field, ModelSerializer, SerializerMethodField
+
+from core.extensions.hyperlinks import HrefField
+from core.pagination import get_ordering_fields
+
+
+class DynamicFieldsModelSerializer(ModelSerializer):
+    """
+    A ModelSerializer that takes an additional `fields` argument that
+    controls which fields should be displayed, and an `expand` argument
+    replacing the fields giving the ids or hrefs of relations by the related
+    objects, serialized whole.
+
+    `expand` is a tree of the relations to expand, see parse_expand(), and
+    `expandable_fields` builds the expanded field of every relation from the
+    expansions nested under it. `field_requirements` gives the model fields,
+    relations and prefetched attributes read by the fields that do not read
+    their source, SerializerMethodFields for instance.
+    """
+    expandable_fields: Dict[str, Callable[[dict], Field]] = {}
+    field_requirements: Dict[str, Sequence[str]] = {}
+
+    def __init__(self, *args, **kwargs):
+        # Don't pass the 'fields' and 'expand' args up to the superclass
+        fields = kwargs.pop('fields', None)
+        self.expand = kwargs.pop('expand', None) or {}
+
+        # Instantiate the superclass normally
+        super(DynamicFieldsModelSerializer, self).__init__(*args, **kwargs)
+
+        if fields is not None:
+            # Drop any fields that are not specified in the `fields` argument.
+            allowed = set(fields)
+            existing = set(self.fields)
+            for field_name in existing - allowed:
+                self.fields.pop(field_name)
+
+        self.expanded = set()
+        for field_name, nested in self.expand.items():
+            if field_name in self.fields and field_name in self.expandable_fields:
+                self.fields[field_name] = self.expandable_fields[field_name](nested)
+                self.expanded.add(field_name)
+
+
+class ExpandedMethodField(SerializerMethodField):
+    """
+    A SerializerMethodField expanding a relation with serializer_class, the method
+    passing the nested expansions on. The nested expansions are checked against
+    serializer_class.
+    """
+
+    def __init__(self, serializer_class: type, method_name: str = None, **kwargs):
+        self.serializer_class = serializer_class
+        super().__init__(method_name, **kwargs)
+
+
+def parse_expand(value: str) -> dict:
+    """Tree of the relations to expand, from comma separated paths such as `posts,posts.author`"""
+    tree = {}
+    for path in filter(None, (part.strip() for part in value.split(','))):
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _unknown_expansions(serializer_class: type, expand: dict, prefix: str = '') -> List[str]:
+    expandable = getattr(serializer_class, 'expandable_fields', {})
+    unknown = []
+    for name, nested in expand.items():
+        if name not in expandable:
+            unknown.append(prefix + name)
+        elif nested:
+            field = expandable[name]({})
+            nested_class = getattr(field, 'serializer_class', None) or type(getattr(field, 'child', field))
+            unknown += _unknown_expansions(nested_class, nested, f'{prefix}{name}.')
+    return unknown
+
+
+def get_expand(request, serializer_class: type, param: str = 'expand') -> dict:
+    """Expansions asked for by the request, the unknown relations being rejected"""
+    expand = parse_expand(request.query_params.get(param, ''))
+    unknown = _unknown_expansions(serializer_class, expand)
+    if unknown:
+        raise ValidationError({param: [_('Unknown expansions: %(expand)s.') % {'expand': ', '.join(unknown)}]})
+    return expand
+
+
+def get_field_requirements(serializer: BaseSerializer) -> Optional[Set[str]]:
+    """
+    Model fields, relations and prefetched attributes the readable fields of the serializer read
+
+    :return: None when a field reads something that is not known
+    """
+    declared = getattr(serializer, 'field_requirements', {})
+    required = set()
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in declared:
+            required.update(declared[name])
+        elif isinstance(field, HrefField):
+            required.update(field.url_kwargs.values())
+        elif field.source == '*':
+            return None
+        else:
+            required.add(field.source_attrs[0])
+    return required
+
+
+def _select_related_paths(select_related: dict, prefix: str = '') -> Iterator[str]:
+    for name, nested in select_related.items():
+        yield from _select_related_paths(nested, f'{prefix}{name}__') if nested else (prefix + name,)
+
+
+def prune_queryset(queryset: QuerySet, required: Iterable[str]) -> QuerySet:
+    """
+    Loads only the columns, the select_related relations and the prefetches the requirements name
+
+    :param required: model fields, attnames included, relations and prefetch attributes
+    """
+    if queryset.query.select_related is True:
+        # Every relation is followed, the ones that are needed are not known
+        return queryset
+
+    opts = queryset.model._meta
+    names, columns = set(), {opts.pk.name}
+    for name in required:
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            names.add(name)
+            continue
+        names.add(field.name)
+        if field.concrete:
+            columns.add(field.name)
+
+    if queryset.query.select_related:
+        related = [path for path in _select_related_paths(queryset.query.select_related)
+                   if path.split('__', 1)[0] in names]
+        queryset = queryset.select_related(None)
+        if related:
+            # Without arguments, select_related() follows every relation
+            queryset = queryset.select_related(*related)
+    prefetches = [lookup for lookup in queryset._prefetch_related_lookups
+                  if (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup).split('__', 1)[0] in names]
+    return queryset.prefetch_related(None).prefetch_related(*prefetches).only(*columns)
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin serializing only the fields listed by the `?fields=` parameter of safe requests
+
+    The queryset is narrowed to what these fields read: the columns of the other fields are
+    deferred, and their select_related relations and prefetches are dropped. The serializer
+    class must be a DynamicFieldsModelSerializer.
+    """
+    fields_query_param = 'fields'
+
+    def get_sparse_fields(self) -> Optional[Sequence[str]]:
+        """Fields requested with ?fields=, None when every field is"""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            param = self.request.query_params.get(self.fields_query_param)
+            if param is not None and self.request.method in SAFE_METHODS:
+                fields = [name for name in (part.strip() for part in param.split(',')) if name]
+                readable = [name for name, field in self.get_serializer_class()().fields.items()
+                            if not field.write_only]
+                unknown = [name for name in fields if name not in readable]
+                if unknown:
+                    raise ValidationError({self.fields_query_param: [
+                        _('Unknown fields: %(fields)s.') % {'fields': ', '.join(unknown)}
+                    ]})
+                self._sparse_fields = fields
+        return self._sparse_fields
+
+    def is_field_requested(self, name: str) -> bool:
+        fields = self.get_sparse_fields()
+        return fields is None or name in fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def get_compiled_serializer(self):
+        # The compiled serializers write every field
+        if self.get_sparse_fields() is not None:
+            return None
+        return super().get_compiled_serializer()
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        required = get_field_requirements(self.get_serializer())
+        if required is None:
+            return queryset
+        required.update(get_ordering_fields(self.paginator))
+        return prune_queryset(queryset, required)
+
+
+class ExpandableFieldsMixin:
+    """
+    Viewset mixin expanding the relations listed by the `?expand=` parameter of safe requests
+
+    The relations are given by id or href otherwise. The views load every expanded relation
+    with a select_related or a prefetch, through the setup_eager_loading() of their serializers.
+    """
+    expand_query_param = 'expand'
+
+    def get_expand(self) -> dict:
+        """Tree of the requested expansions, see parse_expand()"""
+        if not hasattr(self, '_expand'):
+            self._expand = {}
+            if self.request.method in SAFE_METHODS:
+                self._expand = get_expand(self.request, self.get_serializer_class(), self.expand_query_param)
+        return self._expand
+
+    def get_serializer(self, *args, **kwargs):
+        expand = self.get_expand()
+        if expand:
+            kwargs['expand'] = expand
+        return super().get_serializer(*args, **kwargs)
+
+    def get_compiled_serializer(self):
+        # The compiled serializers write the relations collapsed
+        if self.get_expand():
+            return None
+        return super().get_compiled_serializer()
@@ -0,0 +1,218 @@
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from random import random
+from time import perf_counter
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+# Timing of the current request, set by InstrumentationMiddleware when the request is sampled
+_current_timing: ContextVar[Optional['RequestTiming']] = ContextVar('request_timing', default=None)
+
+_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'))
+
+
+class RequestTiming:
+    """Query count and time spent in the database, the serializers and the renderers by a sampled request"""
+    __slots__ = ('queries', 'db', 'serialize', 'render', 'render_start', 'serializing')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = self.serialize = self.render = 0.0
+        self.render_start = None
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """Execute wrapper of the database connections"""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self, total: float) -> str:
+        """Value of the Server-Timing header, durations in milliseconds"""
+        return (f'db;desc="{self.queries} queries";dur={self.db * 1000:.2f}, '
+                f'serialize;dur={self.serialize * 1000:.2f}, render;dur={self.render * 1000:.2f}, '
+                f'total;dur={total * 1000:.2f}')
+
+
+class Metrics:
+    """
+    Latency histograms of the requests by view and method, and the totals of the sampled timings
+
+    The metrics are kept by each process, every worker is scraped on its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets: Tuple[float, ...] = tuple(settings.INSTRUMENTATION['BUCKETS'])
+            # Labels: [count per bucket, with +Inf last, sum, count]
+            self._latencies: Dict[Tuple[str, str], list] = {}
+            # Labels: [sampled requests, queries, db, serialize, render]
+            self._timings: Dict[Tuple[str, str], list] = {}
+
+    def observe(self, labels: Tuple[str, str], seconds: float, timing: RequestTiming = None) -> None:
+        index = bisect_left(self._buckets, seconds)
+        with self._lock:
+            latency = self._latencies.get(labels)
+            if latency is None:
+                latency = self._latencies[labels] = [[0] * (len(self._buckets) + 1), 0.0, 0]
+            latency[0][index] += 1
+            latency[1] += seconds
+            latency[2] += 1
+            if timing is not None:
+                totals = self._timings.setdefault(labels, [0, 0, 0.0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += timing.queries
+                totals[2] += timing.db
+                totals[3] += timing.serialize
+                totals[4] += timing.render
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text format"""
+        with self._lock:
+            latencies = {labels: (list(counts), total, count) for labels, (counts, total, count)
+                         in self._latencies.items()}
+            timings = {labels: list(totals) for labels, totals in self._timings.items()}
+
+        lines = ['# HELP http_request_duration_seconds Latency of the requests by view and method.',
+                 '# TYPE http_request_duration_seconds histogram']
+        bounds = [f'{bound:g}' for bound in self._buckets] + ['+Inf']
+        for labels, (counts, total, count) in sorted(latencies.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append(f'http_request_duration_seconds_bucket{{{_labels(labels)},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{_labels(labels)}}} {total!r}')
+            lines.append(f'http_request_duration_seconds_count{{{_labels(labels)}}} {count}')
+
+        for index, (name, help_text) in enumerate((
+            ('http_sampled_requests_total', 'Requests whose timings were measured.'),
+            ('http_sampled_db_queries_total', 'Database queries of the sampled requests.'),
+            ('http_sampled_db_seconds_total', 'Time spent in the database by the sampled requests.'),
+            ('http_sampled_serialize_seconds_total', 'Time spent in the serializers by the sampled requests.'),
+            ('http_sampled_render_seconds_total', 'Time spent rendering the sampled responses.'),
+        )):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [f'{name}{{{_labels(labels)}}} {totals[index]!r}' for labels, totals in sorted(timings.items())]
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels: Tuple[str, str]) -> str:
+    view, method = (value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in labels)
+    return f'view="{view}",method="{method}"'
+
+
+metrics = Metrics()
+
+
+def get_labels(request: HttpRequest) -> Tuple[str, str]:
+    """View name and method of the request, the requests that matched no view are put together"""
+    match = request.resolver_match
+    return (match.view_name if match is not None else 'unmatched',
+            request.method if request.method in _METHODS else 'OTHER')
+
+
+class InstrumentationMiddleware:
+    """
+    Records the latency of every request in the metrics served by MetricsView, and measures the database,
+    serializer and render times of a share of them
+
+    The sampled requests are given a Server-Timing header. The others only pay for two clock reads
+    and the histogram update, so INSTRUMENTATION['SAMPLE_RATE'] is kept low in production.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        start = perf_counter()
+        if random() >= settings.INSTRUMENTATION['SAMPLE_RATE']:
+            response = self.get_response(request)
+            metrics.observe(get_labels(request), perf_counter() - start)
+            return response
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timing))
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        end = perf_counter()
+        if timing.render_start is not None:
+            # The responses are rendered once all the template response middlewares ran, this one last
+            timing.render = end - timing.render_start
+        total = end - start
+        metrics.observe(get_labels(request), total, timing)
+        response['Server-Timing'] = timing.server_timing(total)
+        return response
+
+    def process_template_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.render_start = perf_counter()
+        return response
+
+
+def time_serialization(serialize, *args, **kwargs):
+    """
+    Calls serialize, counting its time as serializer time when the request is sampled
+
+    The queries run by the serializers, for the relations that were not prefetched, are left to the database time.
+    """
+    timing = _current_timing.get()
+    if timing is None or timing.serializing:
+        return serialize(*args, **kwargs)
+    timing.serializing = True
+    start, db = perf_counter(), timing.db
+    try:
+        return serialize(*args, **kwargs)
+    finally:
+        timing.serialize += perf_counter() - start - (timing.db - db)
+        timing.serializing = False
+
+
+class TimedSerializationMixin:
+    """
+    Generic view mixin counting the serializers of the list and retrieve actions in the serializer time
+
+    It must come right before the generic view, the mixins around the actions then count with it. The
+    compiled lists and the searches time their serializers themselves, the streamed ones are not timed.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(queryset if page is None else page, many=True)
+        data = time_serialization(getattr, serializer, 'data')
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        return Response(time_serialization(getattr, serializer, 'data'))
+
+
+class MetricsView(APIView):
+    """Metrics of this process in the Prometheus text format, for the staff"""
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,93 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_tasks: Dict[str, Callable[..., None]] = {}
+
+
+def task(name: str) -> Callable[[Callable[..., None]], Callable[..., None]]:
+    """Decorator registering a function as the task enqueued under the name, see enqueue()"""
+    def register(func: Callable[..., None]) -> Callable[..., None]:
+        _tasks[name] = func
+        return func
+    return register
+
+
+def enqueue(name: str, priority: int = 0, delay: Optional[timedelta] = None, max_attempts: Optional[int] = None,
+            unique: bool = False, using: str = DEFAULT_DB_ALIAS, **kwargs) -> Job:
+    """
+    Enqueues a call of the task with the keyword arguments, which must be JSON serializable
+
+    The job is inserted in the current transaction, so the workers only see it once the transaction
+    commits, and never if it is rolled back. A unique job is not enqueued again while the same call is
+    pending, the pending job is returned instead.
+
+    A job a worker is running may have read the data before the caller's writes, so it is not pending:
+    the lookup skips the rows locked by the workers, see run_next_job(). Within a transaction, the pending
+    job it finds stays locked until the transaction ends, so it runs after the caller's writes commit.
+    """
+    if name not in _tasks:
+        raise ImproperlyConfigured(f'No task is registered as {name}')
+    arguments = json.dumps(kwargs, sort_keys=True)
+    if unique:
+        with transaction.atomic(using=using):
+            pending = (Job.objects.using(using).select_for_update(skip_locked=True)
+                       .filter(name=name, arguments=arguments, failed_at__isnull=True).first())
+        if pending is not None:
+            return pending
+    return Job.objects.using(using).create(
+        name=name,
+        arguments=arguments,
+        priority=priority,
+        run_at=timezone.now() + (delay or timedelta()),
+        max_attempts=max_attempts or settings.JOBS['MAX_ATTEMPTS'],
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the failed attempts, bounded by the MAX_RETRY_DELAY setting"""
+    config = settings.JOBS
+    return timedelta(seconds=min(config['RETRY_DELAY'] * 2 ** (attempts - 1), config['MAX_RETRY_DELAY']))
+
+
+def run_next_job(using: str = DEFAULT_DB_ALIAS) -> Optional[Job]:
+    """
+    Claims the next job that is due, the highest priority first, and runs it. None when no job is due.
+
+    The job is locked until it is done, the other workers skip it and claim the next one. The task runs
+    in the transaction of the job: its writes commit with the deletion of the job, and are rolled back
+    when it fails, the failure being recorded for the retry.
+    """
+    with transaction.atomic(using=using):
+        job = (Job.objects.using(using).select_for_update(skip_locked=True)
+               .filter(failed_at__isnull=True, run_at__lte=timezone.now())
+               .order_by('-priority', 'run_at', 'id').first())
+        if job is None:
+            return None
+        try:
+            with transaction.atomic(using=using):
+                _tasks[job.name](**json.loads(job.arguments))
+        except Exception:
+            logger.exception('Job %s failed', job)
+            job.attempts += 1
+            job.last_error = traceback.format_exc()
+            if job.attempts >= job.max_attempts:
+                job.failed_at = timezone.now()
+            else:
+                job.run_at = timezone.now() + retry_delay(job.attempts)
+            job.save(update_fields=['attempts', 'last_error', 'failed_at', 'run_at'])
+        else:
+            job.delete()
+        return job
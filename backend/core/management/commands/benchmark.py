@@ -0,0 +1,197 @@
+import json
+import platform
+from itertools import count
+from statistics import mean
+from time import perf_counter
+from typing import Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlencode
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+import accounts.urls
+import boards.urls
+from accounts.models import User
+from boards.models import Board, Post
+from core.instrumentation import RequestTiming
+
+
+class Case(NamedTuple):
+    """A request of the benchmark, its body made from the number of the iteration"""
+    route: str
+    method: str
+    url: str
+    data: Optional[Callable[[int], dict]] = None
+
+    @property
+    def name(self) -> str:
+        return f'{self.method} {self.route}'
+
+
+def percentile(values: List[float], rank: float) -> float:
+    """Nearest rank percentile of the sorted values"""
+    return values[max(0, min(len(values) - 1, round(rank / 100 * len(values) + 0.5) - 1))]
+
+
+class Command(BaseCommand):
+    help = ('Drives every route of the boards and accounts apps through an in-process client and records the '
+            'p50, p95 and p99 latencies, the queries per request and the bytes per response to a JSON file. '
+            'Run it on a seeded database, see seed_forum. With --compare, the results are checked against '
+            'those of an earlier run and the command fails on a regression. Nothing is written: the requests '
+            'run in a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Measured requests per route')
+        parser.add_argument('--warmup', type=int, default=5, help='Requests per route run before measuring')
+        parser.add_argument('--search', default='database', help='Terms of the search requests')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--output', default='benchmark.json', help='File the results are written to')
+        parser.add_argument('--compare', help='Results of an earlier run to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Relative increase of a p95 latency above which it is a regression')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('At least one request per route is measured')
+        with transaction.atomic():
+            client, cases = self._prepare(options['search'])
+            routes = {case.name: self._measure(client, case, options) for case in cases}
+            transaction.set_rollback(True)
+
+        results = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'cold': options['cold'],
+                'rows': {'boards': Board.objects.count(), 'posts': Post.objects.count(),
+                         'users': User.objects.count()},
+            },
+            'routes': routes,
+        }
+        with open(options['output'], 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+        for name, stats in routes.items():
+            self.stdout.write(f'{name:<45} p50 {stats["p50_ms"]:8.2f}ms  p95 {stats["p95_ms"]:8.2f}ms  '
+                              f'p99 {stats["p99_ms"]:8.2f}ms  {stats["queries"]:3d} queries  {stats["bytes"]:8d} bytes')
+        if options['compare']:
+            self._compare(options['compare'], routes, options['tolerance'])
+
+    def _prepare(self, search: str):
+        """Client authenticated as a superuser made for the benchmark, and the requests run on the largest objects"""
+        board = Board.objects.order_by('-post_count', 'pk').first()
+        topic = board and board.topics.order_by('-post_count', 'pk').first()
+        post = topic and topic.posts.order_by('-created_at', '-pk').first()
+        if post is None:
+            raise CommandError('There is no post to read, seed the database with seed_forum first')
+
+        user = User.objects.create_superuser('benchmark@example.com', 'password')
+        own_post = Post.objects.create(author=user.profile, topic=topic, message='Benchmark post')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+        board_url = reverse('boards:board-detail', args=(board.pk,))
+        topic_args = (board.pk, topic.pk)
+        topic_url = reverse('boards:boards-topic-detail', args=topic_args)
+        posts_url = reverse('boards:boards-topics-post-list', args=topic_args)
+        profile_url = reverse('accounts:profile', args=(user.profile.pk,))
+        topic_search_url = reverse('boards:boards-topic-search', args=topic_args)
+        search_query = '?' + urlencode({'q': search})
+        cases = [
+            Case('boards:board-list', 'GET', reverse('boards:board-list')),
+            Case('boards:board-list', 'POST', reverse('boards:board-list'),
+                 lambda i: {'title': f'Benchmark board {i}', 'description': 'Benchmark'}),
+            Case('boards:board-detail', 'GET', board_url),
+            Case('boards:board-detail', 'PATCH', board_url, lambda i: {'description': f'Benchmark {i}'}),
+            Case('boards:board-search', 'GET', reverse('boards:board-search', args=(board.pk,)) + search_query),
+            Case('boards:boards-topic-list', 'GET', reverse('boards:boards-topic-list', args=(board.pk,))),
+            Case('boards:boards-topic-list', 'POST', reverse('boards:boards-topic-list', args=(board.pk,)),
+                 lambda i: {'title': f'Benchmark topic {i}', 'message': 'Benchmark'}),
+            Case('boards:boards-topic-detail', 'GET', topic_url),
+            Case('boards:boards-topic-search', 'GET', topic_search_url + search_query),
+            Case('boards:boards-topics-post-list', 'GET', posts_url),
+            Case('boards:boards-topics-post-list', 'POST', posts_url, lambda i: {'message': f'Benchmark {i}'}),
+            Case('boards:boards-topics-post-detail', 'GET',
+                 reverse('boards:boards-topics-post-detail', args=topic_args + (post.pk,))),
+            Case('boards:boards-topics-post-detail', 'PATCH',
+                 reverse('boards:boards-topics-post-detail', args=topic_args + (own_post.pk,)),
+                 lambda i: {'message': f'Benchmark {i}'}),
+            Case('accounts:create', 'POST', reverse('accounts:create'),
+                 lambda i: {'email': f'benchmark{i}@example.com', 'password': 'password'}),
+            Case('accounts:token', 'POST', reverse('accounts:token'),
+                 lambda i: {'email': 'benchmark@example.com', 'password': 'password'}),
+            Case('accounts:manage', 'GET', reverse('accounts:manage')),
+            Case('accounts:profile', 'GET', profile_url),
+            Case('accounts:profile', 'PATCH', profile_url, lambda i: {'username': f'benchmark{i}'}),
+            Case('accounts:username-available', 'GET', f'{reverse("accounts:username-available")}?username=free'),
+        ]
+
+        # New routes must be benchmarked too
+        routes = {f'{urls.app_name}:{pattern.name}' for urls in (boards.urls, accounts.urls)
+                  for pattern in urls.urlpatterns}
+        missing = routes - {case.route for case in cases}
+        if missing:
+            raise CommandError(f'No benchmark for {", ".join(sorted(missing))}')
+        return client, cases
+
+    def _measure(self, client: APIClient, case: Case, options: dict) -> Dict[str, object]:
+        iterations = count()
+        latencies, queries, sizes, statuses = [], [], [], set()
+        for measured in [False] * options['warmup'] + [True] * options['requests']:
+            data = case.data(next(iterations)) if case.data else None
+            if options['cold']:
+                cache.clear()
+            timing = RequestTiming()
+            with connection.execute_wrapper(timing):
+                start = perf_counter()
+                response = getattr(client, case.method.lower())(case.url, data, format='json')
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+                elapsed = perf_counter() - start
+            if response.status_code >= 400:
+                raise CommandError(f'{case.name} answered {response.status_code}: {content[:200]!r}')
+            if measured:
+                latencies.append(elapsed * 1000)
+                queries.append(timing.queries)
+                sizes.append(len(content))
+                statuses.add(response.status_code)
+
+        latencies.sort()
+        return {
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'queries': max(queries),
+            'mean_queries': mean(queries),
+            'bytes': round(mean(sizes)),
+            'statuses': sorted(statuses),
+        }
+
+    def _compare(self, path: str, routes: dict, tolerance: float) -> None:
+        """Reports the routes slower or running more queries than in the results of the path"""
+        with open(path) as file:
+            baseline = json.load(file)['routes']
+
+        regressions = []
+        for name, stats in routes.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(f'{name}: p95 {before["p95_ms"]:.2f}ms -> {stats["p95_ms"]:.2f}ms')
+            if stats['queries'] > before['queries']:
+                regressions.append(f'{name}: {before["queries"]} -> {stats["queries"]} queries')
+        for line in regressions:
+            self.stderr.write(line)
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {path}')
+        self.stdout.write(f'No regression against {path}')
@@ -0,0 +1,60 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.jobs import run_next_job
+
+
+class Command(BaseCommand):
+    help = ('Runs the background jobs, see core.jobs. Every thread claims the due jobs one at a time, the highest '
+            'priority first. Several workers can run at once on PostgreSQL, the jobs are claimed with '
+            'SELECT ... FOR UPDATE SKIP LOCKED. SQLite needs a concurrency of 1. A job that was running when a '
+            'worker stopped is rolled back and run again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOBS['CONCURRENCY'],
+                            help='Threads running jobs, each with its own database connection')
+        parser.add_argument('--interval', type=float, default=settings.JOBS['POLL_INTERVAL'],
+                            help='Seconds an idle thread waits before looking for due jobs again')
+        parser.add_argument('--once', action='store_true', help='Stop once no job is due')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('The concurrency must be at least 1')
+        self.stopping = threading.Event()
+        if options['concurrency'] == 1:
+            self._work(options['interval'], options['once'])
+            return
+
+        threads = [threading.Thread(target=self._work_in_thread, args=(options['interval'], options['once']),
+                                    name=f'jobs-{index}')
+                   for index in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            # The threads finish the jobs they are running
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+
+    def _work(self, interval: float, once: bool) -> None:
+        while not self.stopping.is_set():
+            job = run_next_job()
+            if job is None:
+                if once:
+                    return
+                self.stopping.wait(interval)
+            elif job.failed_at is not None:
+                self.stderr.write(f'{job} failed after {job.attempts} attempts')
+
+    def _work_in_thread(self, interval: float, once: bool) -> None:
+        try:
+            self._work(interval, once)
+        finally:
+            connection.close()
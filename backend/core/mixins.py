@@ -0,0 +1,83 @@
+import hashlib
+from calendar import timegm
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.batch import batch_identity_map
+
+
+class CachedObjectMixin:
+    """
+    View mixin fetching the object of a detail route once per request
+
+    The object permissions and the view share the same instance, so the queryset
+    should select the relations the permissions look at. Within a batch, the requests of
+    the same view, action, url and query string share the instance too: the query string
+    may change the relations the queryset loads.
+    """
+
+    def get_object(self):
+        if not hasattr(self, '_cached_object'):
+            identity_map = batch_identity_map.get()
+            if identity_map is None:
+                self._cached_object = super().get_object()
+                return self._cached_object
+
+            key = (type(self), getattr(self, 'action', None), tuple(sorted(self.kwargs.items())),
+                   self.request.query_params.urlencode())
+            if key in identity_map:
+                self._cached_object = identity_map[key]
+                self.check_object_permissions(self.request, self._cached_object)
+            else:
+                self._cached_object = identity_map[key] = super().get_object()
+        return self._cached_object
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin answering conditional GETs of the list and retrieve actions before serializing anything
+
+    get_validators() returns cheap values that change whenever the response would, usually aggregates
+    of timestamps and row counts. The ETag is a hash of them and of what the url and the renderer add
+    to the response, and If-None-Match or If-Modified-Since get a 304 when they still match.
+    """
+
+    def get_validators(self) -> Tuple[tuple, Optional[datetime]]:
+        """
+        Returns the values the ETag is made of, and the last modification date of the response
+
+        The date must be None when a change can leave it as it was, e.g. after a deletion.
+        """
+        raise NotImplementedError('`get_validators()` must be implemented.')
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        """Runs the handler unless the client's copy of the response is still fresh"""
+        if request.method not in ('GET', 'HEAD'):
+            return handler(request, *args, **kwargs)
+
+        values, last_modified = self.get_validators()
+        etag = self.make_etag(values)
+        timestamp = timegm(last_modified.utctimetuple()) if last_modified is not None else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def make_etag(self, values: tuple) -> str:
+        request = self.request
+        key = repr((request.build_absolute_uri(), request.accepted_media_type, values))
+        return quote_etag(hashlib.sha1(key.encode()).hexdigest())
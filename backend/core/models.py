@@ -0,0 +1,57 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils import timezone
+
+
+class Deletion(models.Model):
+    """
+    Cascade of a tombstoned object, run in batches by the jobs of core.cascades
+
+    step and processed record the progress. They are saved with every batch, in its transaction,
+    so that a worker resumes where the last one stopped.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+
+    step = models.PositiveSmallIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)  # Rows deleted or detached so far, every step included
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # The cascades still running
+            models.Index(fields=['id'], name='core_deletion_pending_idx', condition=models.Q(finished_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f'{self.content_type.model} {self.object_id}'
+
+
+class Job(models.Model):
+    """
+    Deferred call of a task, see core.jobs
+
+    The job of a successful call is deleted. A failed call is retried at run_at, until
+    max_attempts calls failed and failed_at is set.
+    """
+    name = models.CharField(max_length=255)
+    arguments = models.TextField(default='{}')  # JSON object of the keyword arguments of the task
+    priority = models.SmallIntegerField(default=0)  # The higher first
+
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    failed_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # The jobs that can still run, in the order the workers claim them
+            models.Index(fields=['-priority', 'run_at', 'id'], name='core_job_pending_idx',
+                         condition=models.Q(failed_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,155 @@
+from typing import Set
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor, _reverse_ordering
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over a composite, unique ordering
+
+    The cursor holds a value for every ordering field, so the next page is located with a
+    keyset comparison (WHERE (created_at, id) > (...)) instead of an OFFSET, and rows
+    inserted while a client is paginating never shift or duplicate the pages it sees.
+    The ordering fields must be non null and unique when taken together.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    position_separator = '|'
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (reverse, current_position) = (False, None)
+        else:
+            (_, reverse, current_position) = self.cursor
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._get_keyset_filter(queryset, ordering, current_position))
+
+        # Always fetch an extra item to know whether there is a page following this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            # The query ordering was reversed, so put the items back in the requested order
+            self.page = list(reversed(self.page))
+
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None:
+            return None
+        if cursor.position is None or len(cursor.position.split(self.position_separator)) < 2:
+            raise NotFound(self.invalid_cursor_message)
+        # Positions are unique, so an offset is never needed to break ties
+        return Cursor(offset=0, reverse=cursor.reverse, position=cursor.position)
+
+    def _get_position_from_instance(self, instance, ordering) -> str:
+        values = []
+        for field_name in ordering:
+            field_name = field_name.lstrip('-')
+            if isinstance(instance, dict):
+                attr = instance[field_name]
+            else:
+                attr = getattr(instance, field_name)
+            values.append(attr.isoformat() if hasattr(attr, 'isoformat') else str(attr))
+        return self.position_separator.join(values)
+
+    def _get_keyset_filter(self, queryset: QuerySet, ordering, position: str) -> Q:
+        """
+        Returns the filter selecting the rows strictly after the position in the given ordering
+
+        The OR of the keyset comparison is ANDed with a range on the first field, which the index
+        scan can start from. Without it, only the equalities before the ordering bound the scan,
+        and a deep page reads every entry of the earlier pages.
+        """
+        values = position.rsplit(self.position_separator, len(ordering) - 1)
+        if len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        keyset_filter = Q()
+        equal_prefix = Q()
+        first_range = None
+        for order, value in zip(ordering, values):
+            field_name = order.lstrip('-')
+            value = self._to_python(queryset, field_name, value)
+            descending = order.startswith('-')
+            if first_range is None:
+                first_range = Q(**{field_name + ('__lte' if descending else '__gte'): value})
+            keyset_filter |= equal_prefix & Q(**{field_name + ('__lt' if descending else '__gt'): value})
+            equal_prefix &= Q(**{field_name: value})
+        return first_range & keyset_filter
+
+    def _to_python(self, queryset: QuerySet, field_name: str, value: str):
+        try:
+            field = queryset.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            field = queryset.query.annotations[field_name].output_field
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+
+def get_ordering_fields(paginator) -> Set[str]:
+    """Names of the fields the pagination reads from the last object of a page"""
+    ordering = getattr(paginator, 'ordering', None) or ()
+    if isinstance(ordering, str):
+        ordering = (ordering,)
+    return {name.lstrip('-') for name in ordering}
+
+
+class RankPagination(KeysetPagination):
+    """Keyset pagination of search results annotated with a `rank`, the best first"""
+    ordering = ('-rank', '-id')
+    page_size = 20
+
+
+class ScorePagination(KeysetPagination):
+    """
+    Keyset pagination of rows annotated with a `score`, the highest first
+
+    The ties are broken by a unique `score_key` annotation, taken from the table of the scores so that
+    the rows can be read in order from one of its indexes.
+    """
+    ordering = ('-score', '-score_key')
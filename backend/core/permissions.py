@@ -11,27 +11,25 @@ class ProfilePermission(permissions.BasePermission):
     """Permission verifying that the user owns the profile"""
 
     def has_permission(self, request: HttpRequest, view: View) -> bool:
+        return request.method in permissions.SAFE_METHODS or request.user.is_authenticated
+
+    def has_object_permission(self, request: HttpRequest, view: View, obj: Profile) -> bool:
         if request.method in permissions.SAFE_METHODS:
             return True
-        else:
-            if request.user.is_authenticated:
-                return request.user.profile == Profile.objects.get(pk=view.kwargs['pk'])
-            return False
+        return obj.user_id == request.user.id
 
 
 class TopicPermission(permissions.BasePermission):
     """Permission verifying that the user owns the topic"""
 
     def has_permission(self, request: HttpRequest, view: View) -> bool:
+        return request.method in permissions.SAFE_METHODS or request.user.is_authenticated
+
+    def has_object_permission(self, request: HttpRequest, view: View, obj: Topic) -> bool:
         if request.method in permissions.SAFE_METHODS:
             return True
-        elif request.method == 'POST':
-            return request.user.is_authenticated
-        else:
-            if request.user.is_authenticated:
-                return request.user.profile == Topic.objects.get(id=view.kwargs['pk']).starter or \
-                    request.user.is_staff
-            return False
+        # The starter is selected along with the topic, comparing the user ids does not query the profile
+        return request.user.is_staff or (obj.starter_id is not None and obj.starter.user_id == request.user.id)
 
 
 class ReadOnlyUnlessSuperuser(permissions.BasePermission):
@@ -48,12 +46,11 @@ class ReadOnlyUnlessSuperuser(permissions.BasePermission):
 class PostPermission(permissions.BasePermission):
     """Permission that allows everyone to get, but only the owner to modify"""
 
-    def has_permission(self, request, view):
+    def has_permission(self, request: HttpRequest, view: View) -> bool:
+        return request.method in permissions.SAFE_METHODS or request.user.is_authenticated
+
+    def has_object_permission(self, request: HttpRequest, view: View, obj: Post) -> bool:
         if request.method in permissions.SAFE_METHODS:
             return True
-        elif request.method == 'POST':
-            return request.user.is_authenticated
-        else:
-            if request.user.is_authenticated:
-                return request.user.profile == Post.objects.get(pk=view.kwargs['pk']).author or \
-                    request.user.is_staff
+        # The author is selected along with the post, comparing the user ids does not query the profile
+        return request.user.is_staff or (obj.author_id is not None and obj.author.user_id == request.user.id)
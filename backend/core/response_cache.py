@@ -0,0 +1,129 @@
+import hashlib
+import secrets
+import time
+from typing import List, Sequence
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+
+from core.routers import get_read_database
+
+
+class VersionStamps:
+    """
+    Version numbers kept in the cache, bumped to invalidate every key built from them at once
+
+    A stamp starts at a random value, so that an evicted stamp never comes back to a version
+    that keys were already built from.
+    """
+    key_prefix = 'version:'
+
+    @property
+    def cache(self):
+        return caches[settings.RESPONSE_CACHE['CACHE']]
+
+    def get_many(self, names: Sequence[str]) -> List[int]:
+        keys = [self.key_prefix + name for name in names]
+        stamps = self.cache.get_many(keys)
+        for key in keys:
+            if key not in stamps:
+                self.cache.add(key, secrets.randbits(48), timeout=None)
+                stamps[key] = self.cache.get(key)
+        return [stamps[key] for key in keys]
+
+    def bump(self, *names: str) -> None:
+        """
+        Invalidates the stamps now and once the current transaction commits
+
+        The second bump drops what was cached from data read before the commit.
+        """
+        self._bump(names)
+        transaction.on_commit(lambda: self._bump(names))
+
+    def _bump(self, names: Sequence[str]) -> None:
+        for name in names:
+            try:
+                self.cache.incr(self.key_prefix + name)
+            except ValueError:
+                self.cache.set(self.key_prefix + name, secrets.randbits(48), timeout=None)
+
+
+version_stamps = VersionStamps()
+
+
+class CachedResponseMixin:
+    """
+    Viewset mixin caching the rendered responses of the list and retrieve actions
+
+    The cache keys contain the version stamps returned by get_cache_versions(), which the
+    signals bump whenever the data behind the response changes. Concurrent misses on the same
+    key are coalesced: one request builds the response while the others wait for it.
+    """
+    response_key_prefix = 'response:'
+    lock_key_prefix = 'response-lock:'
+    lock_poll_interval = 0.05
+
+    def get_cache_versions(self) -> Sequence[str]:
+        """Names of the version stamps of the response"""
+        raise NotImplementedError('`get_cache_versions()` must be implemented.')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        # The browsable api shows the user, only the documents are shared between requests
+        if request.method != 'GET' or request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        cache = version_stamps.cache
+        config = settings.RESPONSE_CACHE
+        key = self.get_response_key()
+        lock_key = self.get_lock_key(key)
+
+        cached = cache.get(key)
+        if cached is None and not cache.add(lock_key, True, timeout=config['LOCK_TIMEOUT']):
+            # Another request is building this response, wait for it rather than building it too
+            deadline = time.monotonic() + config['LOCK_WAIT']
+            while cached is None and time.monotonic() < deadline:
+                time.sleep(self.lock_poll_interval)
+                cached = cache.get(key)
+            if cached is None:
+                return handler(request, *args, **kwargs)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        try:
+            response = handler(request, *args, **kwargs)
+        except BaseException:
+            cache.delete(lock_key)
+            raise
+        if response.status_code != 200 or not hasattr(response, 'add_post_render_callback'):
+            cache.delete(lock_key)
+            return response
+
+        timeout = config['TIMEOUT']
+        if get_read_database() != DEFAULT_DB_ALIAS:
+            # The replica may not have the changes the version stamps were bumped for yet
+            timeout = min(timeout, settings.REPLICA_READS['CACHE_TIMEOUT'])
+
+        def store(rendered):
+            cache.set(key, (rendered.content, rendered['Content-Type']), timeout=timeout)
+            cache.delete(lock_key)
+        response.add_post_render_callback(store)
+        return response
+
+    def get_response_key(self) -> str:
+        request = self.request
+        versions = version_stamps.get_many(self.get_cache_versions())
+        key = repr((request.build_absolute_uri(), request.accepted_media_type, versions))
+        return self.response_key_prefix + hashlib.sha1(key.encode()).hexdigest()
+
+    def get_lock_key(self, response_key: str) -> str:
+        """Key held by the request building a response"""
+        return self.lock_key_prefix + response_key[len(self.response_key_prefix):]
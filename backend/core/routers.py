@@ -0,0 +1,100 @@
+import random
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest, HttpResponse
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+# Database the reads of the current request go to, set by ReplicaReadsMixin
+_read_database: ContextVar[Optional[str]] = ContextVar('read_database', default=None)
+# Set for the rest of a batch once one of its requests wrote, see core.batch
+primary_pinned: ContextVar[bool] = ContextVar('primary_pinned', default=False)
+
+_PIN_SALT = 'core.routers.primary-pin'
+
+
+class ReplicaRouter:
+    """
+    Routes the reads of the views using ReplicaReadsMixin to the database they chose, everything else
+    to the primary
+    """
+
+    def db_for_read(self, model, **hints) -> str:
+        return _read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints) -> str:
+        # Objects read from a replica are saved to the primary too
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # The replicas hold the rows of the primary
+        return True
+
+
+def get_read_database() -> str:
+    """Database the reads of the current request go to"""
+    return _read_database.get() or DEFAULT_DB_ALIAS
+
+
+def is_pinned(request: HttpRequest) -> bool:
+    """Whether the client wrote recently, as told by the pin of its cookie or header"""
+    config = settings.REPLICA_READS
+    value = request.COOKIES.get(config['COOKIE']) or request.headers.get(config['HEADER'])
+    if not value:
+        return False
+    try:
+        signing.TimestampSigner(salt=_PIN_SALT).unsign(value, max_age=config['PIN_SECONDS'])
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def pin_primary(response: HttpResponse) -> None:
+    """Pins the client to the primary for the next PIN_SECONDS, through a cookie and a header it may send back"""
+    config = settings.REPLICA_READS
+    value = signing.TimestampSigner(salt=_PIN_SALT).sign('primary')
+    response[config['HEADER']] = value
+    response.set_cookie(config['COOKIE'], value, max_age=config['PIN_SECONDS'], httponly=True, samesite='Lax')
+
+
+def choose_read_database(request: HttpRequest) -> str:
+    """A replica picked by weight for the safe requests of clients that did not write recently, else the primary"""
+    replicas = settings.REPLICA_READS['DATABASES']
+    if request.method not in SAFE_METHODS or not replicas or primary_pinned.get() or is_pinned(request):
+        return DEFAULT_DB_ALIAS
+    aliases, weights = zip(*replicas.items())
+    return random.choices(aliases, weights)[0]
+
+
+class ReplicaReadsMixin:
+    """
+    View mixin sending the reads of safe requests to a replica, see ReplicaRouter
+
+    A replica is picked once per request, weighted by REPLICA_READS['DATABASES']. Clients pinned by
+    PrimaryPinMiddleware after a write keep reading from the primary, so they see their writes.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_database.set(choose_read_database(request))
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_database.reset(token)
+
+
+class PrimaryPinMiddleware:
+    """Pins the clients to the primary after any unsafe request, when replicas are configured"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and settings.REPLICA_READS['DATABASES']:
+            pin_primary(response)
+        return response
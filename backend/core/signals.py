@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User, Profile, renamed
+from core.authentication import token_cache
+from core.cascades import tombstoned
+
+
+def _invalidate(invalidate, arg, using: str) -> None:
+    """
+    Invalidates now and once the current transaction commits
+
+    The second invalidation drops what a concurrent request cached from the rows read before the commit.
+    """
+    invalidate(arg)
+    transaction.on_commit(lambda: invalidate(arg), using=using)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance: Token, using: str, **kwargs):
+    _invalidate(token_cache.invalidate, instance.key, using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(tombstoned, sender=User)
+def invalidate_user_token(sender, instance: User, using: str, **kwargs):
+    _invalidate(token_cache.invalidate_user, instance.pk, using)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(renamed, sender=Profile)
+def invalidate_profile_token(sender, instance: Profile, using: str, **kwargs):
+    _invalidate(token_cache.invalidate_user, instance.user_id, using)
@@ -0,0 +1,82 @@
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+from django.http import StreamingHttpResponse
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def iter_json(renderer: JSONRenderer, items: Iterable, serializer: BaseSerializer, envelope: dict = None,
+              key: str = None, chunk_size: int = 500) -> Iterator[bytes]:
+    """
+    Renders a JSON array incrementally, producing the same bytes as the renderer would at once
+
+    :param renderer: renderer used for every part of the document
+    :param items: objects of the array, usually a queryset iterator
+    :param serializer: serializer whose to_representation is applied on every item
+    :param envelope: object holding the array under `key`, if the array is not the whole document
+    :param key: key of the array in the envelope
+    :param chunk_size: number of items rendered together in a chunk of the response
+    """
+    if envelope is None:
+        head, tail = b'[', b']'
+    else:
+        placeholder = f'\x00{uuid.uuid4().hex}'
+        envelope[key] = placeholder
+        head, tail = renderer.render(envelope).split(renderer.render(placeholder), 1)
+        head, tail = head + b'[', b']' + tail
+    item_separator = renderer.render([0, 0])[2:-2]
+
+    yield head
+    chunk = []
+    separator = b''
+    for item in items:
+        chunk.append(renderer.render(serializer.to_representation(item)))
+        if len(chunk) >= chunk_size:
+            yield separator + item_separator.join(chunk)
+            chunk = []
+            separator = item_separator
+    if chunk:
+        yield separator + item_separator.join(chunk)
+    yield tail
+
+
+class StreamingJSONMixin:
+    """
+    Viewset mixin streaming large collections as JSON when `?stream=true` is given
+
+    The rows are read through a server side cursor and rendered by chunks, so the memory used
+    does not depend on the size of the collection.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 500
+
+    def stream_requested(self) -> bool:
+        """Streaming is only done for plain JSON, other renderers go through the usual response"""
+        if self.request.query_params.get(self.stream_query_param) not in ('1', 'true'):
+            return False
+        renderer = self.request.accepted_renderer
+        return type(renderer) is JSONRenderer and renderer.get_indent(self.request.accepted_media_type, {}) is None
+
+    def stream_list(self, queryset, serializer: BaseSerializer) -> StreamingHttpResponse:
+        """Streams the queryset as a JSON array"""
+        content = iter_json(self.request.accepted_renderer, self._iterate(queryset), serializer,
+                            chunk_size=self.stream_chunk_size)
+        return StreamingHttpResponse(content, content_type=self.request.accepted_renderer.media_type)
+
+    def stream_object(self, serializer: BaseSerializer, key: str, queryset) -> StreamingHttpResponse:
+        """Streams a serialized object, with the many=True field `key` read from the queryset"""
+        field_names = [name for name, field in serializer.fields.items() if not field.write_only]
+        field: ListSerializer = serializer.fields.pop(key)
+        data = serializer.data
+        envelope = OrderedDict((name, None if name == key else data[name]) for name in field_names)
+
+        content = iter_json(self.request.accepted_renderer, self._iterate(queryset), field.child,
+                            envelope=envelope, key=key, chunk_size=self.stream_chunk_size)
+        return StreamingHttpResponse(content, content_type=self.request.accepted_renderer.media_type)
+
+    def _iterate(self, queryset):
+        # The rows are read once the view returned, from the database routed to while it ran
+        return queryset.using(queryset.db).iterator(chunk_size=self.stream_chunk_size)
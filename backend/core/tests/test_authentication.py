@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from core.authentication import CachedTokenAuthentication, token_cache
+from core.extensions.test import sample_user
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Tests for the cached token authentication"""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.local.clear()
+        token_cache.clear_stats()
+        self.user = sample_user()
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def authenticate(self, key: str = None):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+        return self.authentication.authenticate(request)
+
+    def test_cached_token_resolves_without_queries(self):
+        """Test that the user and profile of a cached token are resolved in zero queries"""
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+            self.assertEqual(user.profile.username, self.user.profile.username)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+        self.assertEqual(token_cache.stats, {'local_hits': 1, 'shared_hits': 0, 'misses': 1})
+
+    def test_shared_cache_fills_local_cache(self):
+        """Test that another process' entry is found in the shared cache"""
+        self.authenticate()
+        token_cache.local.clear()
+
+        with self.assertNumQueries(0):
+            self.authenticate()
+        self.assertEqual(token_cache.stats['shared_hits'], 1)
+
+    def test_profile_change_invalidates_token(self):
+        """Test that changing the profile refreshes the cached profile"""
+        self.authenticate()
+        self.user.profile.username = 'NewUsername'
+        self.user.profile.save()
+
+        user, _ = self.authenticate()
+        self.assertEqual(user.profile.username, 'NewUsername')
+        self.assertEqual(token_cache.stats['misses'], 2)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test that deactivating a user invalidates the cached token"""
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_token_is_rejected(self):
+        """Test that deleting or rotating a token invalidates it"""
+        self.authenticate()
+        old_key = self.token.key
+        self.token.delete()
+        new_token = Token.objects.create(user=self.user)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(old_key)
+        user, _ = self.authenticate(new_token.key)
+        self.assertEqual(user, self.user)
+
+
+class TokenCacheInvalidationTests(TransactionTestCase):
+    """Tests for the invalidation of the token cache around transactions"""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.local.clear()
+        self.user = sample_user()
+        self.token = Token.objects.create(user=self.user)
+
+    def test_invalidated_again_on_commit(self):
+        """Test that what a concurrent request cached before the commit is invalidated once it commits"""
+        with transaction.atomic():
+            self.user.profile.username = 'NewUsername'
+            self.user.profile.save()
+            # A request missing the cache now still reads the committed profile
+            token_cache.set(self.token.key, Token.objects.get(pk=self.token.pk).user, self.token)
+
+        self.assertIsNone(token_cache.get(self.token.key))
@@ -0,0 +1,125 @@
+import json
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+from rest_framework import status
+
+from core.extensions.test import APITestCase, sample_topic, sample_user, sample_board
+from boards.models import Post
+
+BATCH_URL = reverse('batch')
+
+
+class BatchApiTests(APITestCase):
+    """Tests for the batch endpoint"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(starter=self.user.profile, board=self.board)
+        self.post = Post.objects.create(author=self.user.profile, message='Test post message', topic=self.topic)
+        self.post_url = reverse('boards:boards-topics-post-detail', args=(self.board.id, self.topic.id, self.post.id))
+        self.profile_url = reverse('accounts:profile', args=(self.user.profile.id,))
+
+    def batch(self, *requests: dict) -> list:
+        res = self.client.post(BATCH_URL, {'requests': requests}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return json.loads(res.content)
+
+    def test_batch_matches_single_requests(self):
+        """Test that every response of a batch is the one of the same request made alone"""
+        urls = (
+            reverse('boards:board-list'),
+            reverse('boards:boards-topic-list', args=(self.board.id,)),
+            reverse('boards:boards-topic-detail', args=(self.board.id, self.topic.id)) + '?stream=true',
+            self.post_url,
+            self.profile_url,
+        )
+        responses = self.batch(*({'url': url} for url in urls))
+
+        self.assertEqual(len(responses), len(urls))
+        for url, response in zip(urls, responses):
+            res = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertEqual(response['status'], res.status_code)
+            self.assertEqual(response['body'], json.loads(b''.join(res) if res.streaming else res.content))
+            self.assertEqual(response['headers'].get('ETag'), res.get('ETag'))
+
+    def test_batch_shares_authentication(self):
+        """Test that the requests of a batch are made as the user of the batch"""
+        payload = {'method': 'PATCH', 'url': self.post_url, 'body': {'message': 'Edited in a batch'}}
+
+        self.assertEqual(self.batch(payload)[0]['status'], status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(self.user)
+        response = self.batch(payload)[0]
+
+        self.assertEqual(response['status'], status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.message, 'Edited in a batch')
+
+    def test_batch_shares_token_authentication(self):
+        """Test that the requests of a batch authenticated by a token are made as the user of the token"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        response = self.batch({'url': self.profile_url})[0]
+
+        self.assertEqual(response['status'], status.HTTP_200_OK)
+        self.assertTrue(response['body']['is_self'])
+
+    def test_batch_shares_fetched_objects(self):
+        """Test that requests for the same object fetch it once"""
+        with CaptureQueriesContext(connection) as single:
+            self.batch({'url': self.profile_url})
+        with CaptureQueriesContext(connection) as repeated:
+            responses = self.batch({'url': self.profile_url}, {'url': self.profile_url})
+
+        self.assertEqual(len(repeated), len(single))
+        self.assertEqual(responses[0], responses[1])
+
+    def test_fetched_objects_depend_on_query(self):
+        """Test that the requests of an object with another query string fetch it again, with their own relations"""
+        urls = (self.profile_url, self.profile_url + '?fields=username')
+        with CaptureQueriesContext(connection) as first:
+            self.batch({'url': urls[0]})
+        with CaptureQueriesContext(connection) as second:
+            self.batch({'url': urls[1]})
+        with CaptureQueriesContext(connection) as both:
+            responses = self.batch(*({'url': url} for url in urls))
+
+        self.assertEqual(len(both), len(first) + len(second))
+        self.assertEqual(list(responses[1]['body']), ['username'])
+
+    def test_writes_drop_fetched_objects(self):
+        """Test that an object deleted by a request of the batch is not seen by the following ones"""
+        self.client.force_authenticate(self.user)
+
+        responses = self.batch({'url': self.post_url}, {'method': 'DELETE', 'url': self.post_url}, {'url': self.post_url})
+
+        self.assertEqual([response['status'] for response in responses], [200, 204, 404])
+
+    def test_conditional_requests(self):
+        """Test that the headers of a request are used by its view"""
+        etag = self.batch({'url': self.post_url})[0]['headers']['ETag']
+
+        response = self.batch({'url': self.post_url, 'headers': {'If-None-Match': etag}})[0]
+
+        self.assertEqual(response['status'], status.HTTP_304_NOT_MODIFIED)
+        self.assertIsNone(response['body'])
+
+    def test_batch_is_limited_to_the_api(self):
+        """Test that only the accounts and boards routes can be batched"""
+        responses = self.batch({'url': '/admin/'}, {'url': BATCH_URL}, {'url': '/api/nowhere'})
+
+        self.assertEqual([response['status'] for response in responses], [404, 404, 404])
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_batch_size_is_limited(self):
+        """Test that a batch holding too many requests is rejected"""
+        res = self.client.post(BATCH_URL, {'requests': [{'url': self.post_url}] * 3}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
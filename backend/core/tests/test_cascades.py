@@ -0,0 +1,165 @@
+import json
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse as django_reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+
+from accounts.models import Profile, User
+from boards.models import Board, Topic, Post
+from boards.search import get_search_backend
+from core.extensions.test import APITestCase, sample_board, sample_topic, sample_user
+from core.jobs import run_next_job
+from core.models import Deletion, Job
+
+
+@override_settings(CASCADES={**settings.CASCADES, 'BATCH_SIZE': 2})
+class CascadeTests(APITestCase):
+    """Tests for the tombstones of the deleted objects and the cascades removing their rows"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.superuser = sample_user(superuser=True, email='super@marsimon.com')
+        self.board = sample_board(title='Board')
+        self.topic = sample_topic(starter=self.user.profile, board=self.board, title='Deleted topic')
+        self.other_topic = sample_topic(starter=self.user.profile, board=self.board, title='Kept topic')
+        for i in range(5):
+            Post.objects.create(author=self.user.profile, message=f'Deleted tomato {i}', topic=self.topic)
+        self.kept_post = Post.objects.create(author=self.user.profile, message='Kept', topic=self.other_topic)
+        self.topic_url = reverse('boards:boards-topic-detail', args=(self.board.id, self.topic.id))
+
+    def run_jobs(self):
+        call_command('run_jobs', concurrency=1, once=True)
+
+    def test_deleted_topic_is_hidden_at_once(self):
+        """Test that a deleted topic is hidden and uncounted, while its posts are still there"""
+        self.client.force_authenticate(self.user)
+        res = self.client.delete(self.topic_url)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(self.topic_url).status_code, status.HTTP_404_NOT_FOUND)
+        topics = self.client.get(reverse('boards:boards-topic-list', args=(self.board.id,))).data['results']
+        self.assertEqual([topic['id'] for topic in topics], [self.other_topic.id])
+        search = self.client.get(reverse('boards:board-search', args=(self.board.id,)), {'q': 'tomato'})
+        self.assertEqual(search.data['results'], [])
+
+        board = Board.objects.get()
+        self.assertEqual((board.topic_count, board.post_count, board.last_post_id), (1, 1, self.kept_post.id))
+        self.assertEqual(Post.objects.filter(topic=self.topic).count(), 5)
+        self.assertEqual(self.client.delete(self.topic_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tombstoned_parents_take_no_writes(self):
+        """Test that no post is created in a deleted topic, nor a topic in a deleted board"""
+        self.client.force_authenticate(self.superuser)
+        self.client.delete(self.topic_url)
+        self.client.delete(reverse('boards:board-detail', args=(self.board.id,)))
+
+        posts_url = reverse('boards:boards-topics-post-list', args=(self.board.id, self.topic.id))
+        res = self.client.post(posts_url, {'message': 'Into the void'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        topics_url = reverse('boards:boards-topic-list', args=(self.board.id,))
+        res = self.client.post(topics_url, {'title': 'Hidden', 'message': 'Into the void'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.run_jobs()
+        self.assertFalse(Board.objects.exists())
+        self.assertFalse(Deletion.objects.filter(finished_at__isnull=True).exists())
+
+    def test_topic_cascade(self):
+        """Test that the worker deletes the posts in batches, then the topic, without counting it twice"""
+        self.client.force_authenticate(self.user)
+        self.client.delete(self.topic_url)
+
+        self.run_jobs()
+
+        self.assertFalse(Topic.objects.filter(pk=self.topic.pk).exists())
+        self.assertEqual(Post.objects.get(), self.kept_post)
+        self.assertEqual(Board.objects.get().topic_count, 1)
+        deletion = Deletion.objects.get()
+        self.assertEqual(deletion.processed, 5)
+        self.assertIsNotNone(deletion.finished_at)
+        search_posts = get_search_backend().search(Post.objects.all(), 'tomato')
+        self.assertFalse(search_posts.exists())
+
+    def test_cascade_resumes(self):
+        """Test that a cascade stopped between batches is resumed where it stopped"""
+        self.client.force_authenticate(self.user)
+        self.client.delete(self.topic_url)
+
+        run_next_job()
+        run_next_job()
+
+        deletion = Deletion.objects.get()
+        self.assertEqual((deletion.step, deletion.processed, deletion.finished_at), (1, 4, None))
+        self.assertEqual(Post.objects.filter(topic=self.topic).count(), 1)
+        # The next batch runs against the database of the deletion
+        self.assertEqual(json.loads(Job.objects.get().arguments), {'database': 'default', 'deletion': deletion.pk})
+        self.run_jobs()
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.processed, 5)
+        self.assertIsNotNone(deletion.finished_at)
+        self.assertFalse(Job.objects.exists())
+
+    def test_board_cascade(self):
+        """Test that the topics and posts of a deleted board are hidden, then deleted"""
+        self.client.force_authenticate(self.superuser)
+        res = self.client.delete(reverse('boards:board-detail', args=(self.board.id,)))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(reverse('boards:board-list')).data, [])
+        self.assertEqual(self.client.get(self.topic_url).status_code, status.HTTP_404_NOT_FOUND)
+        posts_url = reverse('boards:boards-topics-post-list', args=(self.board.id, self.other_topic.id))
+        self.assertEqual(self.client.get(posts_url).data['results'], [])
+
+        self.run_jobs()
+
+        self.assertFalse(Board.objects.exists())
+        self.assertFalse(Topic.objects.exists())
+        self.assertFalse(Post.objects.exists())
+
+    def test_user_cascade(self):
+        """Test that a deleted user is logged out at once, and that its posts and topics lose their author"""
+        token = Token.objects.create(user=self.user)
+        self.client.force_login(self.superuser)
+        profile_url = reverse('accounts:profile', args=(self.user.profile.id,))
+
+        res = self.client.post(django_reverse('admin:accounts_user_delete', args=(self.user.id,)), {'post': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.client.logout()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get(reverse('accounts:manage')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        self.assertEqual(self.client.get(profile_url).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.run_jobs()
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Profile.objects.filter(pk=self.user.profile.pk).exists())
+        self.assertEqual(Post.objects.filter(author__isnull=True).count(), 6)
+        self.assertEqual(Topic.objects.filter(starter__isnull=True).count(), 2)
+
+
+class CascadeAdminTests(TestCase):
+    """Tests for the deletions from the admin site"""
+
+    def setUp(self):
+        self.client.force_login(sample_user(superuser=True))
+        self.board = sample_board(title='Board')
+
+    def test_confirmation_does_not_collect(self):
+        """Test that the confirmation page lists the deleted objects only, and that they are tombstoned"""
+        url = django_reverse('admin:boards_board_delete', args=(self.board.id,))
+        with self.assertNumQueries(5):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.client.post(url, {'post': 'yes'})
+
+        self.assertIsNotNone(Board.objects.get().deleted_at)
+        changelist = self.client.get(django_reverse('admin:boards_board_changelist'))
+        self.assertNotContains(changelist, 'Board</a>')
@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from boards.models import Board
+
+
+class BenchmarkCommandTests(TestCase):
+    """Tests for the benchmark management command"""
+
+    def setUp(self):
+        call_command('seed_forum', users=5, boards=2, topics=2, posts=3, seed=1, stdout=StringIO())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'benchmark.json')
+
+    def benchmark(self, **options) -> dict:
+        call_command('benchmark', requests=2, warmup=0, output=self.output, stdout=StringIO(), stderr=StringIO(),
+                     **options)
+        with open(self.output) as file:
+            return json.load(file)
+
+    def test_every_route_is_measured(self):
+        """Test that the routes are measured, and that the benchmark writes nothing"""
+        results = self.benchmark()
+
+        self.assertEqual(results['meta']['rows']['boards'], 2)
+        self.assertEqual(Board.objects.count(), 2)
+        stats = results['routes']['GET boards:boards-topic-detail']
+        self.assertEqual(set(stats), {'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'mean_queries', 'bytes', 'statuses'})
+        self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertGreater(stats['bytes'], 0)
+        self.assertEqual(results['routes']['POST boards:boards-topics-post-list']['statuses'], [201])
+        self.assertIn('GET accounts:username-available', results['routes'])
+
+    def test_compare(self):
+        """Test that a route running more queries than in the baseline fails the comparison"""
+        baseline = self.benchmark()
+        baseline['routes']['GET boards:board-detail']['queries'] -= 1
+        path = self.output + '.baseline'
+        with open(path, 'w') as file:
+            json.dump(baseline, file)
+
+        with self.assertRaisesMessage(CommandError, '1 regressions'):
+            self.benchmark(compare=path, tolerance=1000)
+
+    def test_unseeded_database(self):
+        """Test that the benchmark asks for a seeded database"""
+        Board.objects.all().delete()
+
+        with self.assertRaisesMessage(CommandError, 'seed_forum'):
+            self.benchmark()
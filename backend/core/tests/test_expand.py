@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from boards.models import Post
+from core.extensions.serializers import parse_expand
+from core.extensions.test import APITestCase, sample_board, sample_topic, sample_user
+
+
+class ParseExpandTests(SimpleTestCase):
+    """Tests for the parsing of the ?expand= parameter"""
+
+    def test_paths_make_a_tree(self):
+        """Test that the dotted paths are merged into a tree"""
+        self.assertEqual(parse_expand('posts.author, starter,,posts'), {'posts': {'author': {}}, 'starter': {}})
+        self.assertEqual(parse_expand(''), {})
+
+
+class ExpandableFieldsTests(APITestCase):
+    """Tests for the ?expand= parameter of the board, topic and post endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(starter=self.user.profile, board=self.board)
+        for i in range(3):
+            author = sample_user(email=f'author{i}@marsimon.com')
+            Post.objects.create(author=author.profile, message=f'Post {i}', topic=self.topic)
+        self.topic_url = reverse('boards:boards-topic-detail', args=(self.board.id, self.topic.id))
+        self.posts_url = reverse('boards:boards-topics-post-list', args=(self.board.id, self.topic.id))
+
+    def get(self, url: str, **params):
+        """Response to a GET of the url, which must succeed, and the amount of queries it ran"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, len(queries)
+
+    def test_relations_are_collapsed(self):
+        """Test that the relations are given by id or href by default"""
+        res, _ = self.get(self.topic_url)
+        self.assertEqual(res.data['starter'], self.user.profile.id)
+        self.assertEqual(res.data['posts'], 'http://testserver' + self.posts_url)
+
+        res, _ = self.get(self.posts_url)
+        self.assertEqual([post['author'] for post in res.data['results']],
+                         list(Post.objects.order_by('created_at').values_list('author', flat=True)))
+
+    def test_one_query_per_expanded_collection(self):
+        """Test that an expanded collection costs one query, and an expanded object a join"""
+        _, collapsed = self.get(self.topic_url)
+
+        res, queries = self.get(self.topic_url, expand='starter,posts.author')
+
+        self.assertEqual(queries, collapsed + 1)
+        self.assertEqual(res.data['starter']['username'], self.user.profile.username)
+        self.assertEqual([post['author']['username'] for post in res.data['posts']],
+                         [post.author.username for post in self.topic.posts.order_by('created_at')])
+
+    def test_expanded_post_list(self):
+        """Test that expanding the authors of a post list does not add queries"""
+        _, collapsed = self.get(self.posts_url)
+
+        res, queries = self.get(self.posts_url, expand='author')
+
+        self.assertEqual(queries, collapsed)
+        self.assertAllIn(('username', 'href'), res.data['results'][0]['author'])
+
+    def test_unknown_expansions(self):
+        """Test that the relations that can not be expanded are rejected"""
+        for expand in ('password', 'posts.topic', 'starter.user'):
+            res = self.client.get(self.topic_url, {'expand': expand})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(expand, str(res.data['expand']))
+
+    def test_writes_ignore_the_parameter(self):
+        """Test that the unsafe requests answer with the relations collapsed"""
+        self.client.force_authenticate(self.user)
+        res = self.client.post(f'{self.posts_url}?expand=author', {'message': 'New post'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['author'], self.user.profile.id)
@@ -0,0 +1,65 @@
+from django.test import TestCase
+from django.urls import set_script_prefix, clear_script_prefix
+
+from rest_framework.relations import HyperlinkedIdentityField
+from rest_framework.reverse import reverse
+from rest_framework.test import APIRequestFactory
+
+from accounts.serializers import ProfileWithHyperlinkSerializer
+from core.extensions.hyperlinks import build_url
+from core.extensions.relations_unused import ComplexHyperlinkedIdentityField
+from core.extensions.test import sample_user, sample_board, sample_topic
+
+
+class BuildUrlTests(TestCase):
+    """Tests for the precompiled url builder"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.kwargs = {'parent_lookup_board': 12, 'pk': 345}
+
+    def test_same_url_as_reverse(self):
+        """Test that the urls are the same as the ones rest_framework builds"""
+        request = self.factory.get('/api/boards/', HTTP_HOST='example.com:8000')
+        for view_name, kwargs in (('boards:boards-topic-detail', self.kwargs), ('accounts:profile', {'pk': 'a-b'})):
+            self.assertEqual(build_url(view_name, kwargs, request), reverse(view_name, kwargs=kwargs, request=request))
+            self.assertEqual(build_url(view_name, kwargs), reverse(view_name, kwargs=kwargs))
+
+    def test_format_override_is_preserved(self):
+        """Test that the format query parameter is kept, like rest_framework does"""
+        request = self.factory.get('/api/boards/', {'format': 'json'}, secure=True)
+        self.assertEqual(build_url('boards:boards-topic-detail', self.kwargs, request),
+                         reverse('boards:boards-topic-detail', kwargs=self.kwargs, request=request))
+
+    def test_script_prefix(self):
+        """Test that the script prefix of the current request is used"""
+        build_url('boards:boards-topic-detail', self.kwargs)
+        set_script_prefix('/forum/')
+        try:
+            self.assertEqual(build_url('boards:boards-topic-detail', self.kwargs),
+                             reverse('boards:boards-topic-detail', kwargs=self.kwargs))
+        finally:
+            clear_script_prefix()
+
+    def test_base_without_request(self):
+        """Test that the href fields serialized without a request are absolute against the base of the context"""
+        profile = sample_user().profile
+        path = reverse('accounts:profile', kwargs={'pk': profile.pk})
+
+        self.assertEqual(ProfileWithHyperlinkSerializer(profile).data['href'], path)
+        serializer = ProfileWithHyperlinkSerializer(profile, context={'base_url': 'https://forum.example.com'})
+        self.assertEqual(serializer.data['href'], 'https://forum.example.com' + path)
+
+    def test_complex_hyperlinked_identity_field(self):
+        """Test that the complex hyperlinked field builds the same url as the regular one"""
+        topic = sample_topic(sample_user().profile, sample_board())
+        request = self.factory.get('/')
+        complex_field = ComplexHyperlinkedIdentityField(view_name='boards:boards-topic-detail', read_only=True,
+                                                        extra_view_kwargs={'parent_lookup_board': 'board_id'})
+        field = HyperlinkedIdentityField(view_name='boards:boards-topic-detail', read_only=True)
+
+        self.assertEqual(
+            complex_field.get_url(topic, 'boards:boards-topic-detail', request, None),
+            field.reverse('boards:boards-topic-detail', kwargs={'parent_lookup_board': topic.board_id, 'pk': topic.pk},
+                          request=request)
+        )
@@ -0,0 +1,81 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+
+from core.extensions.test import APITestCase, sample_board, sample_topic, sample_user
+from core.instrumentation import metrics
+
+
+def instrumentation_settings(**params) -> override_settings:
+    return override_settings(INSTRUMENTATION={**settings.INSTRUMENTATION, **params})
+
+
+@instrumentation_settings(SAMPLE_RATE=1)
+class InstrumentationTests(APITestCase):
+    """Tests for the request instrumentation and the metrics endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        metrics.clear()
+        self.user = sample_user()
+        self.board = sample_board()
+        sample_topic(starter=self.user.profile, board=self.board)
+        self.url = reverse('boards:board-list')
+
+    def test_server_timing(self):
+        """Test that a sampled response tells its query count and times in a Server-Timing header"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        timings = dict(re.findall(r'(\w+);(?:desc="[^"]*";)?dur=([\d.]+)', res['Server-Timing']))
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'total'})
+        self.assertIn(f'db;desc="{len(queries)} queries"', res['Server-Timing'])
+        self.assertGreater(float(timings['serialize']), 0)
+        self.assertGreater(float(timings['render']), 0)
+        self.assertGreaterEqual(float(timings['total']), sum(float(timings[name]) for name in ('db', 'render')))
+
+    def test_regular_serializers_are_timed(self):
+        """Test that the serializers of the views that are not compiled count in the serializer time too"""
+        urls = (reverse('boards:board-detail', args=(self.board.id,)), self.url + '?expand=topics',
+                reverse('accounts:profile', args=(self.user.profile.id,)))
+        for url in urls:
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertGreater(float(re.search(r'serialize;dur=([\d.]+)', res['Server-Timing']).group(1)), 0)
+
+    def test_unsampled_requests_are_counted(self):
+        """Test that the requests that are not sampled get no header, but are counted in the histograms"""
+        with instrumentation_settings(SAMPLE_RATE=0):
+            res = self.client.get(self.url)
+        self.client.get('/api/nowhere/')
+
+        self.assertNotIn('Server-Timing', res)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(self.user)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="boards:board-list",method="GET"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="boards:board-list",method="GET",le="+Inf"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{view="unmatched",method="GET"} 1', body)
+        self.assertNotIn('http_sampled_requests_total{view="boards:board-list"', body)
+        self.assertIn('http_sampled_requests_total{view="unmatched",method="GET"} 1', body)
+
+    def test_metrics_are_for_the_staff(self):
+        """Test that the metrics are only served to the staff"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(sample_user(email='staff@email.com', superuser=True))
+        res = self.client.get(reverse('metrics'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain; version=0.0.4'))
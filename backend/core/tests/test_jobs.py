@@ -0,0 +1,143 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from boards.models import Board
+from core.extensions.test import sample_board
+from core.jobs import enqueue, retry_delay, run_next_job, task
+from core.models import Job
+
+
+calls = []
+running, finish = threading.Event(), threading.Event()
+
+
+@task('tests.record')
+def record(value: str) -> None:
+    calls.append(value)
+
+
+@task('tests.fail')
+def fail(title: str) -> None:
+    sample_board(title=title)
+    raise ValueError('Failing on purpose')
+
+
+@task('tests.wait')
+def wait() -> None:
+    running.set()
+    finish.wait(5)
+
+
+@override_settings(JOBS={'CONCURRENCY': 1, 'POLL_INTERVAL': 0, 'MAX_ATTEMPTS': 3, 'RETRY_DELAY': 10,
+                         'MAX_RETRY_DELAY': 30})
+class JobTests(TestCase):
+    """Tests for the background jobs and the run_jobs worker"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_jobs_run_by_priority(self):
+        """Test that the due jobs run the highest priority first, and are deleted once done"""
+        enqueue('tests.record', value='low', priority=-1)
+        enqueue('tests.record', value='first')
+        enqueue('tests.record', value='high', priority=5)
+        enqueue('tests.record', value='second')
+        enqueue('tests.record', value='later', delay=timedelta(minutes=1))
+
+        call_command('run_jobs', once=True)
+
+        self.assertEqual(calls, ['high', 'first', 'second', 'low'])
+        self.assertEqual(list(Job.objects.values_list('arguments', flat=True)), ['{"value": "later"}'])
+
+    def test_enqueued_on_commit(self):
+        """Test that the jobs of a rolled back transaction are never run"""
+        with transaction.atomic():
+            enqueue('tests.record', value='rolled back')
+            transaction.set_rollback(True)
+
+        self.assertIsNone(run_next_job())
+        with self.assertRaises(ImproperlyConfigured):
+            enqueue('tests.unknown')
+
+    def test_failed_jobs_are_retried(self):
+        """Test that a failing job is rolled back and retried later, until it ran out of attempts"""
+        job = enqueue('tests.fail', title='Rolled back')
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(run_next_job(), job)
+
+        job.refresh_from_db()
+        self.assertFalse(Board.objects.exists())
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Failing on purpose', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=9))
+        self.assertIsNone(run_next_job())
+
+        err = StringIO()
+        with self.assertLogs('core.jobs', 'ERROR'):
+            Job.objects.update(run_at=timezone.now())
+            run_next_job()
+            Job.objects.update(run_at=timezone.now())
+            call_command('run_jobs', once=True, stderr=err)
+
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.failed_at)
+        self.assertIn(f'{job} failed after 3 attempts', err.getvalue())
+        Job.objects.update(run_at=timezone.now())
+        self.assertIsNone(run_next_job())
+
+    def test_unique_jobs(self):
+        """Test that a unique job is not enqueued again while it is pending"""
+        job = enqueue('tests.record', value='once', unique=True)
+
+        self.assertEqual(enqueue('tests.record', value='once', unique=True), job)
+        self.assertNotEqual(enqueue('tests.record', value='other', unique=True), job)
+        run_next_job()
+        self.assertNotEqual(enqueue('tests.record', value='once', unique=True), job)
+
+    def test_retry_delay(self):
+        """Test that the retries back off exponentially, up to the maximum delay"""
+        self.assertEqual([retry_delay(attempts).total_seconds() for attempts in range(1, 5)], [10, 20, 30, 30])
+
+    def test_concurrency_is_checked(self):
+        """Test that a worker needs at least one thread"""
+        with self.assertRaises(CommandError):
+            call_command('run_jobs', concurrency=0, once=True)
+
+
+@override_settings(JOBS={'CONCURRENCY': 1, 'POLL_INTERVAL': 0, 'MAX_ATTEMPTS': 3, 'RETRY_DELAY': 10,
+                         'MAX_RETRY_DELAY': 30})
+class RunningJobTests(TransactionTestCase):
+    """Tests for the jobs enqueued while a worker runs them"""
+
+    @skipUnless(connection.vendor == 'postgresql', 'SQLite does not lock rows, it runs one write at a time')
+    def test_running_job_is_not_pending(self):
+        """Test that a unique job is enqueued again while a worker runs the same call"""
+        running.clear()
+        finish.clear()
+        job = enqueue('tests.wait', unique=True)
+
+        def work():
+            try:
+                run_next_job()
+            finally:
+                connection.close()
+        worker = threading.Thread(target=work)
+        worker.start()
+        try:
+            self.assertTrue(running.wait(5))
+            self.assertNotEqual(enqueue('tests.wait', unique=True), job)
+        finally:
+            finish.set()
+            worker.join()
+        self.assertEqual(Job.objects.count(), 1)
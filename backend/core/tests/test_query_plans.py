@@ -0,0 +1,78 @@
+import re
+from datetime import datetime, timezone
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase
+
+from accounts.models import Profile
+from boards.models import Topic, Post
+from boards.serializers import BoardSerializer, TopicListSerializer, TopicSerializer
+from core.pagination import KeysetPagination
+from core.utils.queries import window_queryset
+
+
+class QueryPlanTests(TestCase):
+    """Tests that the hot queries of the api are served by an index"""
+
+    def setUp(self):
+        self.at = datetime.now(timezone.utc)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # The test tables are nearly empty, a sequential scan would always be the cheapest
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset: QuerySet, index: str):
+        """Asserts that the plan of the queryset scans the index"""
+        plan = queryset.explain()
+        self.assertIn(index, plan, f'{index} is not used by:\n{queryset.query}\n{plan}')
+
+    def assertIndexRange(self, queryset: QuerySet, index: str, column: str):
+        """Asserts that the plan of the queryset scans the index from a bound on the column"""
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            pattern = rf'{index}[^\n]*\n\s*Index Cond: [^\n]*{column} [<>]'
+        else:
+            pattern = rf'{index} \([^)]*{column}[<>]'
+        self.assertRegex(plan, re.compile(pattern), f'{index} is not scanned from {column} by:\n{queryset.query}')
+
+    def keyset_page(self, queryset: QuerySet, ordering: tuple) -> QuerySet:
+        """Page following a position, filtered like KeysetPagination does"""
+        position = KeysetPagination.position_separator.join([self.at.isoformat(), '1'])
+        keyset = KeysetPagination()._get_keyset_filter(queryset, ordering, position)
+        return queryset.filter(keyset).order_by(*ordering)[:20]
+
+    def test_topic_posts(self):
+        """Test that the pages of the posts of a topic are read from the topic index, from the cursor on"""
+        page = self.keyset_page(TopicSerializer.get_posts_queryset().filter(topic=1), ('created_at', 'id'))
+
+        self.assertUsesIndex(page, 'boards_post_topic_created_idx')
+        self.assertIndexRange(page, 'boards_post_topic_created_idx', 'created_at')
+        self.assertUsesIndex(TopicListSerializer.get_first_posts_queryset().filter(topic__in=[1, 2]),
+                             'boards_post_topic_created_idx')
+
+    def test_board_topics(self):
+        """Test that the topic pages and the recent topics of the boards are read from the board index"""
+        page = self.keyset_page(Topic.objects.filter(board=1), ('created_at', 'id'))
+        recent = window_queryset(Topic.objects.all(), 'board', [1, 2], BoardSerializer.recent_topics_ordering, 3)
+
+        self.assertIndexRange(page, 'boards_topic_board_created_idx', 'created_at')
+        self.assertUsesIndex(recent, 'boards_topic_board_created_idx')
+
+    def test_author_posts(self):
+        """Test that the latest posts of an author are read from the author index"""
+        self.assertUsesIndex(Post.objects.filter(author=1).order_by('-created_at', '-id')[:20],
+                             'boards_post_author_created_idx')
+
+    def test_edited_posts(self):
+        """Test that the edits since an event, replayed by the event streams, are read from the partial index"""
+        for posts in (Post.objects.filter(topic=1), Post.objects.filter(topic__board=1)):
+            edited = posts.filter(edited_at__gte=self.at).exclude(edited_at=self.at, pk__lte=1)
+
+            self.assertUsesIndex(edited.order_by('edited_at', 'pk'), 'boards_post_topic_edited_idx')
+
+    @skipUnless(connection.vendor == 'postgresql', 'The case insensitive index is only built on PostgreSQL')
+    def test_username_availability(self):
+        """Test that the case insensitive username lookups are read from the upper index"""
+        self.assertUsesIndex(Profile.objects.filter(username__iexact='Name'), 'accounts_profile_username_upper_uniq')
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+
+from boards.models import Board, Topic, Post
+from core.extensions.test import APITestCase, sample_board, sample_user
+from core.routers import choose_read_database
+
+REPLICA = 'replica'
+
+
+def replica_settings(**params) -> override_settings:
+    return override_settings(REPLICA_READS={**settings.REPLICA_READS, 'DATABASES': {REPLICA: 1}, **params})
+
+
+@replica_settings()
+class ReplicaRouterTests(APITestCase):
+    """Tests for the routing of the api reads to the replicas"""
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        # Stands for a replica: a database of its own, so the tests see where the rows were read from.
+        # It is only declared while these tests run.
+        default = connections.databases['default']
+        connections.databases[REPLICA] = {
+            **default,
+            'TEST': {'NAME': None if default['ENGINE'].endswith('sqlite3') else f'{default["NAME"]}_replica'},
+        }
+        cls.replica_name = connections[REPLICA].settings_dict['NAME']
+        connections[REPLICA].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].creation.destroy_test_db(cls.replica_name, verbosity=0)
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def setUp(self):
+        cache.clear()
+        self.user = sample_user(superuser=True)
+        self.client.force_authenticate(self.user)
+        self.board = sample_board()
+        self.board_url = reverse('boards:board-detail', args=(self.board.id,))
+        self.profile_url = reverse('accounts:profile', args=(self.user.profile.id,))
+
+    def test_reads_go_to_the_replica(self):
+        """Test that the safe requests read from the replica, which does not have the rows of the primary"""
+        self.assertEqual(self.client.get(reverse('boards:board-list')).data, [])
+        self.assertEqual(self.client.get(self.board_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(self.profile_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        """Test that a client that wrote reads from the primary, until its pin expires"""
+        res = self.client.patch(self.board_url, {'description': 'Edited'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(settings.REPLICA_READS['COOKIE'], res.cookies)
+        self.assertEqual(self.client.get(self.board_url).data['description'], 'Edited')
+
+        # The responses cached from the primary are shared with the clients reading from the replica
+        cache.clear()
+        with replica_settings(PIN_SECONDS=-1):
+            self.assertEqual(self.client.get(self.board_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pin_header(self):
+        """Test that the pin is also taken from the header, and that a forged pin is ignored"""
+        header = settings.REPLICA_READS['HEADER']
+        pin = self.client.patch(self.board_url, {'description': 'Edited'})[header]
+        self.client.cookies.clear()
+        meta = 'HTTP_' + header.upper().replace('-', '_')
+
+        self.assertEqual(self.client.get(self.board_url, **{meta: pin}).status_code, status.HTTP_200_OK)
+        cache.clear()
+        self.assertEqual(self.client.get(self.board_url, **{meta: 'primary'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_streamed_rows_come_from_the_replica(self):
+        """Test that the rows streamed once the view returned are read from the replica too"""
+        board = Board.objects.using(REPLICA).create(title='Replicated', description='On the replica')
+        topic = Topic.objects.using(REPLICA).create(board=board, title='Replicated topic')
+        Post.objects.using(REPLICA).create(topic=topic, message='Replicated post')
+
+        res = self.client.get(reverse('boards:boards-topic-detail', args=(board.id, topic.id)),
+                              {'stream': 'true', 'expand': 'posts'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Replicated post', b''.join(res.streaming_content))
+
+    def test_weighted_choice(self):
+        """Test that the replicas are picked by weight, and that the unsafe requests use the primary"""
+        request = self.client.get(self.board_url).wsgi_request
+
+        with replica_settings(DATABASES={'default': 0, REPLICA: 1}):
+            self.assertEqual(choose_read_database(request), REPLICA)
+        with replica_settings(DATABASES={'default': 1, REPLICA: 0}):
+            self.assertEqual(choose_read_database(request), 'default')
+        request.method = 'POST'
+        self.assertEqual(choose_read_database(request), 'default')
+
+    def test_batch_reads_its_writes(self):
+        """Test that the requests of a batch following a write read from the primary"""
+        responses = self.client.post(reverse('batch'), {'requests': [
+            {'url': self.board_url},
+            {'method': 'PATCH', 'url': self.board_url, 'body': {'description': 'Edited'}},
+            {'url': self.board_url},
+        ]}, format='json').json()
+
+        self.assertEqual([response['status'] for response in responses], [404, 200, 200])
@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from boards.models import Post
+from core.extensions.test import APITestCase, sample_board, sample_topic, sample_user
+
+
+class SparseFieldsetTests(APITestCase):
+    """Tests for the ?fields= parameter of the board, topic, post and profile endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = sample_user()
+        self.board = sample_board()
+        self.topic = sample_topic(starter=self.user.profile, board=self.board)
+        for i in range(3):
+            Post.objects.create(author=self.user.profile, message=f'Post {i}', topic=self.topic)
+        self.topic_url = reverse('boards:boards-topic-detail', args=(self.board.id, self.topic.id))
+        self.posts_url = reverse('boards:boards-topics-post-list', args=(self.board.id, self.topic.id))
+
+    def get(self, url: str, **params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, '\n'.join(query['sql'] for query in queries)
+
+    def test_post_columns_are_pruned(self):
+        """Test that the messages and the authors of the posts are not read when they are not requested"""
+        res, sql = self.get(self.posts_url, fields='id,created_at')
+
+        self.assertEqual([set(post) for post in res.data['results']], [{'id', 'created_at'}] * 3)
+        self.assertNotIn('"message"', sql)
+        self.assertNotIn('accounts_profile', sql)
+
+        res, sql = self.get(self.posts_url, fields='id,author', expand='author')
+        self.assertEqual(res.data['results'][0]['author']['username'], self.user.profile.username)
+        self.assertIn('accounts_profile', sql)
+
+    def test_nested_collections_are_not_loaded(self):
+        """Test that the posts of a topic and the recent topics of the boards are only loaded when requested"""
+        res, sql = self.get(self.topic_url, fields='id,title', expand='posts')
+        self.assertEqual(res.data, {'id': self.topic.id, 'title': self.topic.title})
+        self.assertNotIn('FROM "boards_post"', sql)
+        self.assertNotIn('"boards_board"."title"', sql)
+
+        res, sql = self.get(reverse('boards:board-list'), fields='id,title', expand='topics')
+        self.assertEqual(res.data, [{'id': self.board.id, 'title': self.board.title}])
+        self.assertNotIn('FROM "boards_topic"', sql)
+
+        res, _ = self.get(reverse('boards:boards-topic-list', args=(self.board.id,)), fields='title,first_post',
+                          expand='first_post')
+        self.assertEqual(res.data['results'][0]['first_post']['message'], 'Post 0')
+
+    def test_stream_without_posts(self):
+        """Test that a streamed topic is given whole when its posts are not requested"""
+        res, _ = self.get(self.topic_url, fields='title', expand='posts', stream='true')
+
+        self.assertEqual(res.data, {'title': self.topic.title})
+
+    def test_profile(self):
+        """Test that the profiles take the parameter too"""
+        self.client.force_authenticate(self.user)
+        res, _ = self.get(reverse('accounts:profile', args=(self.user.profile.id,)), fields='is_self')
+
+        self.assertEqual(res.data, {'is_self': True})
+
+    def test_unknown_fields(self):
+        """Test that unknown fields are rejected"""
+        res = self.client.get(self.posts_url, {'fields': 'id,password'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', str(res.data['fields']))
+
+    def test_writes_ignore_the_parameter(self):
+        """Test that the unsafe requests answer with every field"""
+        self.client.force_authenticate(self.user)
+        res = self.client.post(f'{self.posts_url}?fields=id', {'message': 'New post'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['message'], 'New post')
@@ -0,0 +1,65 @@
+from django.db import NotSupportedError
+from django.db.migrations.operations import AddIndex
+from django.db.migrations.operations.base import Operation
+
+
+class PostgresOnly(Operation):
+    """
+    Migration operation applying the wrapped operation to the database on PostgreSQL only
+
+    The migration state always changes, so that models can declare PostgreSQL specific
+    indexes while the tests run on other databases.
+    """
+    reduces_to_sql = False
+
+    def __init__(self, operation: Operation):
+        self.operation = operation
+
+    def deconstruct(self):
+        return self.__class__.__name__, [self.operation], {}
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            self.operation.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            self.operation.database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f'{self.operation.describe()} (PostgreSQL only)'
+
+
+class AddIndexConcurrently(AddIndex):
+    """
+    AddIndex building the index with CREATE INDEX CONCURRENTLY on PostgreSQL, so that the table stays writable
+
+    The migration must set atomic = False. Other databases build the index the usual way.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        self._ensure_not_in_transaction(schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+    @staticmethod
+    def _ensure_not_in_transaction(schema_editor):
+        if schema_editor.connection.in_atomic_block:
+            raise NotSupportedError('Indexes are built concurrently by non-atomic migrations only, set atomic = False.')
+
+    def describe(self):
+        return f'{super().describe()} concurrently'
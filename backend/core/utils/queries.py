@@ -0,0 +1,59 @@
+from typing import Iterable, Sequence
+
+from django.db.models import F, QuerySet, Model
+from django.db.models.expressions import RawSQL, Window, OrderBy
+from django.db.models.functions import RowNumber
+
+
+def window_queryset(queryset: QuerySet, related_field: str, related_pks: Sequence, ordering: Sequence[str],
+                    limit: int) -> QuerySet:
+    """
+    Filters a queryset down to at most `limit` rows per value of `related_field`, in `ordering`
+
+    The rows are ranked with ROW_NUMBER() over a window partitioned by `related_field`
+    and only the first `limit` rows of each partition are kept.
+
+    :param queryset: queryset of the related model
+    :param related_field: name of the foreign key the rows are grouped by
+    :param related_pks: values of the foreign key to fetch rows for
+    :param ordering: order_by() style ordering of the rows
+    :param limit: maximum number of rows per value of the foreign key
+    """
+    window_ordering = [OrderBy(F(field.lstrip('-')), descending=field.startswith('-')) for field in ordering]
+    ranked = queryset.order_by().filter(**{related_field + '__in': related_pks}).annotate(
+        window_rank=Window(RowNumber(), partition_by=[F(related_field)], order_by=window_ordering)
+    ).values('pk', 'window_rank')
+    sql, params = ranked.query.sql_with_params()
+    pk_column = queryset.model._meta.pk.column
+
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT ranked.{pk_column} FROM ({sql}) ranked WHERE ranked.window_rank <= %s', params + (limit,)
+    )).order_by(*ordering)
+
+
+def prefetch_window(instances: Iterable[Model], queryset: QuerySet, related_field: str, ordering: Sequence[str],
+                    limit: int, to_attr: str) -> None:
+    """
+    Prefetches at most `limit` related objects per instance in a single query
+
+    See window_queryset() for how the related rows are picked.
+
+    :param instances: objects to prefetch for, which receive a list in `to_attr`
+    :param queryset: queryset of the related model
+    :param related_field: name of the foreign key pointing to the instances
+    :param ordering: order_by() style ordering of the related objects
+    :param limit: maximum number of related objects per instance
+    :param to_attr: attribute receiving the list of related objects
+    """
+    by_pk = {}
+    for instance in instances:
+        setattr(instance, to_attr, [])
+        by_pk[instance.pk] = instance
+    if not by_pk:
+        return
+
+    related_objects = window_queryset(queryset, related_field, list(by_pk), ordering, limit)
+
+    attname = queryset.model._meta.get_field(related_field).attname
+    for related_object in related_objects:
+        getattr(by_pk[getattr(related_object, attname)], to_attr).append(related_object)